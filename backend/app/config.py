@@ -14,11 +14,34 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Password hashing (bcrypt work factor; stored hashes are upgraded on login)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4  # threads hashing concurrently, off the event loop
+    
     # Arkesel SMS
     ARKESEL_API_KEY: str = "TlZMTndiYXZzaXJtWWxkTFJOdVI"
     ARKESEL_SENDER_ID: str = "CodelabSMS"
     ARKESEL_API_URL: str = "https://sms.arkesel.com/sms/api"
     
+    # Bulk SMS dispatch (max requests in flight to Arkesel)
+    SMS_BULK_CONCURRENCY: int = 10
+    SMS_BULK_MAX_CONCURRENCY: int = 50
+    
+    # Shared Arkesel HTTP client pool
+    ARKESEL_HTTP_MAX_CONNECTIONS: int = 50
+    ARKESEL_HTTP_MAX_KEEPALIVE: int = 20
+    ARKESEL_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    ARKESEL_HTTP_TIMEOUT: float = 30.0
+    ARKESEL_HTTP_CONNECT_TIMEOUT: float = 10.0
+    
+    # SMS outbox worker ("inprocess" runs inside the API, "celery" uses REDIS_URL)
+    SMS_OUTBOX_BACKEND: str = "inprocess"
+    SMS_OUTBOX_POLL_INTERVAL: float = 2.0
+    SMS_OUTBOX_BATCH_SIZE: int = 50
+    SMS_OUTBOX_MAX_ATTEMPTS: int = 3
+    SMS_OUTBOX_RETRY_DELAY: int = 30  # seconds, multiplied by attempt number
+    SMS_OUTBOX_STALE_AFTER: int = 300  # seconds before a stuck "sending" row is retried
+    
     # Paystack Payment Gateway
     PAYSTACK_PUBLIC_KEY: str = "pk_test_7a592687934d03a5693f3dd55d148c413ea944a8"
     PAYSTACK_SECRET_KEY: str = "sk_test_7a592687934d03a5693f3dd55d148c413ea944a8"  # Replace with your secret key
@@ -34,10 +57,44 @@ class Settings(BaseSettings):
     FREE_TRIAL_SMS_LIMIT: int = 20
     BASIC_PLAN_MONTHLY: float = 200.00
     PREMIUM_PLAN_MONTHLY: float = 300.00
+    SUBSCRIPTION_SWEEP_INTERVAL: int = 300  # seconds between expiry sweeps; 0 leaves it to manage.py/celery
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     
+    # Bulk payment posting
+    PAYMENT_BATCH_MAX_ROWS: int = 20000
+    
+    # Bulk student import (rows per INSERT)
+    STUDENT_IMPORT_CHUNK_SIZE: int = 500
+    
+    # Term billing runs (students per transaction; a queued/running run idle this long may be superseded)
+    BILLING_CHUNK_SIZE: int = 1000
+    BILLING_RUN_STALE_AFTER: int = 300
+    
+    # Per-tenant cache of dashboard/report aggregates (in-process, seconds)
+    TENANT_CACHE_TTL_SECONDS: int = 60
+    
+    # Authenticated user/school cache (in-process, seconds; bounds staleness across workers)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    
+    # SMS pricing / system settings snapshot: seconds between checks for changes by other workers
+    CONFIG_CACHE_CHECK_SECONDS: int = 10
+    
+    # Idempotency-Key replay store ("database" or "redis" via REDIS_URL)
+    IDEMPOTENCY_BACKEND: str = "database"
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LEASE_SECONDS: int = 120  # an unfinished request's claim; a retry after this takes the key over
+    IDEMPOTENCY_PURGE_INTERVAL: int = 3600  # seconds between expired-key purges (database backend); 0 leaves it to manage.py
+    
+    # Expiring key-value store ("memory" is per process; use "redis" via REDIS_URL with several workers)
+    KV_STORE_BACKEND: str = "memory"
+    KV_STORE_MAX_ENTRIES: int = 10000
+    RESET_CODE_TTL_SECONDS: int = 900
+    
+    # Debug: add X-DB-Queries / X-DB-Commits headers to every response
+    DEBUG_DB_STATS: bool = False
+    
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
@@ -1,6 +1,12 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import functions
 from app.config import settings
 import os
 
@@ -18,6 +24,23 @@ def _get_sqlalchemy_database_url(database_url: str) -> str:
     return database_url
 
 
+# Helper: the same database through an asyncio driver
+def _get_async_database_url(database_url: str):
+    url = make_url(database_url)
+
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes ssl=<mode> instead of libpq's sslmode=<mode>
+        if "sslmode" in url.query:
+            url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+        return url
+
+    return url
+
+
 # Determine final DB URL
 DATABASE_URL = os.getenv("DATABASE_URL") or settings.DATABASE_URL
 DATABASE_URL = _get_sqlalchemy_database_url(DATABASE_URL)
@@ -43,20 +66,100 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# Async engine for request handlers, so queries don't block the event loop.
+# The sync engine above stays for startup, scripts and worker threads.
+ASYNC_DATABASE_URL = _get_async_database_url(DATABASE_URL)
+
+if ASYNC_DATABASE_URL.get_backend_name() == "sqlite":
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+    )
+
+# expire_on_commit=False: attributes can't lazy-load outside an await, so
+# objects keep their loaded values after commit (refresh() to reload)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Per-request DB activity counters; set by the debug middleware in main.py
+db_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("db_stats", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = db_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+
+
+def _count_commit(conn):
+    stats = db_stats.get()
+    if stats is not None:
+        stats["commits"] += 1
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _count_query)
+    event.listen(_engine, "commit", _count_commit)
+
+
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP has no fractional seconds, so it neither compares
+    # equal to nor sorts with the datetimes SQLAlchemy binds. Write the same
+    # text format instead (cursor pagination compares created_at values).
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
 Base = declarative_base()
 
 
-def get_db():
-    """FastAPI dependency that yields a SQLAlchemy session."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """
+    FastAPI dependency that yields an AsyncSession.
+
+    Services written against a sync Session run through db.run_sync(),
+    which keeps their I/O on the async driver.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def create_tables():
     """Create all database tables (used in simple deployments)."""
     from app import models  # import models so they are registered on Base
+    from app.services.search_service import install_search_index
+    from app.services.rollup_service import rebuild_rollup
+    from app.migrations import run_migrations
 
+    new_rollup = not inspect(engine).has_table(models.PaymentDailyRollup.__tablename__)
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    # create_all skips tables that already exist, so add indexes declared
+    # after a table was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    if engine.dialect.name == "sqlite":
+        # Rows written before _sqlite_now lack fractional seconds
+        with engine.begin() as conn:
+            for table in ("students", "payments", "wallet_transactions", "sms_logs"):
+                conn.execute(text(
+                    f"UPDATE {table} SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+                ))
+
+    install_search_index(engine)
+
+    if new_rollup:
+        # Seed the rollup from existing payments the first time it exists
+        db = SessionLocal()
+        try:
+            rebuild_rollup(db)
+            db.commit()
+        finally:
+            db.close()
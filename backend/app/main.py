@@ -1,8 +1,13 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import create_tables
-from app.routers import auth, wallet, sms, students, payments, fees, admin
+from app.database import async_engine, create_tables, db_stats
+from app.middleware import IdempotencyMiddleware, MaintenanceMiddleware
+from app.pagination import NEXT_CURSOR_HEADER
+from app.routers import auth, wallet, sms, students, payments, fees, admin, dashboard, reports
+from app.services import sms_service, outbox_service, subscription_service, idempotency_service
 import logging
 
 # Configure logging
@@ -16,13 +21,49 @@ logger = logging.getLogger(__name__)
 # Create database tables (uses helper that handles different DB backends)
 create_tables()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown"""
+    await sms_service.open_http_client()
+    
+    outbox_worker = None
+    if settings.SMS_OUTBOX_BACKEND == "inprocess":
+        outbox_worker = asyncio.create_task(outbox_service.run_outbox_worker())
+    
+    subscription_sweeper = None
+    if settings.SUBSCRIPTION_SWEEP_INTERVAL > 0:
+        subscription_sweeper = asyncio.create_task(subscription_service.run_subscription_sweeper())
+    
+    idempotency_purger = None
+    if settings.IDEMPOTENCY_BACKEND == "database" and settings.IDEMPOTENCY_PURGE_INTERVAL > 0:
+        idempotency_purger = asyncio.create_task(idempotency_service.run_idempotency_purger())
+    
+    yield
+    
+    for task in (outbox_worker, subscription_sweeper, idempotency_purger):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    await sms_service.close_http_client()
+    await async_engine.dispose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="Multi-tenant School Fee Management System with SMS Integration"
+    description="Multi-tenant School Fee Management System with SMS Integration",
+    lifespan=lifespan
 )
 
+# Replay responses for repeated Idempotency-Key headers (inside CORS)
+app.add_middleware(IdempotencyMiddleware)
+
+# Refuse requests during maintenance before any route work (inside CORS)
+app.add_middleware(MaintenanceMiddleware)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,8 +71,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+if settings.DEBUG_DB_STATS:
+    @app.middleware("http")
+    async def count_db_activity(request: Request, call_next):
+        """Expose per-request query and commit counts so regressions are visible"""
+        stats = {"queries": 0, "commits": 0}
+        token = db_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            db_stats.reset(token)
+        response.headers["X-DB-Queries"] = str(stats["queries"])
+        response.headers["X-DB-Commits"] = str(stats["commits"])
+        return response
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(wallet.router)
@@ -39,6 +95,8 @@ app.include_router(sms.router)
 app.include_router(students.router)
 app.include_router(payments.router)
 app.include_router(fees.router)
+app.include_router(dashboard.router)
+app.include_router(reports.router)
 app.include_router(admin.router)  # Admin routes for SMS pricing & settings
 
 @app.get("/")
@@ -58,6 +116,7 @@ async def health_check():
         "status": "healthy",
         "database": "connected",
         "sms_provider": "arkesel",
+        "sms_http": sms_service.get_connection_stats(),
         "version": settings.VERSION
     }
 
@@ -0,0 +1,178 @@
+import hashlib
+import json
+from typing import Optional
+from jose import JWTError, jwt
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.config_cache import config_cache
+from app.services.idempotency_service import get_idempotency_store, COMPLETED
+
+# (method, path) pairs that honour the Idempotency-Key header
+IDEMPOTENT_ROUTES = {
+    ("POST", "/payments/"),
+    ("POST", "/payments/batch"),
+    ("POST", "/payments/batch/upload"),
+    ("POST", "/wallet/topup"),
+}
+
+# Still served during maintenance: health checks, docs, login and the
+# admin routes needed to switch maintenance off again
+MAINTENANCE_EXEMPT_PATHS = {"/", "/health", "/docs", "/redoc", "/openapi.json", "/auth/login"}
+MAINTENANCE_EXEMPT_PREFIXES = ("/admin/",)
+
+
+def _token_subject(headers: dict) -> Optional[str]:
+    """Read the JWT subject without touching the database"""
+    authorization = headers.get(b"authorization", b"").decode()
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def _plain_response(status_code: int, body: bytes, content_type: str, extra_headers=()):
+    headers = [
+        (b"content-type", content_type.encode()),
+        (b"content-length", str(len(body)).encode()),
+        *extra_headers,
+    ]
+    return [
+        {"type": "http.response.start", "status": status_code, "headers": headers},
+        {"type": "http.response.body", "body": body},
+    ]
+
+
+def _error(status_code: int, detail: str):
+    return _plain_response(status_code, json.dumps({"detail": detail}).encode(), "application/json")
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response for a repeated Idempotency-Key
+
+    Replays are answered here, before validation, auth or any DB write in
+    the route. Only successful (2xx) responses are stored; failures release
+    the key so the client can retry.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key", b"").decode().strip()
+        subject = _token_subject(headers) if key else None
+        if not key or not subject:
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the body so it can be fingerprinted and replayed to the route
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        fingerprint = hashlib.sha256(
+            scope["method"].encode() + b" " + scope["path"].encode() + b"?" + scope["query_string"] + b"\n" + body
+        ).hexdigest()
+
+        store = get_idempotency_store()
+        existing = await store.reserve(subject, key, fingerprint)
+
+        if existing is not None:
+            if existing["fingerprint"] != fingerprint:
+                messages = _error(422, "Idempotency-Key was already used with a different request")
+            elif existing["status"] != COMPLETED:
+                messages = _error(409, "A request with this Idempotency-Key is still being processed")
+            else:
+                messages = _plain_response(
+                    existing["response_status"],
+                    existing["response_body"].encode(),
+                    existing["content_type"] or "application/json",
+                    extra_headers=[(b"idempotent-replayed", b"true")]
+                )
+            for message in messages:
+                await send(message)
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "content_type": "application/json", "body": []}
+
+        async def capture_send(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        response["content_type"] = value.decode()
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await store.release(subject, key)
+            raise
+
+        if 200 <= response["status"] < 300:
+            await store.complete(
+                subject,
+                key,
+                response["status"],
+                b"".join(response["body"]).decode(),
+                response["content_type"]
+            )
+        else:
+            await store.release(subject, key)
+
+
+class MaintenanceMiddleware:
+    """
+    Answer 503 while SystemSettings.maintenance_mode is on
+
+    Reads the config_cache snapshot, so the check costs no query except the
+    periodic version check (the session only connects if that is due).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or path in MAINTENANCE_EXEMPT_PATHS
+            or path.startswith(MAINTENANCE_EXEMPT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async with AsyncSessionLocal() as db:
+            system_settings = (await config_cache.get(db)).system_settings
+
+        if system_settings and system_settings.maintenance_mode:
+            for message in _error(503, "The system is under maintenance. Please try again shortly."):
+                await send(message)
+            return
+
+        await self.app(scope, receive, send)
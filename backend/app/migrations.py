@@ -0,0 +1,57 @@
+"""
+Schema changes for existing databases
+
+create_all() only creates missing tables, so columns added to a model
+after its table exists are added here, with a backfill, on startup.
+Each step is skipped once the column is present.
+"""
+
+from typing import Callable, List, NamedTuple, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from app.services.school_service import recount_students
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AddColumn(NamedTuple):
+    table: str
+    column: str
+    ddl: str  # portable column definition for ALTER TABLE ... ADD COLUMN
+    backfill: Optional[Callable[[Connection], None]] = None
+
+
+def backfill_fee_record_schools(conn: Connection):
+    conn.execute(text(
+        "UPDATE student_fee_records SET school_id = "
+        "(SELECT students.school_id FROM students WHERE students.id = student_fee_records.student_id) "
+        "WHERE school_id IS NULL"
+    ))
+
+
+MIGRATIONS: List[AddColumn] = [
+    AddColumn("schools", "student_count", "INTEGER NOT NULL DEFAULT 0", recount_students),
+    AddColumn(
+        "student_fee_records",
+        "school_id",
+        "INTEGER REFERENCES schools(id) ON DELETE CASCADE",
+        backfill_fee_record_schools
+    ),
+]
+
+
+def run_migrations(engine: Engine):
+    """Apply pending MIGRATIONS, each in its own transaction"""
+    inspector = inspect(engine)
+    for migration in MIGRATIONS:
+        if not inspector.has_table(migration.table):
+            continue
+        if migration.column in {column["name"] for column in inspector.get_columns(migration.table)}:
+            continue
+
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {migration.table} ADD COLUMN {migration.column} {migration.ddl}"))
+            if migration.backfill:
+                migration.backfill(conn)
+        logger.info(f"Added {migration.table}.{migration.column}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Enum, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -33,6 +33,7 @@ class School(Base):
     email = Column(String(255))
     subscription_plan = Column(Enum(SubscriptionPlan), default=SubscriptionPlan.FREE_TRIAL)
     is_active = Column(Boolean, default=True)
+    student_count = Column(Integer, nullable=False, default=0, server_default="0")  # Maintained by school_service
     created_at = Column(DateTime, default=func.now())
 
     # Relationships
@@ -84,6 +85,10 @@ class User(Base):
 class Student(Base):
     """Students belong to a specific user (tenant)"""
     __tablename__ = "students"
+    __table_args__ = (
+        # Keyset pagination: newest first by (created_at, id) per tenant
+        Index("ix_students_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -145,10 +150,15 @@ class FeeStructure(Base):
 class StudentFeeRecord(Base):
     """Tracks individual fee type payment status per student"""
     __tablename__ = "student_fee_records"
+    __table_args__ = (
+        # Fee record lookup when crediting a payment (student, term, fee type)
+        Index("ix_student_fee_records_lookup", "student_id", "term", "fee_type"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
-    fee_structure_id = Column(Integer, ForeignKey("fee_structures.id", ondelete="CASCADE"), nullable=False)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=True, index=True)  # Denormalized from the student
+    fee_structure_id = Column(Integer, ForeignKey("fee_structures.id", ondelete="CASCADE"), nullable=False, index=True)  # Fee structure change propagation
     
     fee_type = Column(String(100), nullable=False)
     amount = Column(Float, nullable=False)
@@ -168,6 +178,11 @@ class StudentFeeRecord(Base):
 class Payment(Base):
     """Payment transactions"""
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_user_created", "user_id", "created_at", "id"),
+        # Date-range collection reports
+        Index("ix_payments_school_date", "school_id", "payment_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -196,12 +211,15 @@ class Payment(Base):
 class WalletTransaction(Base):
     """Wallet top-ups and SMS purchases"""
     __tablename__ = "wallet_transactions"
+    __table_args__ = (
+        Index("ix_wallet_transactions_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=True, index=True)
     
-    transaction_type = Column(String(20), nullable=False)  # topup, sms_purchase, sms_usage
+    transaction_type = Column(String(20), nullable=False)  # topup, sms_purchase, sms_usage, sms_refund
     amount = Column(Float)  # For top-ups and purchases
     sms_units = Column(Integer)  # SMS units involved
     description = Column(Text)
@@ -222,6 +240,9 @@ class WalletTransaction(Base):
 class SMSLog(Base):
     """SMS sending logs"""
     __tablename__ = "sms_logs"
+    __table_args__ = (
+        Index("ix_sms_logs_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -243,6 +264,105 @@ class SMSLog(Base):
     school = relationship("School", back_populates="sms_logs")
 
 
+class PaymentDailyRollup(Base):
+    """Payments summed per tenant, day and dimension; maintained as payments are posted"""
+    __tablename__ = "payment_daily_rollup"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "day", "fee_type", "payment_method", "student_class", "term", "academic_year",
+            name="uq_payment_daily_rollup_key"
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=True, index=True)
+    day = Column(Date, nullable=False)
+    
+    # Dimensions; empty string instead of NULL so the unique key can be upserted
+    fee_type = Column(String(100), nullable=False, default="")
+    payment_method = Column(String(50), nullable=False, default="")
+    student_class = Column(String(50), nullable=False, default="")
+    term = Column(String(20), nullable=False, default="")
+    academic_year = Column(String(20), nullable=False, default="")
+    
+    amount = Column(Float, nullable=False, default=0.0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
+
+class SMSOutbox(Base):
+    """Durable queue of SMS waiting to be delivered by the outbox worker"""
+    __tablename__ = "sms_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=True, index=True)
+    sms_log_id = Column(Integer, ForeignKey("sms_logs.id", ondelete="CASCADE"), nullable=False)
+    job_id = Column(String(36), nullable=False, index=True)  # Groups messages enqueued together
+    
+    recipient = Column(String(20), nullable=False)
+    message = Column(Text, nullable=False)
+    sender_id = Column(String(11))
+    description = Column(Text)  # Wallet transaction description on delivery
+    
+    status = Column(String(20), default="queued", index=True)  # queued, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=func.now())
+    error_message = Column(Text)
+    
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    sms_log = relationship("SMSLog")
+
+
+class BillingRun(Base):
+    """A term billing job: attaches missing fee records to enrolled students, with progress"""
+    __tablename__ = "billing_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="CASCADE"), nullable=True, index=True)
+    
+    academic_year = Column(String(20), nullable=False)
+    term = Column(String(20), nullable=False)
+    level = Column(String(50))  # Only students in this class; None bills every class
+    
+    status = Column(String(20), default="queued")  # queued, running, completed, failed
+    total_students = Column(Integer, default=0)
+    processed_students = Column(Integer, default=0)
+    records_created = Column(Integer, default=0)
+    amount_billed = Column(Float, default=0.0)
+    error_message = Column(Text)
+    
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class IdempotencyRecord(Base):
+    """Stored responses for requests sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_scope_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(100), nullable=False)  # Token subject (username)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # Hash of method, path and body
+    
+    status = Column(String(20), default="in_progress")  # in_progress, completed
+    response_status = Column(Integer)
+    response_body = Column(Text)
+    content_type = Column(String(100))
+    
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
 class SMSPricing(Base):
     """SMS pricing configuration"""
     __tablename__ = "sms_pricing"
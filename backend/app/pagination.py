@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, desc, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Largest limit a list endpoint accepts
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the (created_at, id) position of a row"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    model,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+):
+    """
+    Newest-first page of a select, ordered by (created_at, id)
+
+    With a cursor the page starts right after the row it points to
+    (keyset pagination); without one, skip/limit offset paging is used.
+    Either way the cursor for the following page is returned in the
+    X-Next-Cursor header when more rows exist.
+
+    Args:
+        model: Mapped class with created_at and id columns
+        limit: Page size, at least 1 (routes validate it with Query(ge=1))
+    """
+    query = query.order_by(desc(model.created_at), desc(model.id))
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+
+    # One extra row tells us whether there is a next page
+    rows = (await db.scalars(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if last.created_at is not None:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+
+    return rows
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
 from ..database import get_db
 from ..models import User, SMSPricing, SystemSettings
 from ..services.auth_service import get_current_user
+from ..services.cache import tenant_cache
+from ..services.config_cache import config_cache, get_active_pricing
+from ..services.statistics_service import platform_summary
 from pydantic import BaseModel, Field
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# tenant_cache scope for platform-wide values (tenants are keyed by user id)
+PLATFORM_SCOPE = "platform"
+
 
 # ========================
 # SMS Pricing Schemas
@@ -102,15 +109,13 @@ class SystemSettingsResponse(BaseModel):
 # ========================
 
 @router.get("/sms-pricing/current", response_model=SMSPricingResponse)
-async def get_current_sms_pricing(db: Session = Depends(get_db)):
+async def get_current_sms_pricing(db: AsyncSession = Depends(get_db)):
     """
     Get the current active SMS pricing.
     
     Returns the currently active pricing configuration for SMS.
     """
-    pricing = db.query(SMSPricing).filter(
-        SMSPricing.is_active == True
-    ).order_by(SMSPricing.effective_from.desc()).first()
+    pricing = await get_active_pricing(db)
     
     if not pricing:
         # Return default pricing if none exists
@@ -125,7 +130,7 @@ async def get_current_sms_pricing(db: Session = Depends(get_db)):
 @router.get("/sms-pricing/history", response_model=List[SMSPricingResponse])
 async def get_sms_pricing_history(
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -134,9 +139,9 @@ async def get_sms_pricing_history(
     Returns historical pricing changes (admin only).
     """
     # Only allow for super admin (you can add admin role check here)
-    pricings = db.query(SMSPricing).order_by(
-        SMSPricing.effective_from.desc()
-    ).limit(limit).all()
+    pricings = (await db.scalars(
+        select(SMSPricing).order_by(SMSPricing.effective_from.desc()).limit(limit)
+    )).all()
     
     return pricings
 
@@ -144,7 +149,7 @@ async def get_sms_pricing_history(
 @router.post("/sms-pricing", response_model=SMSPricingResponse, status_code=201)
 async def create_sms_pricing(
     pricing: SMSPricingCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -154,7 +159,7 @@ async def create_sms_pricing(
     Previous pricing is automatically deactivated.
     """
     # Deactivate all previous pricing
-    db.query(SMSPricing).update({"is_active": False})
+    await db.execute(update(SMSPricing).values(is_active=False))
     
     # Create new pricing
     new_pricing = SMSPricing(
@@ -166,8 +171,9 @@ async def create_sms_pricing(
     )
     
     db.add(new_pricing)
-    db.commit()
-    db.refresh(new_pricing)
+    await db.commit()
+    await db.refresh(new_pricing)
+    await config_cache.refresh(db)
     
     return new_pricing
 
@@ -176,7 +182,7 @@ async def create_sms_pricing(
 async def update_sms_pricing(
     pricing_id: int,
     pricing: SMSPricingUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -184,7 +190,7 @@ async def update_sms_pricing(
     
     Modify an existing pricing configuration.
     """
-    db_pricing = db.query(SMSPricing).filter(SMSPricing.id == pricing_id).first()
+    db_pricing = await db.scalar(select(SMSPricing).where(SMSPricing.id == pricing_id))
     
     if not db_pricing:
         raise HTTPException(status_code=404, detail="SMS pricing not found")
@@ -195,10 +201,11 @@ async def update_sms_pricing(
     
     # If activating this pricing, deactivate others
     if pricing.is_active:
-        db.query(SMSPricing).filter(SMSPricing.id != pricing_id).update({"is_active": False})
+        await db.execute(update(SMSPricing).where(SMSPricing.id != pricing_id).values(is_active=False))
     
-    db.commit()
-    db.refresh(db_pricing)
+    await db.commit()
+    await db.refresh(db_pricing)
+    await config_cache.refresh(db)
     
     return db_pricing
 
@@ -209,16 +216,14 @@ class SMSCostCalculation(BaseModel):
 @router.post("/sms-pricing/calculate-cost")
 async def calculate_sms_cost(
     calculation: SMSCostCalculation,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Calculate SMS purchase cost with discounts.
     
     Returns the total cost, discount applied, and final price.
     """
-    pricing = db.query(SMSPricing).filter(
-        SMSPricing.is_active == True
-    ).first()
+    pricing = await get_active_pricing(db)
     
     if not pricing:
         raise HTTPException(status_code=404, detail="No active pricing found")
@@ -253,7 +258,7 @@ async def calculate_sms_cost(
 
 @router.get("/settings", response_model=SystemSettingsResponse)
 async def get_system_settings(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -261,7 +266,7 @@ async def get_system_settings(
     
     Returns current configuration for the entire system.
     """
-    settings = db.query(SystemSettings).first()
+    settings = (await config_cache.get(db)).system_settings
     
     if not settings:
         # Create default settings if none exist
@@ -276,8 +281,9 @@ async def get_system_settings(
             max_students_per_school=1000
         )
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
+        await config_cache.refresh(db)
     
     return settings
 
@@ -285,7 +291,7 @@ async def get_system_settings(
 @router.put("/settings", response_model=SystemSettingsResponse)
 async def update_system_settings(
     settings: SystemSettingsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -293,7 +299,7 @@ async def update_system_settings(
     
     Modify global system configuration.
     """
-    db_settings = db.query(SystemSettings).first()
+    db_settings = await db.scalar(select(SystemSettings).limit(1))
     
     if not db_settings:
         # Create if doesn't exist
@@ -306,61 +312,27 @@ async def update_system_settings(
     
     db_settings.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_settings)
+    await db.commit()
+    await db.refresh(db_settings)
+    await config_cache.refresh(db)
     
     return db_settings
 
 
 @router.get("/statistics")
 async def get_admin_statistics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get overall system statistics (Admin only).
     
-    Returns statistics for all schools in the system.
+    Returns statistics for all schools in the system, computed in two
+    aggregate queries and cached for TENANT_CACHE_TTL_SECONDS;
+    `generated_at` tells how fresh they are.
     """
-    from ..models import Student, Payment, WalletTransaction, SMSLog
-    
-    total_schools = db.query(User).count()
-    total_students = db.query(Student).count()
-    total_payments = db.query(Payment).count()
-    
-    # Calculate total revenue
-    total_revenue = db.query(db.func.sum(Payment.amount)).scalar() or 0
-    
-    # SMS statistics
-    total_sms_sent = db.query(SMSLog).count()
-    total_wallet_transactions = db.query(WalletTransaction).count()
-    
-    # Active subscriptions
-    active_trials = db.query(User).filter(
-        User.subscription_plan == "Free Trial",
-        User.subscription_status == "active"
-    ).count()
-    
-    active_basic = db.query(User).filter(
-        User.subscription_plan == "Basic",
-        User.subscription_status == "active"
-    ).count()
-    
-    active_premium = db.query(User).filter(
-        User.subscription_plan == "Premium",
-        User.subscription_status == "active"
-    ).count()
-    
-    return {
-        "total_schools": total_schools,
-        "total_students": total_students,
-        "total_payments": total_payments,
-        "total_revenue": round(total_revenue, 2),
-        "total_sms_sent": total_sms_sent,
-        "total_wallet_transactions": total_wallet_transactions,
-        "subscriptions": {
-            "free_trial": active_trials,
-            "basic": active_basic,
-            "premium": active_premium
-        }
-    }
+    return await tenant_cache.get_or_set_async(
+        PLATFORM_SCOPE,
+        "admin-statistics",
+        lambda: db.run_sync(platform_summary)
+    )
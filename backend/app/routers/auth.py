@@ -1,34 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app import models, schemas
 from app.services.auth_service import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     get_current_user,
     calculate_subscription_end_date
 )
+from app.services.cache import invalidate_principals
+from app.services.kv_store import get_kv_store
 from datetime import timedelta
 from app.config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
-# Temporary store for reset codes (use Redis or DB in production)
-reset_codes = {}
+def _reset_code_key(email: str) -> str:
+    return f"reset-code:{email}"
 
 
 @router.post("/register-school", response_model=schemas.Token, status_code=status.HTTP_201_CREATED)
-async def register_school(reg_data: schemas.SchoolRegistration, db: Session = Depends(get_db)):
+async def register_school(reg_data: schemas.SchoolRegistration, db: AsyncSession = Depends(get_db)):
     """Register a new school (tenant) with an admin user"""
     # Check subdomain availability
-    existing_school = db.query(models.School).filter(models.School.subdomain == reg_data.subdomain.lower()).first()
+    existing_school = await db.scalar(select(models.School).where(models.School.subdomain == reg_data.subdomain.lower()))
     if existing_school:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Subdomain already taken")
 
     # Check admin email
-    existing_user = db.query(models.User).filter(models.User.email == reg_data.admin_email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == reg_data.admin_email))
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admin email already registered")
 
@@ -43,13 +46,13 @@ async def register_school(reg_data: schemas.SchoolRegistration, db: Session = De
         is_active=True
     )
     db.add(school)
-    db.flush()  # to get school.id
+    await db.flush()  # to get school.id
 
     # Create admin user
     admin_user = models.User(
         username=reg_data.admin_username.lower(),
         email=reg_data.admin_email,
-        hashed_password=get_password_hash(reg_data.admin_password),
+        hashed_password=await get_password_hash_async(reg_data.admin_password),
         school_name=reg_data.school_name,
         phone=reg_data.admin_phone,
         subscription_plan=models.SubscriptionPlan.FREE_TRIAL,
@@ -59,9 +62,9 @@ async def register_school(reg_data: schemas.SchoolRegistration, db: Session = De
         school_id=school.id
     )
     db.add(admin_user)
-    db.commit()
-    db.refresh(admin_user)
-    db.refresh(school)
+    await db.commit()
+    await db.refresh(admin_user)
+    await db.refresh(school)
 
     # Create token including school_id
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -73,9 +76,9 @@ async def register_school(reg_data: schemas.SchoolRegistration, db: Session = De
     return {"access_token": access_token, "token_type": "bearer", "user": admin_user, "school": school}
 
 @router.post("/register", response_model=schemas.Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user under an existing school/tenant"""
-    school = db.query(models.School).filter(models.School.subdomain == user_data.school_subdomain.lower()).first()
+    school = await db.scalar(select(models.School).where(models.School.subdomain == user_data.school_subdomain.lower()))
     if not school:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="School subdomain not found")
 
@@ -83,20 +86,20 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="School subscription is inactive")
 
     # Check unique username/email
-    existing_user = db.query(models.User).filter(models.User.username == user_data.username.lower()).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.username == user_data.username.lower()))
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
 
-    existing_email = db.query(models.User).filter(models.User.email == user_data.email).first()
+    existing_email = await db.scalar(select(models.User).where(models.User.email == user_data.email))
     if existing_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
     # Mirror subscription context from an existing school user (usually the admin)
-    subscription_source = (
-        db.query(models.User)
-        .filter(models.User.school_id == school.id)
+    subscription_source = await db.scalar(
+        select(models.User)
+        .where(models.User.school_id == school.id)
         .order_by(models.User.created_at.asc())
-        .first()
+        .limit(1)
     )
 
     subscription_plan = subscription_source.subscription_plan if subscription_source else models.SubscriptionPlan.FREE_TRIAL
@@ -120,7 +123,7 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
     new_user = models.User(
         username=user_data.username.lower(),
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         school_name=school.name,
         school_id=school.id,
         phone=user_data.phone,
@@ -133,8 +136,8 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -150,7 +153,7 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
     }
 
 @router.post("/login", response_model=schemas.Token)
-async def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     """
     Login with username and password
     Returns JWT token for authenticated requests
@@ -158,11 +161,15 @@ async def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     # Support login via username or email
     user = None
     if credentials.email:
-        user = db.query(models.User).filter(models.User.email == credentials.email).first()
+        user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
     elif credentials.username:
-        user = db.query(models.User).filter(models.User.username == credentials.username.lower()).first()
+        user = await db.scalar(select(models.User).where(models.User.username == credentials.username.lower()))
 
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_password_async(credentials.password, user.hashed_password)
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -177,10 +184,15 @@ async def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     
     # If subdomain provided, ensure user belongs to that school
     if credentials.subdomain and user.school_id:
-        sch = db.query(models.School).filter(models.School.id == user.school_id).first()
+        sch = await db.scalar(select(models.School).where(models.School.id == user.school_id))
         if not sch or sch.subdomain != credentials.subdomain.lower():
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials for this school")
 
+    # Stored with a different BCRYPT_ROUNDS: keep the hash at the current cost
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
     # Create access token including school claim when available
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token_data = {"sub": user.username}
@@ -191,7 +203,7 @@ async def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
 
     school_obj = None
     if user.school_id:
-        school_obj = db.query(models.School).filter(models.School.id == user.school_id).first()
+        school_obj = await db.scalar(select(models.School).where(models.School.id == user.school_id))
 
     return {"access_token": access_token, "token_type": "bearer", "user": user, "school": school_obj}
 
@@ -204,7 +216,7 @@ async def get_me(current_user: models.User = Depends(get_current_user)):
 async def update_profile(
     user_update: schemas.UserUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user profile"""
     if user_update.school_name:
@@ -221,18 +233,19 @@ async def update_profile(
             )
         current_user.arkesel_sender_id = user_update.arkesel_sender_id
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    await db.refresh(current_user)
     return current_user
 
 @router.post("/forgot-password")
-async def forgot_password(data: schemas.ForgotPassword, db: Session = Depends(get_db)):
+async def forgot_password(data: schemas.ForgotPassword, db: AsyncSession = Depends(get_db)):
     """
     Request password reset
     In production, this should send an email with a reset token
     For now, returns a temporary reset code
     """
-    user = db.query(models.User).filter(models.User.email == data.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == data.email))
     
     if not user:
         # Don't reveal if email exists for security
@@ -241,17 +254,17 @@ async def forgot_password(data: schemas.ForgotPassword, db: Session = Depends(ge
     # Generate a simple reset code (in production, use proper token generation)
     import random, string
     reset_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    reset_codes[data.email] = {"code": reset_code}
+    await get_kv_store().set(_reset_code_key(data.email), {"code": reset_code}, settings.RESET_CODE_TTL_SECONDS)
 
     return {"message": "If the email exists, a reset code has been sent", "reset_code": reset_code}
 
 @router.post("/reset-password")
-async def reset_password(data: schemas.ResetPassword, db: Session = Depends(get_db)):
+async def reset_password(data: schemas.ResetPassword, db: AsyncSession = Depends(get_db)):
     """
     Reset password using reset code
     In production, validate the reset token properly
     """
-    user = db.query(models.User).filter(models.User.email == data.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == data.email))
     
     if not user:
         raise HTTPException(
@@ -259,13 +272,15 @@ async def reset_password(data: schemas.ResetPassword, db: Session = Depends(get_
             detail="User not found"
         )
     
-    # Validate reset code
-    if data.email not in reset_codes or reset_codes[data.email]["code"] != data.reset_code:
+    # Validate reset code (expires after RESET_CODE_TTL_SECONDS)
+    store = get_kv_store()
+    stored = await store.get(_reset_code_key(data.email))
+    if not stored or stored["code"] != data.reset_code:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired reset code")
 
-    user.hashed_password = get_password_hash(data.new_password)
+    user.hashed_password = await get_password_hash_async(data.new_password)
     # remove used code
-    del reset_codes[data.email]
-    db.commit()
+    await store.delete(_reset_code_key(data.email))
+    await db.commit()
 
     return {"message": "Password reset successfully"}
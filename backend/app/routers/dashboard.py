@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app import models, schemas
+from app.services.auth_service import get_current_user, require_active_school
+from app.services.cache import tenant_cache
+from app.services.statistics_service import dashboard_summary
+from datetime import datetime
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+@router.get("/", response_model=schemas.DashboardStats)
+async def get_dashboard(
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Dashboard overview in one call
+    - Student counts, fees collected and outstanding, recent payments and students
+    - Aggregates are cached per school and refreshed whenever students or payments change
+    - Wallet/SMS balances and subscription days left are always live
+    """
+    summary = await tenant_cache.get_or_set_async(
+        current_user.id,
+        "dashboard",
+        lambda: db.run_sync(dashboard_summary, current_user)
+    )
+
+    days_left = None
+    if current_user.subscription_end_date:
+        days_left = max((current_user.subscription_end_date - datetime.now()).days, 0)
+
+    return {
+        **summary,
+        "sms_balance": current_user.sms_balance or 0,
+        "wallet_balance": current_user.wallet_balance or 0.0,
+        "subscription_days_left": days_left
+    }
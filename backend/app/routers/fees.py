@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from app.database import get_db
 from app import models, schemas
 from app.services.auth_service import get_current_user, require_active_school
+from app.services.billing_service import create_billing_run, execute_billing_run
+from app.services.cache import invalidate_tenant
+from app.services.fee_service import fee_change_impact, is_billed, propagate_fee_change
 
 router = APIRouter(prefix="/fees", tags=["Fee Structure"])
 
@@ -13,19 +16,20 @@ async def create_fee_structure(
     fee_data: schemas.FeeStructureCreate,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new fee structure"""
     # Check if fee type already exists for this year/term/level
-    existing = db.query(models.FeeStructure)\
-        .filter(
+    existing = await db.scalar(
+        select(models.FeeStructure).where(
             models.FeeStructure.user_id == current_user.id,
             models.FeeStructure.school_id == current_user.school_id,
             models.FeeStructure.academic_year == fee_data.academic_year,
             models.FeeStructure.term == fee_data.term,
             models.FeeStructure.fee_type == fee_data.fee_type,
             models.FeeStructure.level == fee_data.level
-        ).first()
+        )
+    )
     
     if existing:
         raise HTTPException(
@@ -44,8 +48,8 @@ async def create_fee_structure(
     )
     
     db.add(new_fee)
-    db.commit()
-    db.refresh(new_fee)
+    await db.commit()
+    await db.refresh(new_fee)
     
     return new_fee
 
@@ -56,30 +60,30 @@ async def get_fee_structures(
     level: Optional[str] = None,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all fee structures for current user
     Optional filters: academic_year, term, level
     """
-    query = db.query(models.FeeStructure).filter(models.FeeStructure.user_id == current_user.id)
+    query = select(models.FeeStructure).where(models.FeeStructure.user_id == current_user.id)
     if current_user.school_id:
-        query = query.filter(models.FeeStructure.school_id == current_user.school_id)
+        query = query.where(models.FeeStructure.school_id == current_user.school_id)
     
     if academic_year:
-        query = query.filter(models.FeeStructure.academic_year == academic_year)
+        query = query.where(models.FeeStructure.academic_year == academic_year)
     
     if term:
-        query = query.filter(models.FeeStructure.term == term)
+        query = query.where(models.FeeStructure.term == term)
     
     if level:
-        query = query.filter(models.FeeStructure.level == level)
+        query = query.where(models.FeeStructure.level == level)
     
-    fees = query.order_by(
+    fees = (await db.scalars(query.order_by(
         models.FeeStructure.academic_year.desc(),
         models.FeeStructure.term,
         models.FeeStructure.fee_type
-    ).all()
+    ))).all()
     
     return fees
 
@@ -88,16 +92,16 @@ async def get_fee_structure(
     fee_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific fee structure by ID"""
-    fee = db.query(models.FeeStructure).filter(
+    query = select(models.FeeStructure).where(
         models.FeeStructure.id == fee_id,
         models.FeeStructure.user_id == current_user.id
     )
     if current_user.school_id:
-        fee = fee.filter(models.FeeStructure.school_id == current_user.school_id)
-    fee = fee.first()
+        query = query.where(models.FeeStructure.school_id == current_user.school_id)
+    fee = await db.scalar(query)
     
     if not fee:
         raise HTTPException(
@@ -107,22 +111,29 @@ async def get_fee_structure(
     
     return fee
 
-@router.put("/{fee_id}", response_model=schemas.FeeStructureResponse)
+@router.put("/{fee_id}", response_model=Union[schemas.FeeStructureResponse, schemas.FeeChangeImpact])
 async def update_fee_structure(
     fee_id: int,
     fee_update: schemas.FeeStructureUpdate,
+    dry_run: bool = Query(False, description="Report the students an amount change would affect without saving"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Update a fee structure"""
-    fee = db.query(models.FeeStructure).filter(
+    """
+    Update a fee structure
+    - A new amount is applied to every student already billed for this fee
+      (fee record amount/balance/status and student total/balance/status)
+    - The level can only change before the fee is billed (409 afterwards)
+    - dry_run=true returns the affected students and amounts instead
+    """
+    query = select(models.FeeStructure).where(
         models.FeeStructure.id == fee_id,
         models.FeeStructure.user_id == current_user.id
     )
     if current_user.school_id:
-        fee = fee.filter(models.FeeStructure.school_id == current_user.school_id)
-    fee = fee.first()
+        query = query.where(models.FeeStructure.school_id == current_user.school_id)
+    fee = await db.scalar(query)
     
     if not fee:
         raise HTTPException(
@@ -130,32 +141,56 @@ async def update_fee_structure(
             detail="Fee structure not found"
         )
     
+    # The level decides who is billed; changing it would leave records on
+    # students it no longer applies to, so it is only allowed before billing
+    if fee_update.level is not None and fee_update.level != fee.level:
+        if await db.run_sync(is_billed, fee.id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This fee has already been billed to students, so its level can't change. "
+                       "Create a new fee structure for the other level instead."
+            )
+    
+    if dry_run:
+        if fee_update.amount is None:
+            return schemas.FeeChangeImpact(affected_students=0, affected_records=0, total_fees_delta=0.0, students=[])
+        return await db.run_sync(fee_change_impact, fee.id, fee_update.amount)
+    
     if fee_update.amount is not None:
         fee.amount = fee_update.amount
+        await db.run_sync(propagate_fee_change, fee.id, fee_update.amount)
     
     if fee_update.level is not None:
         fee.level = fee_update.level
     
-    db.commit()
-    db.refresh(fee)
+    await db.commit()
+    if fee_update.amount is not None:
+        invalidate_tenant(current_user.id)
+    await db.refresh(fee)
     
     return fee
 
 @router.delete("/{fee_id}")
 async def delete_fee_structure(
     fee_id: int,
+    dry_run: bool = Query(False, description="Report the students the deletion would affect without deleting"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Delete a fee structure"""
-    fee = db.query(models.FeeStructure).filter(
+    """
+    Delete a fee structure
+    - Its fee records are removed and their amounts taken off each billed
+      student's total fees (payments already received are kept)
+    - dry_run=true returns the affected students and amounts instead
+    """
+    query = select(models.FeeStructure).where(
         models.FeeStructure.id == fee_id,
         models.FeeStructure.user_id == current_user.id
     )
     if current_user.school_id:
-        fee = fee.filter(models.FeeStructure.school_id == current_user.school_id)
-    fee = fee.first()
+        query = query.where(models.FeeStructure.school_id == current_user.school_id)
+    fee = await db.scalar(query)
     
     if not fee:
         raise HTTPException(
@@ -163,10 +198,15 @@ async def delete_fee_structure(
             detail="Fee structure not found"
         )
     
-    db.delete(fee)
-    db.commit()
+    if dry_run:
+        return await db.run_sync(fee_change_impact, fee.id, None)
+    
+    students_updated = await db.run_sync(propagate_fee_change, fee.id, None)
+    await db.delete(fee)
+    await db.commit()
+    invalidate_tenant(current_user.id)
     
-    return {"message": "Fee structure deleted successfully"}
+    return {"message": "Fee structure deleted successfully", "students_updated": students_updated}
 
 @router.get("/summary/by-term")
 async def get_fee_summary(
@@ -174,17 +214,17 @@ async def get_fee_summary(
     term: str = Query(..., description="Term e.g., Term 1"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get total fees summary for a specific term"""
-    fees = db.query(models.FeeStructure).filter(
+    query = select(models.FeeStructure).where(
         models.FeeStructure.user_id == current_user.id,
         models.FeeStructure.academic_year == academic_year,
         models.FeeStructure.term == term
     )
     if current_user.school_id:
-        fees = fees.filter(models.FeeStructure.school_id == current_user.school_id)
-    fees = fees.all()
+        query = query.where(models.FeeStructure.school_id == current_user.school_id)
+    fees = (await db.scalars(query)).all()
     
     total_amount = sum(fee.amount for fee in fees)
     
@@ -195,3 +235,51 @@ async def get_fee_summary(
         "total_amount": total_amount,
         "fee_count": len(fees)
     }
+
+@router.post("/billing-runs", response_model=schemas.BillingRunResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_billing_run(
+    run_data: schemas.BillingRunCreate,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Bill enrolled students for a term's fee structures
+    - Adds the term's fee records each of the school's students (in the
+      class, if level is given) is missing, and raises their totals
+    - Safe to re-run: students already billed for a fee are skipped
+    - Runs in the background; poll GET /fees/billing-runs/{run_id} for progress
+    """
+    run = await db.run_sync(
+        create_billing_run, current_user.id, current_user.school_id,
+        run_data.academic_year, run_data.term, run_data.level
+    )
+    await db.commit()
+    await db.refresh(run)
+    
+    background_tasks.add_task(execute_billing_run, run.id)
+    return run
+
+@router.get("/billing-runs/{run_id}", response_model=schemas.BillingRunResponse)
+async def get_billing_run(
+    run_id: int,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """Progress of a billing run"""
+    run = await db.scalar(
+        select(models.BillingRun).where(
+            models.BillingRun.id == run_id,
+            models.BillingRun.user_id == current_user.id
+        )
+    )
+    
+    if not run:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Billing run not found"
+        )
+    
+    return run
@@ -1,49 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Response
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
+from app.pagination import MAX_PAGE_SIZE, paginate
 from app import models, schemas
 from app.services.auth_service import get_current_user, require_active_school
-from app.services.sms_service import ArkeselSMSProvider
+from app.services.sms_service import get_sms_provider
+from app.services.outbox_service import enqueue_sms, notify_worker
+from app.services.cache import invalidate_principals, invalidate_tenant
+from app.services.rollup_service import record_payments
+from app.services.wallet_service import adjust_balances
+from app.services.payment_service import (
+    apply_student_payment,
+    apply_fee_record_payment,
+    generate_payment_reference,
+    post_payment_batch,
+    read_payment_csv
+)
+from app.config import settings
 from datetime import datetime
-import uuid
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
-def update_student_payment_status(student: models.Student, db: Session):
-    """Update student payment status based on paid amount"""
-    if student.balance == 0:
-        student.status = models.PaymentStatus.PAID
-    elif student.paid_amount > 0:
-        student.status = models.PaymentStatus.PARTIAL
-    else:
-        student.status = models.PaymentStatus.UNPAID
-    
-    db.commit()
-
 @router.post("/", response_model=schemas.PaymentResponse, status_code=status.HTTP_201_CREATED)
 async def create_payment(
     payment_data: schemas.PaymentCreate,
     send_sms: bool = Query(True, description="Send SMS receipt to parent"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Process a payment
     - Updates student balance
     - Updates fee record balance
     - Generates receipt reference
-    - Optionally sends SMS to parent
+    - Optionally queues an SMS receipt to the parent
     """
     # Get student
-    student = db.query(models.Student)\
-        .filter(
+    student = await db.scalar(
+        select(models.Student).where(
             models.Student.id == payment_data.student_id,
             models.Student.user_id == current_user.id,
             models.Student.school_id == current_user.school_id
-        ).first()
+        )
+    )
     
     if not student:
         raise HTTPException(
@@ -64,8 +66,17 @@ async def create_payment(
             detail=f"Payment amount (GHS {payment_data.amount}) exceeds balance (GHS {student.balance})"
         )
     
+    # Update student balance atomically; the guard rejects concurrent overpayment
+    if not await db.run_sync(apply_student_payment, student.id, payment_data.amount):
+        detail = f"Payment amount (GHS {payment_data.amount}) exceeds balance (GHS {student.balance})"
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+    
     # Generate reference
-    reference = f"PAY-{uuid.uuid4().hex[:8].upper()}"
+    reference = generate_payment_reference()
     
     # Create payment record
     new_payment = models.Payment(
@@ -85,34 +96,23 @@ async def create_payment(
     
     db.add(new_payment)
     
-    # Update student balance
-    student.paid_amount += payment_data.amount
-    student.balance -= payment_data.amount
-    update_student_payment_status(student, db)
-    
     # Update specific fee record if fee_type is provided
     if payment_data.fee_type:
-        fee_record = db.query(models.StudentFeeRecord)\
-            .filter(
-                models.StudentFeeRecord.student_id == student.id,
-                models.StudentFeeRecord.fee_type == payment_data.fee_type,
-                models.StudentFeeRecord.term == (payment_data.term or student.term),
-                models.StudentFeeRecord.school_id == current_user.school_id
-            ).first()
-        
-        if fee_record:
-            fee_record.paid_amount += payment_data.amount
-            fee_record.balance = fee_record.amount - fee_record.paid_amount
-            
-            if fee_record.balance == 0:
-                fee_record.status = models.PaymentStatus.PAID
-            elif fee_record.paid_amount > 0:
-                fee_record.status = models.PaymentStatus.PARTIAL
+        await db.run_sync(
+            apply_fee_record_payment,
+            student.id,
+            payment_data.fee_type,
+            payment_data.term or student.term,
+            payment_data.amount
+        )
     
-    db.commit()
-    db.refresh(new_payment)
+    # Flush and reload the student's new totals; everything below commits together
+    await db.flush()
+    await db.refresh(student)
+    await db.run_sync(record_payments, [new_payment])
     
-    # Send SMS receipt if requested and parent has contact
+    # Queue SMS receipt if requested and parent has contact
+    receipt = None
     if send_sms and student.parent_contact and current_user.sms_balance > 0:
         # Generate detailed receipt message
         message = f"*** {current_user.school_name} ***\n"
@@ -141,11 +141,12 @@ async def create_payment(
             message += f"Well done! All fees cleared.\n"
         elif student.status == models.PaymentStatus.PARTIAL:
             # Get unpaid fees
-            unpaid_fees = db.query(models.StudentFeeRecord)\
-                .filter(
+            unpaid_fees = (await db.scalars(
+                select(models.StudentFeeRecord).where(
                     models.StudentFeeRecord.student_id == student.id,
                     models.StudentFeeRecord.balance > 0
-                ).all()
+                )
+            )).all()
             
             message += f"UNPAID FEES:\n"
             for fee in unpaid_fees:
@@ -155,81 +156,114 @@ async def create_payment(
         
         message += f"\nThank you for your payment!"
         
-        sms_provider = ArkeselSMSProvider(sender_id=current_user.arkesel_sender_id)
-        result = await sms_provider.send_sms(student.parent_contact, message)
-        
-        if result['success']:
-            current_user.sms_balance -= 1
-            
-            # Log SMS
-            sms_log = models.SMSLog(
-                user_id=current_user.id,
-                school_id=current_user.school_id,
-                recipient=student.parent_contact,
-                message=message,
-                status="sent",
-                units_used=1,
-                arkesel_response=str(result.get('response'))
-            )
-            db.add(sms_log)
-            
-            # Log wallet transaction
-            transaction = models.WalletTransaction(
-                user_id=current_user.id,
-                school_id=current_user.school_id,
-                transaction_type="sms_usage",
-                sms_units=1,
-                description=f"Payment receipt sent to {student.parent_name}",
-                balance_before=current_user.wallet_balance,
-                balance_after=current_user.wallet_balance,
-                sms_balance_before=current_user.sms_balance + 1,
-                sms_balance_after=current_user.sms_balance
-            )
-            db.add(transaction)
-            db.commit()
+        # Queue for background delivery; None if the SMS units ran out meanwhile
+        receipt = await db.run_sync(
+            enqueue_sms,
+            current_user,
+            student.parent_contact,
+            message,
+            description=f"Payment receipt sent to {student.parent_name}"
+        )
+    
+    # Single commit: balances, fee record, payment and queued receipt
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    if receipt:
+        invalidate_principals(current_user.school_id, current_user.username)
+        notify_worker()
     
     return new_payment
 
+@router.post("/batch", response_model=schemas.PaymentBatchReport)
+async def create_payment_batch(
+    batch: schemas.PaymentBatchCreate,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Post many payments at once (e.g. bank / mobile money statement)
+    - Validates all students in one query
+    - Applies balances, fee records and payments in one transaction
+    - Rejected rows are reported and skipped; the rest are posted
+    - No SMS receipts are sent (use bulk SMS afterwards)
+    """
+    if len(batch.payments) > settings.PAYMENT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch is limited to {settings.PAYMENT_BATCH_MAX_ROWS} payments"
+        )
+    
+    rows = [(row, payment, None) for row, payment in enumerate(batch.payments, start=1)]
+    report = await db.run_sync(post_payment_batch, current_user, rows)
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    
+    return report
+
+@router.post("/batch/upload", response_model=schemas.PaymentBatchReport)
+async def upload_payment_batch(
+    file: UploadFile = File(..., description="CSV with student_id, amount, payment_method, fee_type, term, academic_year, payment_date"),
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Post payments from an uploaded CSV statement
+    - Same validation and single transaction as POST /payments/batch
+    - Report row numbers count data rows (header excluded)
+    """
+    rows = read_payment_csv(file.file, settings.PAYMENT_BATCH_MAX_ROWS)
+    report = await db.run_sync(post_payment_batch, current_user, rows)
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    
+    return report
+
 @router.get("/", response_model=List[schemas.PaymentResponse])
 async def get_payments(
+    response: Response,
     student_id: Optional[int] = None,
     payment_method: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page (replaces skip)"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all payments with optional filters"""
-    query = db.query(models.Payment).filter(
+    """
+    Get all payments with optional filters
+    - Pass the X-Next-Cursor response header back as `cursor` for the next page
+    """
+    query = select(models.Payment).where(
         models.Payment.user_id == current_user.id,
         models.Payment.school_id == current_user.school_id
     )
     
     if student_id:
-        query = query.filter(models.Payment.student_id == student_id)
+        query = query.where(models.Payment.student_id == student_id)
     
     if payment_method:
-        query = query.filter(models.Payment.payment_method == payment_method)
+        query = query.where(models.Payment.payment_method == payment_method)
     
-    payments = query.order_by(desc(models.Payment.created_at)).offset(skip).limit(limit).all()
-    
-    return payments
+    return await paginate(db, query, models.Payment, response, limit, cursor=cursor, skip=skip)
 
 @router.get("/{payment_id}", response_model=schemas.PaymentResponse)
 async def get_payment(
     payment_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific payment by ID"""
-    payment = db.query(models.Payment)\
-        .filter(
+    payment = await db.scalar(
+        select(models.Payment).where(
             models.Payment.id == payment_id,
             models.Payment.user_id == current_user.id,
             models.Payment.school_id == current_user.school_id
-        ).first()
+        )
+    )
     
     if not payment:
         raise HTTPException(
@@ -244,15 +278,16 @@ async def resend_receipt(
     payment_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Resend SMS receipt for a payment"""
-    payment = db.query(models.Payment)\
-        .filter(
+    payment = await db.scalar(
+        select(models.Payment).where(
             models.Payment.id == payment_id,
             models.Payment.user_id == current_user.id,
             models.Payment.school_id == current_user.school_id
-        ).first()
+        )
+    )
     
     if not payment:
         raise HTTPException(
@@ -260,10 +295,12 @@ async def resend_receipt(
             detail="Payment not found"
         )
     
-    student = db.query(models.Student).filter(
-        models.Student.id == payment.student_id,
-        models.Student.school_id == current_user.school_id
-    ).first()
+    student = await db.scalar(
+        select(models.Student).where(
+            models.Student.id == payment.student_id,
+            models.Student.school_id == current_user.school_id
+        )
+    )
     
     if not student or not student.parent_contact:
         raise HTTPException(
@@ -279,46 +316,46 @@ async def resend_receipt(
     
     message = generate_receipt_message(student, payment, current_user.school_name)
     
-    sms_provider = ArkeselSMSProvider(sender_id=current_user.arkesel_sender_id)
-    result = await sms_provider.send_sms(student.parent_contact, message)
-    
-    if result['success']:
-        current_user.sms_balance -= 1
-        
-        sms_log = models.SMSLog(
-            user_id=current_user.id,
-            school_id=current_user.school_id,
-            recipient=student.parent_contact,
-            message=message,
-            status="sent",
-            units_used=1,
-            arkesel_response=str(result.get('response'))
-        )
-        db.add(sms_log)
-        db.commit()
-        
-        return {"message": "Receipt resent successfully"}
-    else:
+    outbox = await db.run_sync(
+        enqueue_sms,
+        current_user,
+        student.parent_contact,
+        message,
+        description=f"Receipt resent to {student.parent_name}"
+    )
+    if outbox is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send SMS: {result['message']}"
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Insufficient SMS balance"
         )
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    notify_worker()
+    
+    return {"message": "Receipt queued for delivery", "job_id": outbox.job_id}
 
 @router.post("/bulk-sms")
 async def send_bulk_sms(
     bulk_sms: schemas.BulkSMSRequest,
+    concurrency: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.SMS_BULK_MAX_CONCURRENCY,
+        description="Max SMS requests in flight (defaults to SMS_BULK_CONCURRENCY)"
+    ),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Send bulk SMS to multiple students' parents
     - Can filter by payment status
     - Can select specific student IDs
     - Sends custom message
+    - Dispatches concurrently, bounded by `concurrency`
     """
     # Build query for students
-    query = db.query(models.Student).filter(
+    query = select(models.Student).where(
         models.Student.user_id == current_user.id,
         models.Student.school_id == current_user.school_id
     )
@@ -327,7 +364,7 @@ async def send_bulk_sms(
     if bulk_sms.payment_status:
         try:
             payment_status = models.PaymentStatus(bulk_sms.payment_status)
-            query = query.filter(models.Student.status == payment_status)
+            query = query.where(models.Student.status == payment_status)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -336,9 +373,9 @@ async def send_bulk_sms(
     
     # Filter by specific student IDs if provided
     if bulk_sms.student_ids:
-        query = query.filter(models.Student.id.in_(bulk_sms.student_ids))
+        query = query.where(models.Student.id.in_(bulk_sms.student_ids))
     
-    students = query.all()
+    students = (await db.scalars(query)).all()
     
     if not students:
         raise HTTPException(
@@ -346,46 +383,68 @@ async def send_bulk_sms(
             detail="No students found matching criteria"
         )
     
-    # Check SMS balance
-    required_sms = len(students)
-    if current_user.sms_balance < required_sms:
-        raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail=f"Insufficient SMS balance. Need {required_sms}, have {current_user.sms_balance}"
-        )
-    
-    # Send SMS to each parent
-    sms_provider = ArkeselSMSProvider(sender_id=current_user.arkesel_sender_id)
+    # Personalize messages; students without a contact fail immediately
     sent_count = 0
     failed_count = 0
-    results = []
+    results = [None] * len(students)
+    outgoing = []
     
-    for student in students:
+    for index, student in enumerate(students):
         if not student.parent_contact:
             failed_count += 1
-            results.append({
+            results[index] = {
                 "student": student.name,
                 "status": "failed",
                 "reason": "No parent contact"
-            })
+            }
             continue
         
-        # Personalize message
         personalized_message = bulk_sms.message.replace("{student_name}", student.name)\
             .replace("{parent_name}", student.parent_name or "Parent")\
             .replace("{balance}", f"GHS {student.balance:,.2f}")\
             .replace("{total_fees}", f"GHS {student.total_fees:,.2f}")\
             .replace("{paid_amount}", f"GHS {student.paid_amount:,.2f}")
         
-        result = await sms_provider.send_sms(student.parent_contact, personalized_message)
-        
+        outgoing.append((index, student, personalized_message))
+    
+    # Reserve a unit per message up front (guarded, so concurrent bulk sends can't overdraw)
+    required_sms = len(outgoing)
+    balances = await db.run_sync(adjust_balances, current_user, sms_units=-required_sms)
+    if balances is None:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"Insufficient SMS balance. Need {required_sms}, have {current_user.sms_balance}"
+        )
+    db.add(models.WalletTransaction(
+        user_id=current_user.id,
+        school_id=current_user.school_id,
+        transaction_type="sms_usage",
+        sms_units=required_sms,
+        description=f"Bulk SMS to {required_sms} parents",
+        **balances
+    ))
+    # Commit the reservation so no connection or transaction is held during dispatch
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    
+    # Dispatch concurrently with a bounded number of requests in flight
+    sms_provider = get_sms_provider(current_user.arkesel_sender_id)
+    try:
+        send_results = await sms_provider.send_bulk(
+            [(student.parent_contact, message) for _, student, message in outgoing],
+            concurrency=concurrency
+        )
+    except Exception as e:
+        send_results = [{"success": False, "message": str(e), "response": None}] * len(outgoing)
+    
+    for (index, student, personalized_message), result in zip(outgoing, send_results):
         if result['success']:
             sent_count += 1
-            current_user.sms_balance -= 1
             
             # Log SMS
             sms_log = models.SMSLog(
                 user_id=current_user.id,
+                school_id=current_user.school_id,
                 recipient=student.parent_contact,
                 message=personalized_message,
                 status="sent",
@@ -394,34 +453,34 @@ async def send_bulk_sms(
             )
             db.add(sms_log)
             
-            results.append({
+            results[index] = {
                 "student": student.name,
                 "parent_contact": student.parent_contact,
                 "status": "sent"
-            })
+            }
         else:
             failed_count += 1
-            results.append({
+            results[index] = {
                 "student": student.name,
                 "parent_contact": student.parent_contact,
                 "status": "failed",
                 "reason": result['message']
-            })
+            }
     
-    # Log bulk SMS transaction
-    transaction = models.WalletTransaction(
-        user_id=current_user.id,
-        school_id=current_user.school_id,
-        transaction_type="sms_usage",
-        sms_units=sent_count,
-        description=f"Bulk SMS to {sent_count} parents",
-        balance_before=current_user.wallet_balance,
-        balance_after=current_user.wallet_balance,
-        sms_balance_before=current_user.sms_balance + sent_count,
-        sms_balance_after=current_user.sms_balance
-    )
-    db.add(transaction)
-    db.commit()
+    # Give back the units of messages that weren't delivered
+    unsent = required_sms - sent_count
+    if unsent:
+        refund = await db.run_sync(adjust_balances, current_user, sms_units=unsent, allow_negative=True)
+        db.add(models.WalletTransaction(
+            user_id=current_user.id,
+            school_id=current_user.school_id,
+            transaction_type="sms_refund",
+            sms_units=unsent,
+            description=f"Refund: bulk SMS not delivered to {unsent} parents",
+            **refund
+        ))
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
     
     return {
         "total_attempted": len(students),
@@ -449,7 +508,7 @@ async def get_payment_receipt(
     payment_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Generate professional receipt for a payment
@@ -457,24 +516,27 @@ async def get_payment_receipt(
     - Payment status (Paid/Partial/Unpaid)
     - Personalized messages
     """
-    payment = db.query(models.Payment)\
-        .filter(
+    # Payment and its student in one query (outer join tells the two 404s apart)
+    row = (await db.execute(
+        select(models.Payment, models.Student)
+        .outerjoin(models.Student, and_(
+            models.Student.id == models.Payment.student_id,
+            models.Student.school_id == current_user.school_id
+        ))
+        .where(
             models.Payment.id == payment_id,
             models.Payment.user_id == current_user.id,
             models.Payment.school_id == current_user.school_id
-        ).first()
+        )
+    )).first()
     
-    if not payment:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Payment not found"
         )
     
-    student = db.query(models.Student).filter(
-        models.Student.id == payment.student_id,
-        models.Student.school_id == current_user.school_id
-    ).first()
-    
+    payment, student = row
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -482,12 +544,12 @@ async def get_payment_receipt(
         )
     
     # Get all fee records for the student
-    fee_records = db.query(models.StudentFeeRecord)\
-        .filter(
+    fee_records = (await db.scalars(
+        select(models.StudentFeeRecord).where(
             models.StudentFeeRecord.student_id == student.id,
             models.StudentFeeRecord.school_id == current_user.school_id
-        )\
-        .all()
+        )
+    )).all()
     
     # Build fee breakdown
     fee_breakdown = []
@@ -554,17 +616,18 @@ async def send_receipt_sms(
     payment_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Generate and send professional receipt via SMS
+    Generate professional receipt and queue it for SMS delivery
     """
-    payment = db.query(models.Payment)\
-        .filter(
+    payment = await db.scalar(
+        select(models.Payment).where(
             models.Payment.id == payment_id,
             models.Payment.user_id == current_user.id,
             models.Payment.school_id == current_user.school_id
-        ).first()
+        )
+    )
     
     if not payment:
         raise HTTPException(
@@ -572,10 +635,12 @@ async def send_receipt_sms(
             detail="Payment not found"
         )
     
-    student = db.query(models.Student).filter(
-        models.Student.id == payment.student_id,
-        models.Student.school_id == current_user.school_id
-    ).first()
+    student = await db.scalar(
+        select(models.Student).where(
+            models.Student.id == payment.student_id,
+            models.Student.school_id == current_user.school_id
+        )
+    )
     
     if not student or not student.parent_contact:
         raise HTTPException(
@@ -624,45 +689,25 @@ async def send_receipt_sms(
     
     message += f"\nThank you for your payment!"
     
-    sms_provider = ArkeselSMSProvider(sender_id=current_user.arkesel_sender_id)
-    result = await sms_provider.send_sms(student.parent_contact, message)
-    
-    if result['success']:
-        current_user.sms_balance -= 1
-        
-        sms_log = models.SMSLog(
-            user_id=current_user.id,
-            school_id=current_user.school_id,
-            recipient=student.parent_contact,
-            message=message,
-            status="sent",
-            units_used=1,
-            arkesel_response=str(result.get('response'))
-        )
-        db.add(sms_log)
-        
-        # Log transaction
-        transaction = models.WalletTransaction(
-            user_id=current_user.id,
-            school_id=current_user.school_id,
-            transaction_type="sms_usage",
-            sms_units=1,
-            description=f"Receipt sent to {student.parent_name}",
-            balance_before=current_user.wallet_balance,
-            balance_after=current_user.wallet_balance,
-            sms_balance_before=current_user.sms_balance + 1,
-            sms_balance_after=current_user.sms_balance
-        )
-        db.add(transaction)
-        db.commit()
-        
-        return {
-            "message": "Receipt sent successfully",
-            "recipient": student.parent_contact,
-            "sms_balance_remaining": current_user.sms_balance
-        }
-    else:
+    outbox = await db.run_sync(
+        enqueue_sms,
+        current_user,
+        student.parent_contact,
+        message,
+        description=f"Receipt sent to {student.parent_name}"
+    )
+    if outbox is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send SMS: {result['message']}"
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Insufficient SMS balance"
         )
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    notify_worker()
+    
+    return {
+        "message": "Receipt queued for delivery",
+        "recipient": student.parent_contact,
+        "job_id": outbox.job_id,
+        "sms_balance_remaining": current_user.sms_balance
+    }
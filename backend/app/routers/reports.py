@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import get_db
+from app import models, schemas
+from app.services.auth_service import get_current_user, require_active_school
+from app.services.cache import tenant_cache
+from app.services.report_service import collection_report
+from app.services.statistics_service import student_summary
+from datetime import date
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+@router.get("/collections", response_model=schemas.CollectionReport)
+async def get_collection_report(
+    start_date: Optional[date] = Query(None, description="First day included (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last day included (YYYY-MM-DD)"),
+    interval: str = Query("day", pattern="^(day|week|month)$", description="Time series bucket: day, week or month"),
+    student_class: Optional[str] = None,
+    term: Optional[str] = None,
+    academic_year: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Fees collected over a date range
+    - Time series by day, week or month
+    - Totals by payment method, fee type, class and term
+    - Computed with SQL aggregates and cached until the next payment is posted
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must be on or before end_date"
+        )
+
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "interval": interval,
+        "student_class": student_class,
+        "term": term,
+        "academic_year": academic_year,
+        "payment_method": payment_method
+    }
+    return await tenant_cache.get_or_set_async(
+        current_user.id,
+        ("collections", tuple(filters.items())),
+        lambda: db.run_sync(collection_report, current_user, **filters)
+    )
+
+@router.get("/students")
+async def get_student_report(
+    student_class: Optional[str] = None,
+    term: Optional[str] = None,
+    academic_year: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Expected, paid and outstanding fees by status and class
+    - Same totals as /students/statistics/summary, filtered by class, term and year
+    """
+    filters = {"student_class": student_class, "term": term, "academic_year": academic_year}
+    return await tenant_cache.get_or_set_async(
+        current_user.id,
+        ("students", tuple(filters.items())),
+        lambda: db.run_sync(student_summary, current_user, ["class"], **filters)
+    )
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db
+from app.pagination import MAX_PAGE_SIZE, paginate
 from app import models, schemas
 from app.services.auth_service import get_current_user, require_active_school
-from app.services.sms_service import ArkeselSMSProvider
+from app.services.cache import invalidate_principals
+from app.services.outbox_service import enqueue_sms, notify_worker, get_job_status
 import uuid
 
 router = APIRouter(prefix="/sms", tags=["SMS"])
@@ -15,83 +17,60 @@ async def send_sms(
     sms_data: schemas.SMSSend,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Send SMS to a recipient
-    - Deducts 1 unit from SMS balance
-    - Logs the transaction
-    - Returns delivery status
+    Queue an SMS to a recipient
+    - Returns immediately with a pending log entry
+    - Reserves 1 unit from SMS balance (refunded if delivery finally fails)
+    - Track delivery with GET /sms/jobs/{job_id}
     """
-    # Check SMS balance
-    if current_user.sms_balance < 1:
+    outbox = await db.run_sync(enqueue_sms, current_user, sms_data.recipient, sms_data.message)
+    if outbox is None:
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
             detail="Insufficient SMS balance. Please purchase SMS units."
         )
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    notify_worker()
     
-    # Initialize SMS provider with user's sender ID
-    sms_provider = ArkeselSMSProvider(sender_id=current_user.arkesel_sender_id)
-    
-    # Send SMS
-    result = await sms_provider.send_sms(sms_data.recipient, sms_data.message)
-    
-    # Deduct SMS unit if sent successfully
-    sms_log = models.SMSLog(
-        user_id=current_user.id,
-        school_id=current_user.school_id,
-        recipient=sms_data.recipient,
-        message=sms_data.message,
-        status="sent" if result['success'] else "failed",
-        units_used=1 if result['success'] else 0,
-        arkesel_response=str(result.get('response')),
-        error_message=result.get('message') if not result['success'] else None
-    )
-    
-    if result['success']:
-        current_user.sms_balance -= 1
-        
-        # Log SMS usage transaction
-        transaction = models.WalletTransaction(
-            user_id=current_user.id,
-            school_id=current_user.school_id,
-            transaction_type="sms_usage",
-            sms_units=1,
-            description=f"SMS sent to {sms_data.recipient}",
-            balance_before=current_user.wallet_balance,
-            balance_after=current_user.wallet_balance,
-            sms_balance_before=current_user.sms_balance + 1,
-            sms_balance_after=current_user.sms_balance
-        )
-        db.add(transaction)
-    
-    db.add(sms_log)
-    db.commit()
-    db.refresh(sms_log)
+    sms_log = await db.get(models.SMSLog, outbox.sms_log_id)
+    response = schemas.SMSLogResponse.model_validate(sms_log)
+    response.job_id = outbox.job_id
+    return response
+
+@router.get("/jobs/{job_id}")
+async def get_sms_job_status(
+    job_id: str,
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get delivery progress for queued SMS"""
+    job_status = await db.run_sync(get_job_status, job_id, current_user.school_id)
     
-    if not result['success']:
+    if not job_status:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send SMS: {result['message']}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="SMS job not found"
         )
     
-    return sms_log
+    return job_status
 
 @router.get("/logs", response_model=List[schemas.SMSLogResponse])
 async def get_sms_logs(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get SMS sending history"""
-    logs = db.query(models.SMSLog)\
-        .filter(models.SMSLog.user_id == current_user.id)\
-        .order_by(desc(models.SMSLog.created_at))\
-        .limit(limit)\
-        .all()
+    """Get SMS sending history, newest first"""
+    query = select(models.SMSLog).where(models.SMSLog.user_id == current_user.id)
     
-    return logs
+    return await paginate(db, query, models.SMSLog, response, limit, cursor=cursor)
 
 @router.get("/balance")
 async def get_sms_balance(
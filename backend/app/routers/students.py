@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from app.config import settings
 from app.database import get_db
+from app.pagination import MAX_PAGE_SIZE, paginate
 from app import models, schemas
 from app.services.auth_service import get_current_user, require_active_school
+from app.services.cache import invalidate_tenant
+from app.services.config_cache import get_student_limit
+from app.services.rollup_service import record_payments
+from app.services.school_service import release_student_slots, reserve_student_slots
+from app.services.search_service import filter_students, search_students
+from app.services.statistics_service import BREAKDOWNS, student_summary
+from app.services.student_import_service import (
+    fee_record_rows,
+    import_students,
+    iter_student_rows,
+    load_fee_structures
+)
 from datetime import datetime
 
 router = APIRouter(prefix="/students", tags=["Students"])
 
 def _tenant_filter(query, current_user: models.User):
     if current_user.school_id:
-        return query.filter(models.Student.school_id == current_user.school_id)
+        return query.where(models.Student.school_id == current_user.school_id)
     return query
 
 
@@ -20,22 +34,25 @@ async def create_student(
     student_data: schemas.StudentCreate,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new student
-    - Auto-creates unpaid fee records based on fee structure
+    - Auto-creates unpaid fee records for the fee structures of its term and class
     - Calculates total fees from fee structure
+    - Refused once the school reaches max_students_per_school
     """
-    # Get fee structure for the selected year and term
-    fee_structures_query = db.query(models.FeeStructure).filter(
-        models.FeeStructure.user_id == current_user.id,
-        models.FeeStructure.academic_year == student_data.academic_year,
-        models.FeeStructure.term == student_data.term
+    limit = await get_student_limit(db)
+    if not await db.run_sync(reserve_student_slots, current_user.school_id, 1, limit):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Student limit reached ({limit} per school)"
+        )
+    
+    # Get fee structure for the selected year, term and class
+    fee_structures = await db.run_sync(
+        load_fee_structures, current_user, student_data.academic_year, student_data.term, student_data.student_class
     )
-    if current_user.school_id:
-        fee_structures_query = fee_structures_query.filter(models.FeeStructure.school_id == current_user.school_id)
-    fee_structures = fee_structures_query.all()
     
     # Calculate total fees
     total_fees = sum(fee.amount for fee in fee_structures)
@@ -60,92 +77,121 @@ async def create_student(
     )
     
     db.add(new_student)
-    db.flush()  # Get student ID
+    await db.flush()  # Get student ID
     
-    # Create unpaid fee records for each fee type
-    for fee in fee_structures:
-        fee_record = models.StudentFeeRecord(
-            student_id=new_student.id,
-            fee_structure_id=fee.id,
-            fee_type=fee.fee_type,
-            amount=fee.amount,
-            paid_amount=0.0,
-            balance=fee.amount,
-            status=models.PaymentStatus.UNPAID,
-            term=fee.term,
-            academic_year=fee.academic_year
-        )
-        db.add(fee_record)
+    # Create unpaid fee records for each fee type in one INSERT
+    if fee_structures:
+        await db.execute(insert(models.StudentFeeRecord), fee_record_rows(new_student.id, new_student.school_id, fee_structures))
     
-    db.commit()
-    db.refresh(new_student)
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    await db.refresh(new_student)
     
     return new_student
 
+@router.post("/import", response_model=schemas.StudentImportReport)
+async def import_students_file(
+    file: UploadFile = File(..., description="CSV or XLSX with name, student_class, academic_year, term, gender, date_of_birth, parent_name, parent_contact, parent_email"),
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Import students from a CSV or XLSX file
+    - Rows are read incrementally and inserted in bulk with their fee records
+    - Invalid rows are reported and skipped; valid rows are imported
+    - Report row numbers count data rows (header excluded)
+    - Rows beyond max_students_per_school are reported as failed
+    """
+    rows = iter_student_rows(file)
+    limit = await get_student_limit(db)
+    report = await db.run_sync(import_students, current_user, rows, settings.STUDENT_IMPORT_CHUNK_SIZE, limit)
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    
+    return report
+
 @router.get("/", response_model=List[schemas.StudentResponse])
 async def get_students(
+    response: Response,
     status: Optional[str] = Query(None, description="Filter by payment status: Unpaid, Partial, Paid"),
     search: Optional[str] = Query(None, description="Search by name or parent name"),
     student_class: Optional[str] = Query(None, description="Filter by class"),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page (replaces skip)"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all students for current user with optional filters:
     - Filter by payment status (Unpaid, Partial, Paid)
     - Search by name
     - Filter by class
+    - Pass the X-Next-Cursor response header back as `cursor` for the next page
     """
-    query = db.query(models.Student).filter(models.Student.user_id == current_user.id)
-    if current_user.school_id:
-        query = query.filter(models.Student.school_id == current_user.school_id)
+    query = _tenant_filter(
+        select(models.Student).where(models.Student.user_id == current_user.id),
+        current_user
+    )
     
     # Filter by payment status
     if status:
         try:
             payment_status = models.PaymentStatus(status)
-            query = query.filter(models.Student.status == payment_status)
+            query = query.where(models.Student.status == payment_status)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid status. Use: Unpaid, Partial, or Paid"
             )
     
-    # Search by name
+    # Search by name (index-backed, see search_service)
     if search:
-        query = query.filter(
-            or_(
-                models.Student.name.ilike(f"%{search}%"),
-                models.Student.parent_name.ilike(f"%{search}%")
-            )
-        )
+        query = filter_students(db, query, search)
     
     # Filter by class
     if student_class:
-        query = query.filter(models.Student.student_class == student_class)
+        query = query.where(models.Student.student_class == student_class)
     
-    students = query.order_by(desc(models.Student.created_at)).offset(skip).limit(limit).all()
+    return await paginate(db, query, models.Student, response, limit, cursor=cursor, skip=skip)
+
+@router.get("/search", response_model=List[schemas.StudentResponse])
+async def search_students_by_name(
+    q: str = Query(..., min_length=1, description="Part of a student or parent name"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: models.User = Depends(get_current_user),
+    school=Depends(require_active_school),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Typeahead search over student and parent names
+    - Case-insensitive substring match, best matches first
+    - Served by an FTS5 trigram index (SQLite) or pg_trgm indexes (Postgres)
+    """
+    query = _tenant_filter(
+        select(models.Student).where(models.Student.user_id == current_user.id),
+        current_user
+    )
     
-    return students
+    return await db.run_sync(search_students, query, q, limit)
 
 @router.get("/{student_id}", response_model=schemas.StudentResponse)
 async def get_student(
     student_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific student by ID"""
-    student = db.query(models.Student).filter(
-        models.Student.id == student_id,
-        models.Student.user_id == current_user.id
-    )
-    if current_user.school_id:
-        student = student.filter(models.Student.school_id == current_user.school_id)
-    student = student.first()
+    student = await db.scalar(_tenant_filter(
+        select(models.Student).where(
+            models.Student.id == student_id,
+            models.Student.user_id == current_user.id
+        ),
+        current_user
+    ))
     
     if not student:
         raise HTTPException(
@@ -161,16 +207,16 @@ async def update_student(
     student_update: schemas.StudentUpdate,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update student information"""
-    student_query = db.query(models.Student).filter(
-        models.Student.id == student_id,
-        models.Student.user_id == current_user.id
-    )
-    if current_user.school_id:
-        student_query = student_query.filter(models.Student.school_id == current_user.school_id)
-    student = student_query.first()
+    student = await db.scalar(_tenant_filter(
+        select(models.Student).where(
+            models.Student.id == student_id,
+            models.Student.user_id == current_user.id
+        ),
+        current_user
+    ))
     
     if not student:
         raise HTTPException(
@@ -194,8 +240,9 @@ async def update_student(
     if student_update.parent_email:
         student.parent_email = student_update.parent_email
     
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    invalidate_tenant(current_user.id)
+    await db.refresh(student)
     
     return student
 
@@ -204,16 +251,16 @@ async def delete_student(
     student_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a student"""
-    student = db.query(models.Student).filter(
-        models.Student.id == student_id,
-        models.Student.user_id == current_user.id
-    )
-    if current_user.school_id:
-        student = student.filter(models.Student.school_id == current_user.school_id)
-    student = student.first()
+    student = await db.scalar(_tenant_filter(
+        select(models.Student).where(
+            models.Student.id == student_id,
+            models.Student.user_id == current_user.id
+        ),
+        current_user
+    ))
     
     if not student:
         raise HTTPException(
@@ -221,8 +268,12 @@ async def delete_student(
             detail="Student not found"
         )
     
-    db.delete(student)
-    db.commit()
+    # Its payments are deleted with it, so take them out of the rollup too
+    await db.run_sync(lambda session: record_payments(session, student.payments, sign=-1))
+    await db.run_sync(release_student_slots, student.school_id)
+    await db.delete(student)
+    await db.commit()
+    invalidate_tenant(current_user.id)
     
     return {"message": "Student deleted successfully"}
 
@@ -231,16 +282,16 @@ async def get_student_fee_records(
     student_id: int,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all fee records for a specific student"""
-    student = db.query(models.Student).filter(
-        models.Student.id == student_id,
-        models.Student.user_id == current_user.id
-    )
-    if current_user.school_id:
-        student = student.filter(models.Student.school_id == current_user.school_id)
-    student = student.first()
+    student = await db.scalar(_tenant_filter(
+        select(models.Student).where(
+            models.Student.id == student_id,
+            models.Student.user_id == current_user.id
+        ),
+        current_user
+    ))
     
     if not student:
         raise HTTPException(
@@ -248,9 +299,9 @@ async def get_student_fee_records(
             detail="Student not found"
         )
     
-    fee_records = db.query(models.StudentFeeRecord)\
-        .filter(models.StudentFeeRecord.student_id == student_id)\
-        .all()
+    fee_records = (await db.scalars(
+        select(models.StudentFeeRecord).where(models.StudentFeeRecord.student_id == student_id)
+    )).all()
     
     return {
         "student": student,
@@ -259,45 +310,22 @@ async def get_student_fee_records(
 
 @router.get("/statistics/summary")
 async def get_students_statistics(
+    breakdown: Optional[str] = Query(None, description="Comma-separated extra breakdowns: class, term"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get student statistics summary"""
-    summary_query = db.query(models.Student).filter(models.Student.user_id == current_user.id)
-    if current_user.school_id:
-        summary_query = summary_query.filter(models.Student.school_id == current_user.school_id)
-
-    total_students = summary_query.count()
-    
-    status_query = summary_query.subquery()
-    fully_paid = db.query(models.Student).filter(
-        models.Student.user_id == current_user.id,
-        models.Student.status == models.PaymentStatus.PAID
-    )
-    if current_user.school_id:
-        fully_paid = fully_paid.filter(models.Student.school_id == current_user.school_id)
-    fully_paid = fully_paid.count()
-    
-    partially_paid = db.query(models.Student).filter(
-        models.Student.user_id == current_user.id,
-        models.Student.status == models.PaymentStatus.PARTIAL
-    )
-    if current_user.school_id:
-        partially_paid = partially_paid.filter(models.Student.school_id == current_user.school_id)
-    partially_paid = partially_paid.count()
-    
-    unpaid = db.query(models.Student).filter(
-        models.Student.user_id == current_user.id,
-        models.Student.status == models.PaymentStatus.UNPAID
-    )
-    if current_user.school_id:
-        unpaid = unpaid.filter(models.Student.school_id == current_user.school_id)
-    unpaid = unpaid.count()
+    """
+    Get student statistics summary
+    - Counts per payment status with total fees, paid and outstanding
+    - Optional per-class and/or per-term breakdown from the same query
+    """
+    breakdowns = [name.strip() for name in breakdown.split(",") if name.strip()] if breakdown else []
+    unknown = set(breakdowns) - set(BREAKDOWNS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid breakdown. Use: {', '.join(BREAKDOWNS)}"
+        )
     
-    return {
-        "total_students": total_students,
-        "fully_paid": fully_paid,
-        "partially_paid": partially_paid,
-        "unpaid": unpaid
-    }
+    return await db.run_sync(student_summary, current_user, breakdowns)
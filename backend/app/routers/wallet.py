@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db
+from app.pagination import MAX_PAGE_SIZE, paginate
 from app import models, schemas
 from app.services.auth_service import get_current_user, require_active_school
+from app.services.cache import invalidate_principals
+from app.services.config_cache import get_active_pricing
+from app.services.wallet_service import adjust_balances
 from app.config import settings
 import uuid
 
@@ -15,14 +19,13 @@ async def topup_wallet(
     topup: schemas.WalletTopUp,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Top up wallet balance
     Minimum: GHS 5.00
     """
-    balance_before = current_user.wallet_balance
-    current_user.wallet_balance += topup.amount
+    balances = await db.run_sync(adjust_balances, current_user, wallet=topup.amount)
     
     # Create transaction record
     transaction = models.WalletTransaction(
@@ -33,15 +36,13 @@ async def topup_wallet(
         payment_method=topup.payment_method,
         reference=topup.reference or f"TOP-{uuid.uuid4().hex[:8].upper()}",
         description=f"Wallet top-up via {topup.payment_method}",
-        balance_before=balance_before,
-        balance_after=current_user.wallet_balance,
-        sms_balance_before=current_user.sms_balance,
-        sms_balance_after=current_user.sms_balance
+        **balances
     )
     
     db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    await db.refresh(transaction)
     
     return transaction
 
@@ -50,7 +51,7 @@ async def purchase_sms(
     purchase: schemas.SMSPurchase,
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Purchase SMS units from wallet balance.
@@ -58,10 +59,8 @@ async def purchase_sms(
     Pricing is dynamic and supports bulk discounts.
     Use GET /admin/sms-pricing/calculate-cost to preview cost.
     """
-    from ..models import SMSPricing
-    
     # Get current SMS pricing
-    pricing = db.query(SMSPricing).filter(SMSPricing.is_active == True).first()
+    pricing = await get_active_pricing(db)
     
     if not pricing:
         # Fallback to config if no pricing is set
@@ -83,12 +82,13 @@ async def purchase_sms(
             detail=f"Insufficient wallet balance. Need GHS {cost:.2f}, have GHS {current_user.wallet_balance:.2f}"
         )
     
-    # Deduct from wallet and add SMS units
-    balance_before = current_user.wallet_balance
-    sms_before = current_user.sms_balance
-    
-    current_user.wallet_balance -= cost
-    current_user.sms_balance += purchase.units
+    # Deduct from wallet and add SMS units (refused if a concurrent spend got there first)
+    balances = await db.run_sync(adjust_balances, current_user, wallet=-cost, sms_units=purchase.units)
+    if balances is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient wallet balance. Need GHS {cost:.2f}"
+        )
     
     # Create transaction record
     description = f"Purchased {purchase.units} SMS units"
@@ -103,36 +103,32 @@ async def purchase_sms(
         sms_units=purchase.units,
         reference=f"SMS-{uuid.uuid4().hex[:8].upper()}",
         description=description,
-        balance_before=balance_before,
-        balance_after=current_user.wallet_balance,
-        sms_balance_before=sms_before,
-        sms_balance_after=current_user.sms_balance
+        **balances
     )
     
     db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    invalidate_principals(current_user.school_id, current_user.username)
+    await db.refresh(transaction)
     
     return transaction
 
 @router.get("/transactions", response_model=List[schemas.WalletTransactionResponse])
 async def get_transactions(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     current_user: models.User = Depends(get_current_user),
     school=Depends(require_active_school),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get wallet transaction history"""
-    transactions = db.query(models.WalletTransaction)\
-        .filter(
-            models.WalletTransaction.user_id == current_user.id,
-            models.WalletTransaction.school_id == current_user.school_id
-        )\
-        .order_by(desc(models.WalletTransaction.created_at))\
-        .limit(limit)\
-        .all()
+    """Get wallet transaction history, newest first"""
+    query = select(models.WalletTransaction).where(
+        models.WalletTransaction.user_id == current_user.id,
+        models.WalletTransaction.school_id == current_user.school_id
+    )
     
-    return transactions
+    return await paginate(db, query, models.WalletTransaction, response, limit, cursor=cursor)
 
 @router.get("/balance")
 async def get_wallet_balance(
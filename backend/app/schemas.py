@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 # Enums
@@ -117,6 +117,10 @@ class SchoolResponse(BaseModel):
         from_attributes = True
 
 
+# Token refers to SchoolResponse before it is defined
+Token.model_rebuild()
+
+
 # Registration schema combines school and admin user
 class SchoolRegistration(BaseModel):
     school_name: str
@@ -181,6 +185,16 @@ class StudentResponse(StudentBase):
     class Config:
         from_attributes = True
 
+class StudentImportError(BaseModel):
+    row: int
+    error: str
+
+class StudentImportReport(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[StudentImportError]
+
 # Fee Structure Schemas
 class FeeStructureBase(BaseModel):
     academic_year: str
@@ -204,6 +218,44 @@ class FeeStructureResponse(FeeStructureBase):
     class Config:
         from_attributes = True
 
+class FeeChangeStudent(BaseModel):
+    student_id: int
+    name: str
+    total_fees: float
+    new_total_fees: float
+    paid_amount: float
+    balance: float
+    new_balance: float
+
+class FeeChangeImpact(BaseModel):
+    affected_students: int
+    affected_records: int
+    total_fees_delta: float
+    students: List[FeeChangeStudent]
+
+class BillingRunCreate(BaseModel):
+    academic_year: str
+    term: str
+    level: Optional[str] = None  # Student class; omit to bill every class
+
+class BillingRunResponse(BaseModel):
+    id: int
+    academic_year: str
+    term: str
+    level: Optional[str]
+    status: str
+    total_students: int
+    processed_students: int
+    records_created: int
+    amount_billed: float
+    error_message: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
 # Payment Schemas
 class PaymentBase(BaseModel):
     student_id: int
@@ -228,6 +280,24 @@ class PaymentResponse(PaymentBase):
     class Config:
         from_attributes = True
 
+class PaymentBatchCreate(BaseModel):
+    payments: List[PaymentCreate]
+
+class PaymentBatchRowResult(BaseModel):
+    row: int
+    status: str  # posted, rejected
+    student_id: Optional[int] = None
+    amount: Optional[float] = None
+    reference: Optional[str] = None
+    error: Optional[str] = None
+
+class PaymentBatchReport(BaseModel):
+    total_rows: int
+    posted: int
+    rejected: int
+    total_amount: float
+    results: List[PaymentBatchRowResult]
+
 # Wallet Schemas
 class WalletTopUp(BaseModel):
     amount: float
@@ -286,6 +356,7 @@ class SMSLogResponse(BaseModel):
     units_used: int
     created_at: datetime
     error_message: Optional[str] = None
+    job_id: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -305,6 +376,36 @@ class DashboardStats(BaseModel):
     wallet_balance: float
     recent_payments: List[PaymentResponse]
     subscription_days_left: Optional[int]
+    total_fees: float = 0.0
+    fully_paid: int = 0
+    partially_paid: int = 0
+    unpaid: int = 0
+    recent_students: List[StudentResponse] = []
+    generated_at: Optional[datetime] = None  # When the cached aggregates were computed
+
+# Report Schemas
+class ReportSeriesPoint(BaseModel):
+    period: str  # 2024-11-04 (day, or Monday of the week) or 2024-11 (month)
+    amount: float
+    count: int
+
+class ReportGroup(BaseModel):
+    key: Optional[str]  # Payment method, fee type, class or term
+    amount: float
+    count: int
+
+class CollectionReport(BaseModel):
+    start_date: Optional[date]
+    end_date: Optional[date]
+    interval: str
+    total_collected: float
+    payment_count: int
+    series: List[ReportSeriesPoint]
+    by_method: List[ReportGroup]
+    by_fee_type: List[ReportGroup]
+    by_class: List[ReportGroup]
+    by_term: List[ReportGroup]
+    generated_at: datetime
 
 # Bulk SMS Schemas
 class BulkSMSRequest(BaseModel):
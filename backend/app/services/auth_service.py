@@ -1,17 +1,31 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from app.config import settings
 from app.database import get_db
 from app import models, schemas
+from app.services.cache import principal_cache, principal_scope
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# bcrypt releases the GIL, so a small thread pool hashes in parallel while
+# the event loop keeps serving requests; its size caps the CPU logins can use
+_password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,6 +34,22 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the hashing pool
+
+    Returns:
+        (valid, new_hash); new_hash is set when the stored hash used a
+        different BCRYPT_ROUNDS and should be saved in its place
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -32,11 +62,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
+class Principal(NamedTuple):
+    """The authenticated user and their school (None when the user has none)"""
+    user: models.User
+    school: Optional[models.School]
+
+def _snapshot(instance) -> Optional[dict]:
+    """Column values of a loaded row, safe to share between requests"""
+    if instance is None:
+        return None
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+def _attach(db: AsyncSession, model, values: Optional[dict]):
+    """
+    Session-bound instance for a cached snapshot, without a query
+
+    The instance behaves as if it had just been loaded, so routes can
+    change it and commit as usual.
+    """
+    if values is None:
+        return None
+    instance = db.identity_map.get(identity_key(model, values["id"]))
+    if instance is None:
+        instance = model(**values)
+        make_transient_to_detached(instance)
+        db.add(instance)
+    return instance
+
+async def _load_principal(db: AsyncSession, username: str, credentials_exception: HTTPException) -> dict:
+    """User and school snapshots from one joined query"""
+    row = (await db.execute(
+        select(models.User, models.School)
+        .outerjoin(models.School, models.School.id == models.User.school_id)
+        .where(models.User.username == username)
+    )).first()
+    if row is None:
+        raise credentials_exception
+
+    user, school = row
+    return {"user": _snapshot(user), "school": _snapshot(school)}
+
+async def get_principal(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> models.User:
-    """Get current authenticated user from JWT token"""
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """
+    Resolve the user and school behind a JWT token
+
+    Snapshots are cached for PRINCIPAL_CACHE_TTL_SECONDS per token subject,
+    so most requests authenticate without touching the database; writes to
+    users or schools call invalidate_principals(). FastAPI resolves this
+    once per request for both get_current_user and require_active_school.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,23 +129,30 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
+    cached = await principal_cache.get_or_set_async(
+        principal_scope(token_data.school_id, token_data.username),
+        token_data.username,
+        lambda: _load_principal(db, token_data.username, credentials_exception)
+    )
+    user = _attach(db, models.User, cached["user"])
+    school = _attach(db, models.School, cached["school"])
 
     if token_data.school_id and user.school_id and token_data.school_id != user.school_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Tenant mismatch detected")
     
-    # Check if subscription is expired
+    # Lapsed but not swept yet (subscription_service): report it expired without writing
     if user.subscription_end_date and user.subscription_end_date < datetime.now():
         if user.subscription_status == models.SubscriptionStatus.ACTIVE:
-            user.subscription_status = models.SubscriptionStatus.EXPIRED
-            db.commit()
+            set_committed_value(user, "subscription_status", models.SubscriptionStatus.EXPIRED)
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    return user
+    return Principal(user, school)
+
+async def get_current_user(principal: Principal = Depends(get_principal)) -> models.User:
+    """Get current authenticated user from JWT token"""
+    return principal.user
 
 async def get_current_active_subscription(
     current_user: models.User = Depends(get_current_user)
@@ -102,18 +186,15 @@ def calculate_subscription_end_date(plan: models.SubscriptionPlan) -> datetime:
         return datetime.now() + timedelta(days=30)
 
 
-async def require_active_school(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-) -> models.School:
+async def require_active_school(principal: Principal = Depends(get_principal)) -> models.School:
     """Ensure the current user belongs to an active school/tenant."""
-    if not current_user.school_id:
+    if not principal.user.school_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No school is associated with this account. Please contact support."
         )
 
-    school = db.query(models.School).filter(models.School.id == current_user.school_id).first()
+    school = principal.school
     if not school:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,234 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import and_, exists, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app import models
+from app.services.cache import invalidate_tenant
+from app.services.payment_service import payment_status_case
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+RECORD_COLUMNS = [
+    "student_id", "school_id", "fee_structure_id", "fee_type", "amount",
+    "paid_amount", "balance", "status", "term", "academic_year"
+]
+
+
+def _enrolled(run: models.BillingRun) -> list:
+    """
+    Conditions selecting the students a run bills
+
+    The roster is every student of the tenant (in one class, if the run has
+    a level). A student's stored academic_year and term are the ones they
+    were enrolled in, so they don't limit it: a run for a new term bills
+    students already on the roll for that term's fees.
+    """
+    student = models.Student.__table__
+    conditions = [student.c.user_id == run.user_id]
+    if run.school_id:
+        conditions.append(student.c.school_id == run.school_id)
+    if run.level:
+        conditions.append(student.c.student_class == run.level)
+    return conditions
+
+
+def _missing_records(run: models.BillingRun, first_id: int, last_id: int):
+    """
+    Unpaid fee record rows students in [first_id, last_id] should have but don't
+
+    A fee structure applies to a student when its level is unset, "All" or
+    the student's class. The NOT EXISTS makes re-running a no-op.
+    """
+    student = models.Student.__table__
+    fee = models.FeeStructure.__table__
+    record = models.StudentFeeRecord.__table__
+
+    applies = [
+        fee.c.user_id == student.c.user_id,
+        fee.c.academic_year == run.academic_year,
+        fee.c.term == run.term,
+        or_(fee.c.level.is_(None), fee.c.level == "All", fee.c.level == student.c.student_class)
+    ]
+    if run.school_id:
+        applies.append(fee.c.school_id == run.school_id)
+
+    return select(
+        student.c.id.label("student_id"),
+        student.c.school_id,
+        fee.c.id.label("fee_structure_id"),
+        fee.c.fee_type,
+        fee.c.amount,
+        literal(0.0).label("paid_amount"),
+        fee.c.amount.label("balance"),
+        literal(models.PaymentStatus.UNPAID, type_=record.c.status.type).label("status"),
+        fee.c.term,
+        fee.c.academic_year
+    )\
+        .select_from(student.join(fee, and_(*applies)))\
+        .where(
+            *_enrolled(run),
+            student.c.id.between(first_id, last_id),
+            ~exists().where(record.c.student_id == student.c.id, record.c.fee_structure_id == fee.c.id)
+        )
+
+
+def bill_students(db: Session, run: models.BillingRun, first_id: int, last_id: int) -> Tuple[int, float]:
+    """
+    Attach the missing fee records for one range of student ids
+
+    One UPDATE ... FROM raises each student's total_fees and balance (and
+    status) by the sum of their missing fees, then one INSERT ... SELECT
+    creates the records. Students go first because both statements read
+    the same set of missing records. Doesn't commit.
+
+    Returns:
+        (records created, amount billed)
+    """
+    student = models.Student.__table__
+    record = models.StudentFeeRecord.__table__
+    missing = _missing_records(run, first_id, last_id).subquery()
+
+    records, amount = db.execute(
+        select(func.count(), func.coalesce(func.sum(missing.c.amount), 0.0)).select_from(missing)
+    ).one()
+    if not records:
+        return 0, 0.0
+
+    deltas = select(missing.c.student_id, func.sum(missing.c.amount).label("delta"))\
+        .group_by(missing.c.student_id)\
+        .subquery()
+    new_balance = student.c.balance + deltas.c.delta
+    db.execute(
+        update(student)
+        .where(student.c.id == deltas.c.student_id)
+        .values(
+            total_fees=student.c.total_fees + deltas.c.delta,
+            balance=new_balance,
+            status=payment_status_case(new_balance, student.c.paid_amount, student.c.status)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(insert(record).from_select(RECORD_COLUMNS, _missing_records(run, first_id, last_id)))
+
+    return records, float(amount)
+
+
+def create_billing_run(
+    db: Session,
+    user_id: int,
+    school_id: Optional[int],
+    academic_year: str,
+    term: str,
+    level: Optional[str] = None
+) -> models.BillingRun:
+    """
+    Queue a billing run in the caller's transaction
+
+    Refused (409) while another run for the same tenant (user_id, whose
+    students and fee structures a run bills) is queued or running; one
+    idle for BILLING_RUN_STALE_AFTER seconds is assumed dead. The tenant's
+    user row is locked first, so two concurrent requests can't both pass
+    the check and run overlapping INSERT ... SELECTs that would each
+    attach the same missing records.
+    """
+    db.execute(select(models.User.id).where(models.User.id == user_id).with_for_update())
+
+    cutoff = datetime.now() - timedelta(seconds=settings.BILLING_RUN_STALE_AFTER)
+    active = db.scalar(
+        select(models.BillingRun.id).where(
+            models.BillingRun.user_id == user_id,
+            models.BillingRun.status.in_(ACTIVE_STATUSES),
+            models.BillingRun.updated_at >= cutoff
+        ).limit(1)
+    )
+    if active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Billing run {active} is still in progress"
+        )
+
+    run = models.BillingRun(
+        user_id=user_id,
+        school_id=school_id,
+        academic_year=academic_year,
+        term=term,
+        level=level or None,
+        status="queued",
+        updated_at=datetime.now()
+    )
+    db.add(run)
+    db.flush()
+    return run
+
+
+def execute_billing_run(run_id: int, chunk_size: Optional[int] = None) -> Optional[models.BillingRun]:
+    """
+    Bill every enrolled student, committing progress after each chunk
+
+    Students are walked in id order, chunk_size (BILLING_CHUNK_SIZE) per
+    transaction, so a large school never holds one long transaction and
+    GET /fees/billing-runs/{id} can report progress. A failure marks the
+    run failed; chunks already committed stay billed, and because billing
+    is idempotent a new run finishes the rest.
+
+    Returns:
+        The finished run (detached), or None if it doesn't exist
+    """
+    student = models.Student.__table__
+    chunk_size = chunk_size or settings.BILLING_CHUNK_SIZE
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        run = db.get(models.BillingRun, run_id)
+        if run is None:
+            return None
+
+        try:
+            run.status = "running"
+            run.started_at = run.updated_at = datetime.now()
+            run.processed_students = run.records_created = 0
+            run.amount_billed = 0.0
+            run.total_students = db.scalar(select(func.count()).select_from(student).where(*_enrolled(run)))
+            db.commit()
+
+            last_id = 0
+            while True:
+                ids = db.scalars(
+                    select(student.c.id)
+                    .where(*_enrolled(run), student.c.id > last_id)
+                    .order_by(student.c.id)
+                    .limit(chunk_size)
+                ).all()
+                if not ids:
+                    break
+
+                records, amount = bill_students(db, run, ids[0], ids[-1])
+                run.processed_students += len(ids)
+                run.records_created += records
+                run.amount_billed = round(run.amount_billed + amount, 2)
+                run.updated_at = datetime.now()
+                db.commit()
+                last_id = ids[-1]
+
+            run.status = "completed"
+            run.finished_at = run.updated_at = datetime.now()
+            db.commit()
+            logger.info(f"Billing run {run.id}: {run.records_created} fee records for {run.processed_students} students")
+        except Exception as e:
+            db.rollback()
+            run.status = "failed"
+            run.error_message = str(e)
+            run.finished_at = run.updated_at = datetime.now()
+            db.commit()
+            logger.error(f"Billing run {run.id} failed: {str(e)}")
+        finally:
+            invalidate_tenant(run.user_id)
+
+        return run
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from app.config import settings
+
+
+class TenantCache:
+    """
+    In-process LRU cache of computed values, scoped per tenant
+
+    Each tenant has a version number that is part of every key, so
+    invalidate() drops all of a tenant's entries at once without scanning;
+    the stale entries simply age out of the LRU. Entries also expire after
+    ttl_seconds, which bounds staleness across worker processes.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _key(self, tenant_id: Hashable, name: Hashable) -> tuple:
+        return (tenant_id, self._versions.get(tenant_id, 0), name)
+
+    def _lookup(self, tenant_id: Hashable, name: Hashable) -> tuple:
+        """Return (key, hit, value) for the tenant's current version"""
+        with self._lock:
+            key = self._key(tenant_id, name)
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return key, True, entry[1]
+            return key, False, None
+
+    def _store(self, key: tuple, tenant_id: Hashable, name: Hashable, value: Any):
+        with self._lock:
+            # Don't store a value computed before a concurrent invalidate()
+            if key == self._key(tenant_id, name):
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def get_or_set(self, tenant_id: Hashable, name: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, calling compute() on a miss"""
+        key, hit, value = self._lookup(tenant_id, name)
+        if hit:
+            return value
+
+        value = compute()
+        self._store(key, tenant_id, name, value)
+        return value
+
+    async def get_or_set_async(self, tenant_id: Hashable, name: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """get_or_set() for an async compute(), e.g. lambda: db.run_sync(...)"""
+        key, hit, value = self._lookup(tenant_id, name)
+        if hit:
+            return value
+
+        value = await compute()
+        self._store(key, tenant_id, name, value)
+        return value
+
+    def invalidate(self, tenant_id: Hashable):
+        """Drop every cached value for a tenant"""
+        with self._lock:
+            self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+# Per-tenant aggregates (dashboard, reports); keyed by the owning user's id
+tenant_cache = TenantCache(settings.TENANT_CACHE_TTL_SECONDS)
+
+
+def invalidate_tenant(user_id: int):
+    """Call after committing a write that changes a tenant's aggregates"""
+    tenant_cache.invalidate(user_id)
+
+
+# Authenticated user + school snapshots; keyed by school, then token subject
+principal_cache = TenantCache(settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def principal_scope(school_id: Optional[int], username: Optional[str] = None) -> Hashable:
+    """Cache scope for a principal: its school, or the user itself when it has none"""
+    return school_id if school_id else ("user", username)
+
+
+def invalidate_principals(school_id: Optional[int], username: Optional[str] = None):
+    """Call after committing a change to a user's profile, balances or subscription, or to a school"""
+    principal_cache.invalidate(principal_scope(school_id, username))
@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+from typing import NamedTuple, Optional
+from sqlalchemy import func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import SMSPricing, SystemSettings
+
+
+class ConfigSnapshot(NamedTuple):
+    version: tuple
+    pricing: Optional[SimpleNamespace]
+    system_settings: Optional[SimpleNamespace]
+
+
+def _frozen(instance) -> Optional[SimpleNamespace]:
+    """Column values detached from any session, safe to share between requests"""
+    if instance is None:
+        return None
+    return SimpleNamespace(**{attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs})
+
+
+def _version(db: Session) -> tuple:
+    """Version stamp: changes whenever a pricing or settings row is added or updated"""
+    return tuple(db.execute(select(
+        select(func.count()).select_from(SMSPricing).scalar_subquery(),
+        select(func.max(SMSPricing.updated_at)).scalar_subquery(),
+        select(func.count()).select_from(SystemSettings).scalar_subquery(),
+        select(func.max(SystemSettings.updated_at)).scalar_subquery()
+    )).one())
+
+
+def _load(db: Session) -> ConfigSnapshot:
+    # Stamp first: a write landing mid-load just triggers another reload
+    version = _version(db)
+    pricing = db.scalar(
+        select(SMSPricing)
+        .where(SMSPricing.is_active == True)
+        .order_by(SMSPricing.effective_from.desc())
+        .limit(1)
+    )
+    system_settings = db.scalar(select(SystemSettings).order_by(SystemSettings.id).limit(1))
+    return ConfigSnapshot(version, _frozen(pricing), _frozen(system_settings))
+
+
+class ConfigCache:
+    """
+    Process-level copy of the active SMS pricing and the system settings
+
+    Both change a few times a year but are read on hot paths, so requests
+    use this snapshot without touching the database. At most every
+    check_seconds one request compares the version stamp and reloads if
+    another worker changed something; admin writes in this process call
+    refresh() so they show up immediately.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._checked_at = 0.0
+
+    async def get(self, db: AsyncSession) -> ConfigSnapshot:
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_seconds:
+            return self._snapshot
+
+        # Claim the check so concurrent requests keep using the current snapshot
+        self._checked_at = now
+        if self._snapshot is None or await db.run_sync(_version) != self._snapshot.version:
+            self._snapshot = await db.run_sync(_load)
+        return self._snapshot
+
+    async def refresh(self, db: AsyncSession) -> ConfigSnapshot:
+        """Reload now; call after committing a pricing or settings change"""
+        self._snapshot = await db.run_sync(_load)
+        self._checked_at = time.monotonic()
+        return self._snapshot
+
+
+config_cache = ConfigCache(settings.CONFIG_CACHE_CHECK_SECONDS)
+
+
+async def get_active_pricing(db: AsyncSession) -> Optional[SimpleNamespace]:
+    """The active SMSPricing (latest effective_from), or None"""
+    return (await config_cache.get(db)).pricing
+
+
+async def get_system_settings(db: AsyncSession) -> Optional[SimpleNamespace]:
+    """The SystemSettings row, or None if it hasn't been created yet"""
+    return (await config_cache.get(db)).system_settings
+
+
+async def get_student_limit(db: AsyncSession) -> Optional[int]:
+    """max_students_per_school; None (no settings row, or 0) means no limit"""
+    system_settings = await get_system_settings(db)
+    return (system_settings.max_students_per_school or None) if system_settings else None
@@ -0,0 +1,125 @@
+from typing import Dict, Optional
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.services.payment_service import payment_status_case
+
+
+def _student_deltas(fee_structure_id: int, new_amount: Optional[float]):
+    """
+    Per-student change in total fees when a fee structure's amount changes
+
+    new_amount=None means the fee structure is being removed, so each
+    record's whole amount comes off the student's total.
+    """
+    record = models.StudentFeeRecord.__table__
+    delta = -record.c.amount if new_amount is None else new_amount - record.c.amount
+    query = select(
+        record.c.student_id,
+        func.count().label("records"),
+        func.sum(delta).label("delta")
+    ).where(record.c.fee_structure_id == fee_structure_id)
+    if new_amount is not None:
+        query = query.where(record.c.amount != new_amount)
+    return query.group_by(record.c.student_id).subquery()
+
+
+def fee_change_impact(db: Session, fee_structure_id: int, new_amount: Optional[float]) -> Dict:
+    """
+    What propagating a fee structure change would do, without changing anything
+
+    Uses the same per-student deltas as propagate_fee_change.
+    """
+    student = models.Student.__table__
+    deltas = _student_deltas(fee_structure_id, new_amount)
+    new_total = student.c.total_fees + deltas.c.delta
+    rows = db.execute(
+        select(
+            student.c.id,
+            student.c.name,
+            deltas.c.records,
+            student.c.total_fees,
+            new_total.label("new_total_fees"),
+            student.c.paid_amount,
+            student.c.balance,
+            (new_total - student.c.paid_amount).label("new_balance")
+        )
+        .join(deltas, deltas.c.student_id == student.c.id)
+        .order_by(student.c.name, student.c.id)
+    ).all()
+
+    return {
+        "affected_students": len(rows),
+        "affected_records": sum(row.records for row in rows),
+        "total_fees_delta": round(sum(row.new_total_fees - row.total_fees for row in rows), 2),
+        "students": [
+            {
+                "student_id": row.id,
+                "name": row.name,
+                "total_fees": row.total_fees,
+                "new_total_fees": row.new_total_fees,
+                "paid_amount": row.paid_amount,
+                "balance": row.balance,
+                "new_balance": row.new_balance
+            }
+            for row in rows
+        ]
+    }
+
+
+def propagate_fee_change(db: Session, fee_structure_id: int, new_amount: Optional[float]) -> int:
+    """
+    Apply a fee structure's new amount (or removal) to students already billed for it
+
+    Set-based: one UPDATE ... FROM adjusts every affected student's
+    total_fees, balance and status from the per-student deltas, then one
+    statement updates (or deletes) the fee records themselves. Students
+    must go first because the deltas are read from the records' old
+    amounts. Payments already received stay in paid_amount; a reduction
+    below it leaves a negative balance (credit) and status Paid. A student
+    left owing nothing who never paid is Unpaid, not Paid.
+
+    Doesn't commit; call inside the transaction that changes the fee structure.
+
+    Returns:
+        Number of students updated
+    """
+    student = models.Student.__table__
+    record = models.StudentFeeRecord.__table__
+    deltas = _student_deltas(fee_structure_id, new_amount)
+    new_total = student.c.total_fees + deltas.c.delta
+    new_balance = new_total - student.c.paid_amount
+
+    students_updated = db.execute(
+        update(student)
+        .where(student.c.id == deltas.c.student_id)
+        .values(
+            total_fees=new_total,
+            balance=new_balance,
+            status=payment_status_case(new_balance, student.c.paid_amount, student.c.status)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if new_amount is None:
+        db.execute(delete(record).where(record.c.fee_structure_id == fee_structure_id))
+    else:
+        new_record_balance = new_amount - record.c.paid_amount
+        db.execute(
+            update(record)
+            .where(record.c.fee_structure_id == fee_structure_id, record.c.amount != new_amount)
+            .values(
+                amount=new_amount,
+                balance=new_record_balance,
+                status=payment_status_case(new_record_balance, record.c.paid_amount, record.c.status)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    return students_updated
+
+
+def is_billed(db: Session, fee_structure_id: int) -> bool:
+    """Whether any student already has a fee record for the fee structure"""
+    record = models.StudentFeeRecord
+    return db.scalar(select(exists().where(record.fee_structure_id == fee_structure_id)))
@@ -0,0 +1,215 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class DatabaseIdempotencyStore:
+    """Idempotency records in the idempotency_keys table"""
+
+    def __init__(self, ttl_seconds: int, lease_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+
+    def _reserve(self, scope: str, key: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Claim the key, or return the record already holding it
+
+        A live record is read without writing, so replays cost one SELECT.
+        An expired one (a completed response past its TTL, or an in_progress
+        claim whose lease ran out because the first request died before
+        completing) is taken over by a conditional UPDATE, so only one
+        retry wins it.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            lease = {
+                "fingerprint": fingerprint,
+                "status": IN_PROGRESS,
+                "response_status": None,
+                "response_body": None,
+                "content_type": None,
+                "expires_at": now + timedelta(seconds=self.lease_seconds)
+            }
+            record = self._get(db, scope, key)
+
+            if record is None:
+                db.add(models.IdempotencyRecord(scope=scope, key=key, **lease))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                record = self._get(db, scope, key)
+            elif record.expires_at < now:
+                taken = db.query(models.IdempotencyRecord)\
+                    .filter(models.IdempotencyRecord.id == record.id, models.IdempotencyRecord.expires_at < now)\
+                    .update(lease, synchronize_session=False)
+                db.commit()
+                if taken:
+                    return None
+                db.expire_all()
+                record = self._get(db, scope, key)
+
+            if not record:
+                return {"status": IN_PROGRESS, "fingerprint": fingerprint}
+
+            return {
+                "status": record.status,
+                "fingerprint": record.fingerprint,
+                "response_status": record.response_status,
+                "response_body": record.response_body,
+                "content_type": record.content_type
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _get(db, scope: str, key: str) -> Optional[models.IdempotencyRecord]:
+        return db.query(models.IdempotencyRecord)\
+            .filter(models.IdempotencyRecord.scope == scope, models.IdempotencyRecord.key == key)\
+            .first()
+
+    def _complete(self, scope: str, key: str, response_status: int, response_body: str, content_type: str):
+        db = SessionLocal()
+        try:
+            db.query(models.IdempotencyRecord)\
+                .filter(models.IdempotencyRecord.scope == scope, models.IdempotencyRecord.key == key)\
+                .update({
+                    "status": COMPLETED,
+                    "response_status": response_status,
+                    "response_body": response_body,
+                    "content_type": content_type,
+                    "expires_at": datetime.now() + timedelta(seconds=self.ttl_seconds)
+                })
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, scope: str, key: str):
+        db = SessionLocal()
+        try:
+            db.query(models.IdempotencyRecord)\
+                .filter(models.IdempotencyRecord.scope == scope, models.IdempotencyRecord.key == key)\
+                .delete()
+            db.commit()
+        finally:
+            db.close()
+
+    async def reserve(self, scope: str, key: str, fingerprint: str) -> Optional[Dict]:
+        return await run_in_threadpool(self._reserve, scope, key, fingerprint)
+
+    async def complete(self, scope: str, key: str, response_status: int, response_body: str, content_type: str):
+        await run_in_threadpool(self._complete, scope, key, response_status, response_body, content_type)
+
+    async def release(self, scope: str, key: str):
+        await run_in_threadpool(self._release, scope, key)
+
+
+class RedisIdempotencyStore:
+    """Idempotency records in Redis, expired by key TTL"""
+
+    def __init__(self, redis_url: str, ttl_seconds: int, lease_seconds: int):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"idempotency:{scope}:{key}"
+
+    async def reserve(self, scope: str, key: str, fingerprint: str) -> Optional[Dict]:
+        value = json.dumps({"status": IN_PROGRESS, "fingerprint": fingerprint})
+        # The in_progress claim only lives for the lease; complete() extends it to the TTL
+        if await self.client.set(self._key(scope, key), value, nx=True, ex=self.lease_seconds):
+            return None
+
+        existing = await self.client.get(self._key(scope, key))
+        if existing is None:
+            return {"status": IN_PROGRESS, "fingerprint": fingerprint}
+        return json.loads(existing)
+
+    async def complete(self, scope: str, key: str, response_status: int, response_body: str, content_type: str):
+        existing = await self.client.get(self._key(scope, key))
+        record = json.loads(existing) if existing else {}
+        record.update({
+            "status": COMPLETED,
+            "response_status": response_status,
+            "response_body": response_body,
+            "content_type": content_type
+        })
+        await self.client.set(self._key(scope, key), json.dumps(record), ex=self.ttl_seconds)
+
+    async def release(self, scope: str, key: str):
+        await self.client.delete(self._key(scope, key))
+
+
+_store = None
+
+
+def get_idempotency_store():
+    """Return the configured store (created on first use)"""
+    global _store
+    if _store is None:
+        if settings.IDEMPOTENCY_BACKEND == "redis":
+            _store = RedisIdempotencyStore(
+                settings.REDIS_URL, settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LEASE_SECONDS
+            )
+        else:
+            _store = DatabaseIdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LEASE_SECONDS)
+        logger.info(f"Idempotency store: {settings.IDEMPOTENCY_BACKEND}")
+    return _store
+
+
+def purge_expired_keys() -> int:
+    """
+    Delete expired rows from idempotency_keys in their own transaction
+
+    Kept off the request path; run by run_idempotency_purger or
+    `python manage.py purge-idempotency-keys`. Redis keys expire by TTL.
+
+    Returns:
+        Number of keys deleted
+    """
+    db = SessionLocal()
+    try:
+        deleted = db.execute(
+            delete(models.IdempotencyRecord).where(models.IdempotencyRecord.expires_at < datetime.now())
+        ).rowcount
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_idempotency_purger():
+    """In-process loop: purge expired idempotency keys every IDEMPOTENCY_PURGE_INTERVAL seconds"""
+    logger.info("Idempotency key purger started")
+
+    while True:
+        try:
+            count = await run_in_threadpool(purge_expired_keys)
+            if count:
+                logger.info(f"Purged {count} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Idempotency key purge failed: {str(e)}")
+
+        await asyncio.sleep(settings.IDEMPOTENCY_PURGE_INTERVAL)
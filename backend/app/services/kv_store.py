@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryKVStore:
+    """
+    Expiring key-value store in this process (LRU beyond max_entries)
+
+    Only suitable for a single worker: other processes can't see its keys.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: Any, ttl_seconds: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisKVStore:
+    """Expiring key-value store in Redis, shared by every worker; values are stored as JSON"""
+
+    def __init__(self, redis_url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"kv:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self._key(key))
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl_seconds: int):
+        await self.client.set(self._key(key), json.dumps(value), ex=ttl_seconds)
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+
+_store = None
+
+
+def get_kv_store():
+    """
+    Return the configured store (created on first use)
+
+    Values must be JSON-serializable so either backend can be configured.
+    Namespace keys by feature, e.g. "reset-code:<email>".
+    """
+    global _store
+    if _store is None:
+        if settings.KV_STORE_BACKEND == "redis":
+            _store = RedisKVStore(settings.REDIS_URL)
+        else:
+            _store = MemoryKVStore(settings.KV_STORE_MAX_ENTRIES)
+        logger.info(f"Key-value store: {settings.KV_STORE_BACKEND}")
+    return _store
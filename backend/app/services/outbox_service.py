@@ -0,0 +1,267 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import update, func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app import models
+from app.services.cache import invalidate_principals
+from app.services.sms_service import get_sms_provider
+from app.services.wallet_service import adjust_balances
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Wakes the in-process worker as soon as new messages are committed
+_wakeup: Optional[asyncio.Event] = None
+
+
+def enqueue_sms(
+    db: Session,
+    user: models.User,
+    recipient: str,
+    message: str,
+    description: Optional[str] = None,
+    job_id: Optional[str] = None
+) -> Optional[models.SMSOutbox]:
+    """
+    Queue an SMS for background delivery
+
+    Reserves one SMS unit (guarded, so queued messages can never overdraw
+    the balance) and records the usage, then creates a pending SMSLog and
+    an outbox row, all in the caller's transaction. A message that finally
+    fails gets its unit refunded. The caller commits, invalidates the
+    user's cached principal, then calls notify_worker().
+
+    Returns:
+        The outbox row, or None if the user has no SMS unit left (nothing queued)
+    """
+    description = description or f"SMS sent to {recipient}"
+    balances = adjust_balances(db, user, sms_units=-1)
+    if balances is None:
+        return None
+
+    db.add(models.WalletTransaction(
+        user_id=user.id,
+        school_id=user.school_id,
+        transaction_type="sms_usage",
+        sms_units=1,
+        description=description,
+        **balances
+    ))
+
+    sms_log = models.SMSLog(
+        user_id=user.id,
+        school_id=user.school_id,
+        recipient=recipient,
+        message=message,
+        status="pending",
+        units_used=0
+    )
+    db.add(sms_log)
+    db.flush()
+
+    outbox = models.SMSOutbox(
+        user_id=user.id,
+        school_id=user.school_id,
+        sms_log_id=sms_log.id,
+        job_id=job_id or uuid.uuid4().hex,
+        recipient=recipient,
+        message=message,
+        sender_id=user.arkesel_sender_id,
+        description=description,
+        status="queued",
+        attempts=0,
+        next_attempt_at=datetime.now()
+    )
+    db.add(outbox)
+    db.flush()
+
+    return outbox
+
+
+def notify_worker():
+    """Hand newly committed messages to the configured worker"""
+    if settings.SMS_OUTBOX_BACKEND == "celery":
+        from app.worker import deliver_outbox
+        deliver_outbox.delay()
+    elif _wakeup is not None:
+        _wakeup.set()
+
+
+def get_job_status(db: Session, job_id: str, school_id: Optional[int]) -> Optional[Dict]:
+    """Count a job's messages by delivery status"""
+    rows = db.query(models.SMSOutbox.status, func.count(models.SMSOutbox.id))\
+        .filter(
+            models.SMSOutbox.job_id == job_id,
+            models.SMSOutbox.school_id == school_id
+        )\
+        .group_by(models.SMSOutbox.status)\
+        .all()
+
+    if not rows:
+        return None
+
+    counts = {"queued": 0, "sending": 0, "sent": 0, "failed": 0}
+    counts.update({row_status: count for row_status, count in rows})
+    total = sum(counts.values())
+
+    return {
+        "job_id": job_id,
+        "total": total,
+        **counts,
+        "completed": counts["sent"] + counts["failed"] == total
+    }
+
+
+def _requeue_stale(db: Session):
+    """Return rows stuck in "sending" (e.g. worker crashed) to the queue"""
+    cutoff = datetime.now() - timedelta(seconds=settings.SMS_OUTBOX_STALE_AFTER)
+    db.execute(
+        update(models.SMSOutbox)
+        .where(models.SMSOutbox.status == "sending", models.SMSOutbox.updated_at < cutoff)
+        .values(status="queued", updated_at=datetime.now()),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def _claim_batch(db: Session, limit: int) -> List[models.SMSOutbox]:
+    """Claim due messages; the guarded UPDATE keeps concurrent workers from sending twice"""
+    candidates = db.query(models.SMSOutbox)\
+        .filter(
+            models.SMSOutbox.status == "queued",
+            models.SMSOutbox.next_attempt_at <= datetime.now()
+        )\
+        .order_by(models.SMSOutbox.id)\
+        .limit(limit)\
+        .all()
+
+    claimed = []
+    for item in candidates:
+        result = db.execute(
+            update(models.SMSOutbox)
+            .where(models.SMSOutbox.id == item.id, models.SMSOutbox.status == "queued")
+            .values(status="sending", updated_at=datetime.now()),
+            execution_options={"synchronize_session": False}
+        )
+        if result.rowcount == 1:
+            # The UPDATE bypassed the session; without this, setting the
+            # status back to "queued" on failure would look like no change
+            set_committed_value(item, "status", "sending")
+            claimed.append(item)
+
+    db.commit()
+    return claimed
+
+
+def _record_success(item: models.SMSOutbox, result: Dict):
+    """Mark delivered; the unit was already reserved when the message was queued"""
+    item.status = "sent"
+    item.attempts += 1
+    item.error_message = None
+    item.sms_log.status = "sent"
+    item.sms_log.units_used = 1
+    item.sms_log.arkesel_response = str(result.get('response'))
+    item.sms_log.error_message = None
+
+
+def _record_failure(db: Session, item: models.SMSOutbox, result: Dict):
+    """Schedule a retry, or fail the message and refund its unit once attempts are exhausted"""
+    item.attempts += 1
+    item.error_message = result.get('message')
+
+    if item.attempts < settings.SMS_OUTBOX_MAX_ATTEMPTS:
+        item.status = "queued"
+        item.next_attempt_at = datetime.now() + timedelta(seconds=settings.SMS_OUTBOX_RETRY_DELAY * item.attempts)
+    else:
+        item.status = "failed"
+        item.sms_log.status = "failed"
+        item.sms_log.arkesel_response = str(result.get('response'))
+        item.sms_log.error_message = result.get('message')
+
+        user = db.get(models.User, item.user_id)
+        balances = adjust_balances(db, user, sms_units=1, allow_negative=True)
+        db.add(models.WalletTransaction(
+            user_id=item.user_id,
+            school_id=item.school_id,
+            transaction_type="sms_refund",
+            sms_units=1,
+            description=f"Refund: {item.description}",
+            **balances
+        ))
+
+
+def _claim_due(db: Session, limit: int) -> List[models.SMSOutbox]:
+    _requeue_stale(db)
+    return _claim_batch(db, limit)
+
+
+def _record_results(db: Session, batch: List[models.SMSOutbox], results: List[Dict]):
+    for item, result in zip(batch, results):
+        if result['success']:
+            _record_success(item, result)
+        else:
+            _record_failure(db, item, result)
+
+    db.commit()
+    # Refunds changed SMS balances
+    for school_id in {item.school_id for item in batch if item.status == "failed"}:
+        invalidate_principals(school_id)
+
+
+async def process_outbox(limit: Optional[int] = None) -> int:
+    """
+    Deliver one batch of queued messages
+
+    Database work runs in the threadpool so the sync session never blocks
+    the event loop the API is serving requests on.
+
+    Returns:
+        Number of messages attempted
+    """
+    # Claimed rows keep their loaded values, so sending reads no attributes from the database
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        batch = await run_in_threadpool(_claim_due, db, limit or settings.SMS_OUTBOX_BATCH_SIZE)
+        if not batch:
+            return 0
+
+        limiter = asyncio.Semaphore(settings.SMS_BULK_CONCURRENCY)
+
+        async def _send(item: models.SMSOutbox) -> Dict:
+            async with limiter:
+                return await get_sms_provider(item.sender_id).send_sms(item.recipient, item.message)
+
+        results = await asyncio.gather(*(_send(item) for item in batch))
+
+        await run_in_threadpool(_record_results, db, batch, results)
+        return len(batch)
+    finally:
+        db.close()
+
+
+async def run_outbox_worker():
+    """In-process worker loop: drain the outbox, then sleep until woken or polled"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    logger.info("SMS outbox worker started")
+
+    while True:
+        try:
+            processed = await process_outbox()
+        except Exception as e:
+            logger.error(f"SMS outbox batch failed: {str(e)}")
+            processed = 0
+
+        if processed:
+            continue
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.SMS_OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
@@ -0,0 +1,280 @@
+import csv
+import io
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import update, case, literal, select, insert, bindparam
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.services.rollup_service import record_payments
+
+
+def payment_status_case(balance, paid_amount, status_column):
+    """
+    SQL equivalent of the Paid/Partial/Unpaid rule, evaluated in the database
+
+    Nothing paid is Unpaid even when nothing is owed (e.g. a student's only
+    fee was removed or set to 0), so a zero total never reads as Paid.
+
+    Args:
+        balance: Expression for the new balance
+        paid_amount: Expression for the new paid amount
+        status_column: Column whose Enum type the result is stored as
+    """
+    def _status(value: models.PaymentStatus):
+        return literal(value, type_=status_column.type)
+
+    return case(
+        (paid_amount <= 0, _status(models.PaymentStatus.UNPAID)),
+        (balance <= 0, _status(models.PaymentStatus.PAID)),
+        else_=_status(models.PaymentStatus.PARTIAL)
+    )
+
+
+def _student_payment_statement():
+    """
+    Guarded increment of a student's totals
+
+    Bound with b_student_id and b_amount; runs once or as an executemany.
+    """
+    student = models.Student.__table__
+    amount = bindparam("b_amount")
+    return update(student)\
+        .where(student.c.id == bindparam("b_student_id"), student.c.balance >= amount)\
+        .values(
+            paid_amount=student.c.paid_amount + amount,
+            balance=student.c.balance - amount,
+            status=payment_status_case(
+                student.c.balance - amount,
+                student.c.paid_amount + amount,
+                student.c.status
+            )
+        )
+
+
+def _fee_record_payment_statement():
+    """
+    Increment of the student's first fee record matching fee type and term
+
+    Bound with b_student_id, b_fee_type, b_term and b_amount.
+    """
+    record = models.StudentFeeRecord.__table__
+    amount = bindparam("b_amount")
+    record_id = select(record.c.id)\
+        .where(
+            record.c.student_id == bindparam("b_student_id"),
+            record.c.fee_type == bindparam("b_fee_type"),
+            record.c.term == bindparam("b_term")
+        )\
+        .order_by(record.c.id)\
+        .limit(1)\
+        .scalar_subquery()
+
+    return update(record)\
+        .where(record.c.id == record_id)\
+        .values(
+            paid_amount=record.c.paid_amount + amount,
+            balance=record.c.amount - (record.c.paid_amount + amount),
+            status=payment_status_case(
+                record.c.amount - (record.c.paid_amount + amount),
+                record.c.paid_amount + amount,
+                record.c.status
+            )
+        )
+
+
+def apply_student_payment(db: Session, student_id: int, amount: float) -> bool:
+    """
+    Atomically credit a payment to a student's running totals
+
+    The balance guard lives in the UPDATE itself, so two cashiers posting at
+    once can neither lose an update nor pay past the outstanding balance.
+
+    Returns:
+        False if the payment exceeds the current balance (nothing changed)
+    """
+    result = db.execute(
+        _student_payment_statement(),
+        {"b_student_id": student_id, "b_amount": amount}
+    )
+    return result.rowcount == 1
+
+
+def apply_fee_record_payment(db: Session, student_id: int, fee_type: str, term: str, amount: float) -> bool:
+    """
+    Atomically credit a payment to the student's matching fee record
+
+    Returns:
+        False if the student has no record for this fee type and term
+    """
+    result = db.execute(
+        _fee_record_payment_statement(),
+        {"b_student_id": student_id, "b_fee_type": fee_type, "b_term": term, "b_amount": amount}
+    )
+    return result.rowcount == 1
+
+
+def generate_payment_reference(length: int = 8) -> str:
+    """Receipt reference, e.g. PAY-1A2B3C4D"""
+    return f"PAY-{uuid.uuid4().hex[:length].upper()}"
+
+
+def read_payment_csv(stream: BinaryIO, max_rows: int) -> List[Tuple[int, Optional[schemas.PaymentCreate], Optional[str]]]:
+    """
+    Parse a statement CSV into batch rows
+
+    Expected columns: student_id, amount, payment_method, fee_type and
+    optionally term, academic_year, payment_date. Invalid rows are kept
+    with their error so they appear in the report.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    required = {"student_id", "amount", "payment_method", "fee_type"}
+    missing = required - set(reader.fieldnames or [])
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV is missing columns: {', '.join(sorted(missing))}"
+        )
+
+    rows = []
+    for row_number, record in enumerate(reader, start=1):
+        if row_number > max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch is limited to {max_rows} payments"
+            )
+        data = {field: value.strip() for field, value in record.items() if field and value and value.strip()}
+        try:
+            rows.append((row_number, schemas.PaymentCreate(**data), None))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+            rows.append((row_number, None, error))
+
+    return rows
+
+
+def post_payment_batch(
+    db: Session,
+    user: models.User,
+    rows: List[Tuple[int, Optional[schemas.PaymentCreate], Optional[str]]]
+) -> Dict:
+    """
+    Post many payments as one unit of work
+
+    Students are validated in a single query, then balances, fee records,
+    Payment rows and the daily rollup are written with one executemany
+    statement each. The caller commits.
+
+    Args:
+        rows: (row number, parsed payment or None, parse error or None)
+
+    Returns:
+        Per-row report (see schemas.PaymentBatchReport)
+    """
+    results = {}
+    valid = []
+    for row, payment, error in rows:
+        if payment is None:
+            results[row] = {"row": row, "status": "rejected", "error": error}
+        else:
+            valid.append((row, payment))
+
+    student_ids = {payment.student_id for _, payment in valid}
+    students = {}
+    if student_ids:
+        students = {
+            student.id: student
+            for student in db.query(
+                models.Student.id,
+                models.Student.name,
+                models.Student.student_class,
+                models.Student.term,
+                models.Student.academic_year,
+                models.Student.balance
+            ).filter(
+                models.Student.id.in_(student_ids),
+                models.Student.user_id == user.id,
+                models.Student.school_id == user.school_id
+            )
+        }
+
+    remaining = {student_id: student.balance for student_id, student in students.items()}
+    student_totals = defaultdict(float)
+    fee_totals = defaultdict(float)
+    payment_rows = []
+    now = datetime.now()
+
+    for row, payment in valid:
+        student = students.get(payment.student_id)
+        if not student:
+            error = "Student not found"
+        elif payment.amount <= 0:
+            error = "Payment amount must be greater than 0"
+        elif payment.amount > remaining[student.id]:
+            error = f"Payment amount (GHS {payment.amount}) exceeds balance (GHS {remaining[student.id]})"
+        else:
+            error = None
+
+        if error:
+            results[row] = {"row": row, "status": "rejected", "student_id": payment.student_id, "amount": payment.amount, "error": error}
+            continue
+
+        term = payment.term or student.term
+        reference = generate_payment_reference(12)
+        remaining[student.id] -= payment.amount
+        student_totals[student.id] += payment.amount
+        if payment.fee_type:
+            fee_totals[(student.id, payment.fee_type, term)] += payment.amount
+
+        payment_rows.append({
+            "user_id": user.id,
+            "school_id": user.school_id,
+            "student_id": student.id,
+            "reference": reference,
+            "amount": payment.amount,
+            "payment_method": payment.payment_method,
+            "fee_type": payment.fee_type,
+            "term": term,
+            "academic_year": payment.academic_year or student.academic_year,
+            "payment_date": payment.payment_date or now,
+            "student_name": student.name,
+            "student_class": student.student_class,
+            "created_at": now
+        })
+        results[row] = {"row": row, "status": "posted", "student_id": student.id, "amount": payment.amount, "reference": reference}
+
+    if payment_rows:
+        updated = db.execute(
+            _student_payment_statement(),
+            [{"b_student_id": student_id, "b_amount": amount} for student_id, amount in student_totals.items()]
+        ).rowcount
+        if updated != len(student_totals):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Student balances changed while the batch was being posted. Please retry."
+            )
+
+        if fee_totals:
+            db.execute(
+                _fee_record_payment_statement(),
+                [
+                    {"b_student_id": student_id, "b_fee_type": fee_type, "b_term": term, "b_amount": amount}
+                    for (student_id, fee_type, term), amount in fee_totals.items()
+                ]
+            )
+
+        db.execute(insert(models.Payment), payment_rows)
+        record_payments(db, payment_rows)
+
+    ordered = [results[row] for row in sorted(results)]
+    return {
+        "total_rows": len(ordered),
+        "posted": len(payment_rows),
+        "rejected": len(ordered) - len(payment_rows),
+        "total_amount": round(sum(row["amount"] for row in payment_rows), 2),
+        "results": ordered
+    }
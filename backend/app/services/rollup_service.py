@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import Date, cast, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ("user_id", "day", "fee_type", "payment_method", "student_class", "term", "academic_year")
+
+
+def _day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _upsert(db: Session, rows):
+    """Add amount/payment_count onto existing rollup rows, inserting new keys"""
+    rollup = models.PaymentDailyRollup.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        statement = dialect_insert(rollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={
+                "amount": rollup.c.amount + statement.excluded.amount,
+                "payment_count": rollup.c.payment_count + statement.excluded.payment_count,
+            }
+        )
+        db.execute(statement, rows)
+        return
+
+    for row in rows:
+        key = [rollup.c[column] == row[column] for column in KEY_COLUMNS]
+        updated = db.execute(
+            rollup.update().where(*key).values(
+                amount=rollup.c.amount + row["amount"],
+                payment_count=rollup.c.payment_count + row["payment_count"]
+            )
+        ).rowcount
+        if not updated:
+            db.execute(insert(rollup), [row])
+
+
+def record_payments(db: Session, payments: Iterable, sign: int = 1):
+    """
+    Apply payments to payment_daily_rollup in the caller's transaction
+
+    Args:
+        payments: Payment objects or dicts with the Payment columns
+        sign: -1 to take payments back out (e.g. before deleting them)
+
+    Payments without a payment_date are skipped, as rebuild_rollup skips them.
+    """
+    totals: Dict[tuple, list] = defaultdict(lambda: [0.0, 0, None])
+    for payment in payments:
+        get = payment.get if isinstance(payment, dict) else lambda name: getattr(payment, name)
+        if get("payment_date") is None:
+            continue
+        key = (
+            get("user_id"),
+            _day(get("payment_date")),
+            get("fee_type") or "",
+            get("payment_method") or "",
+            get("student_class") or "",
+            get("term") or "",
+            get("academic_year") or "",
+        )
+        totals[key][0] += sign * get("amount")
+        totals[key][1] += sign
+        totals[key][2] = get("school_id")
+
+    if not totals:
+        return
+
+    _upsert(db, [
+        {**dict(zip(KEY_COLUMNS, key)), "school_id": school_id, "amount": amount, "payment_count": count}
+        for key, (amount, count, school_id) in totals.items()
+    ])
+    if sign < 0:
+        # Drop days that no longer have any payments so reports don't list empty groups
+        rollup = models.PaymentDailyRollup
+        db.execute(
+            delete(rollup)
+            .where(rollup.user_id.in_({key[0] for key in totals}))
+            .where(rollup.payment_count <= 0)
+        )
+
+
+def rebuild_rollup(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Regenerate payment_daily_rollup from Payment history
+
+    One DELETE and one INSERT ... SELECT ... GROUP BY in the caller's
+    transaction; pass user_id to rebuild a single tenant.
+
+    Returns:
+        Number of rollup rows written
+    """
+    payment = models.Payment
+    rollup = models.PaymentDailyRollup.__table__
+
+    if db.get_bind().dialect.name == "sqlite":
+        day = func.date(payment.payment_date)
+    else:
+        day = cast(payment.payment_date, Date)
+
+    dimensions = [
+        payment.user_id,
+        day,
+        func.coalesce(payment.fee_type, ""),
+        func.coalesce(payment.payment_method, ""),
+        func.coalesce(payment.student_class, ""),
+        func.coalesce(payment.term, ""),
+        func.coalesce(payment.academic_year, ""),
+    ]
+    grouped = select(
+        *dimensions,
+        func.max(payment.school_id),
+        func.sum(payment.amount),
+        func.count(payment.id)
+    ).where(payment.payment_date.isnot(None)).group_by(*dimensions)
+
+    clear = delete(rollup)
+    if user_id is not None:
+        grouped = grouped.where(payment.user_id == user_id)
+        clear = clear.where(rollup.c.user_id == user_id)
+
+    db.execute(clear)
+    result = db.execute(
+        insert(rollup).from_select([*KEY_COLUMNS, "school_id", "amount", "payment_count"], grouped)
+    )
+    logger.info(f"Rebuilt payment rollup ({result.rowcount} rows)")
+    return result.rowcount
@@ -0,0 +1,54 @@
+from typing import Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app import models
+
+
+def reserve_student_slots(db: Session, school_id: int, wanted: int, limit: Optional[int]) -> int:
+    """
+    Count `wanted` new students against a school, up to `limit`
+
+    Check and increment are one guarded UPDATE on schools.student_count, so
+    concurrent creates and imports can't overshoot the limit, and the
+    reservation rolls back with the caller's transaction. When there isn't
+    room for all of them, the remaining room is granted instead.
+
+    Returns:
+        How many students may be inserted (0 when the school is full)
+    """
+    schools = models.School.__table__
+    while wanted > 0:
+        statement = update(schools)\
+            .where(schools.c.id == school_id)\
+            .values(student_count=schools.c.student_count + wanted)
+        if limit:
+            statement = statement.where(schools.c.student_count + wanted <= limit)
+        if db.execute(statement).rowcount == 1:
+            return wanted
+
+        current = db.scalar(select(schools.c.student_count).where(schools.c.id == school_id))
+        if current is None or not limit or current >= limit:
+            return 0
+        wanted = min(wanted, limit - current)
+    return 0
+
+
+def release_student_slots(db: Session, school_id: int, count: int = 1):
+    """Give back slots for deleted students (never below zero)"""
+    schools = models.School.__table__
+    db.execute(
+        update(schools)
+        .where(schools.c.id == school_id, schools.c.student_count >= count)
+        .values(student_count=schools.c.student_count - count)
+    )
+
+
+def recount_students(db) -> None:
+    """Recompute every schools.student_count from the students table (Session or Connection)"""
+    schools = models.School.__table__
+    students = models.Student.__table__
+    db.execute(
+        update(schools).values(student_count=(
+            select(func.count()).select_from(students).where(students.c.school_id == schools.c.id).scalar_subquery()
+        ))
+    )
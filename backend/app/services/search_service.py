@@ -0,0 +1,165 @@
+from sqlalchemy import text, or_, case, desc, func, literal_column, select, table, column
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from typing import List
+from app import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Trigram indexes only help for terms of at least three characters
+MIN_INDEXED_TERM = 3
+
+# Matches ranked per search; broader terms are ranked within the first ones
+SEARCH_CANDIDATES = 500
+
+# Index backend per dialect, set by install_search_index(): fts5, trigram or like
+_backend = {}
+
+_students_fts = table("students_fts", column("rowid"))
+
+_SQLITE_FTS = [
+    # External-content FTS5 table over students; trigram tokens give
+    # case-insensitive substring matching like ILIKE '%term%'
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        name, parent_name, content='students', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts(rowid, name, parent_name) VALUES (new.id, new.name, new.parent_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, parent_name) VALUES ('delete', old.id, old.name, old.parent_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF name, parent_name ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, parent_name) VALUES ('delete', old.id, old.name, old.parent_name);
+        INSERT INTO students_fts(rowid, name, parent_name) VALUES (new.id, new.name, new.parent_name);
+    END""",
+]
+
+_POSTGRES_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_students_name_trgm ON students USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_students_parent_name_trgm ON students USING gin (parent_name gin_trgm_ops)",
+]
+
+
+def install_search_index(engine: Engine):
+    """
+    Create the student name search index for this database
+
+    SQLite gets an FTS5 trigram table kept in sync by triggers; Postgres
+    gets pg_trgm GIN indexes. If neither is available search falls back to
+    an unindexed ILIKE scan.
+    """
+    dialect = engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            with engine.begin() as conn:
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'"
+                )).first()
+                for statement in _SQLITE_FTS:
+                    conn.execute(text(statement))
+                if not exists:
+                    # Index students created before the table existed
+                    conn.execute(text("INSERT INTO students_fts(students_fts) VALUES ('rebuild')"))
+            _backend[dialect] = "fts5"
+        elif dialect == "postgresql":
+            with engine.begin() as conn:
+                for statement in _POSTGRES_TRGM:
+                    conn.execute(text(statement))
+            _backend[dialect] = "trigram"
+        else:
+            _backend[dialect] = "like"
+    except DBAPIError as e:
+        logger.warning(f"Student search index unavailable, using ILIKE scans: {e}")
+        _backend[dialect] = "like"
+
+    logger.info(f"Student search backend: {_backend[dialect]}")
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _like_filter(term: str):
+    pattern = _like_pattern(term)
+    return or_(
+        models.Student.name.ilike(pattern, escape="\\"),
+        models.Student.parent_name.ilike(pattern, escape="\\")
+    )
+
+
+def _fts_phrase(term: str) -> str:
+    # A quoted phrase matches the term as a substring under the trigram tokenizer
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _backend_for(db) -> str:
+    return _backend.get(db.get_bind().dialect.name, "like")
+
+
+def filter_students(db, query, term: str):
+    """
+    Restrict a Student select to names or parent names containing term
+
+    db (a Session or AsyncSession) only picks the index backend; ordering
+    is left to the caller.
+    """
+    term = term.strip()
+    if _backend_for(db) == "fts5" and len(term) >= MIN_INDEXED_TERM:
+        # IN (subquery) keeps SQLite driving from the FTS index; a plain
+        # join makes it probe the FTS table once per tenant row
+        matches = select(_students_fts.c.rowid)\
+            .where(literal_column("students_fts").op("MATCH")(_fts_phrase(term)))
+        return query.filter(models.Student.id.in_(matches))
+
+    # On Postgres the pg_trgm GIN indexes serve ILIKE '%term%' directly
+    return query.filter(_like_filter(term))
+
+
+def _match_rank(term: str):
+    """0 = name starts with term, 1 = name contains it, 2 = parent name only"""
+    prefix = _like_pattern(term)[1:]  # "term%"
+    return case(
+        (models.Student.name.ilike(prefix, escape="\\"), 0),
+        (models.Student.name.ilike(_like_pattern(term), escape="\\"), 1),
+        else_=2
+    )
+
+
+def search_students(db: Session, query, term: str, limit: int) -> List[models.Student]:
+    """
+    Ranked name/parent name search over a (tenant-filtered) Student select
+
+    Matching ids come from the index, capped at SEARCH_CANDIDATES, and only
+    those are ranked: name prefix matches first, then name matches, then
+    parent name matches; ties go to trigram similarity on Postgres and to
+    the shortest name. Very broad terms are therefore ranked within the
+    first SEARCH_CANDIDATES matches, which keeps typeahead latency flat.
+    """
+    term = term.strip()
+    candidate_ids = db.scalars(
+        filter_students(db, query, term)
+        .with_only_columns(models.Student.id)
+        .limit(SEARCH_CANDIDATES)
+    ).all()
+    if not candidate_ids:
+        return []
+
+    order = [_match_rank(term)]
+    if _backend_for(db) == "trigram":
+        order.append(desc(func.greatest(
+            func.similarity(models.Student.name, term),
+            func.similarity(func.coalesce(models.Student.parent_name, ""), term)
+        )))
+    order += [func.length(models.Student.name), models.Student.name]
+
+    return db.scalars(
+        select(models.Student)
+        .where(models.Student.id.in_(candidate_ids))
+        .order_by(*order)
+        .limit(limit)
+    ).all()
@@ -1,10 +1,86 @@
+import asyncio
 import httpx
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared pooled client, opened in the app lifespan and reused by every provider
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Connection reuse counters (requests sent vs new TCP connections opened)
+_connection_stats = {"requests": 0, "connections_opened": 0}
+
+
+async def _trace_connections(event_name: str, info: Dict):
+    """httpcore trace hook: count every new TCP connection"""
+    if event_name == "connection.connect_tcp.complete":
+        _connection_stats["connections_opened"] += 1
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the pooled Arkesel client from settings"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.ARKESEL_HTTP_TIMEOUT,
+            connect=settings.ARKESEL_HTTP_CONNECT_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.ARKESEL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.ARKESEL_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.ARKESEL_HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+
+async def open_http_client():
+    """Create the shared client (called on app startup)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+        logger.info("Arkesel HTTP client pool opened")
+
+
+async def close_http_client():
+    """Close the shared client and its pooled connections (called on app shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Arkesel HTTP client pool closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan"""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def get_connection_stats() -> Dict:
+    """Connection reuse metric for the shared Arkesel client"""
+    requests_sent = _connection_stats["requests"]
+    opened = _connection_stats["connections_opened"]
+    reused = max(requests_sent - opened, 0)
+    return {
+        "requests": requests_sent,
+        "connections_opened": opened,
+        "connections_reused": reused,
+        "reuse_ratio": round(reused / requests_sent, 4) if requests_sent else 0.0
+    }
+
+
+async def _get(url: str, params: Dict, timeout: Optional[float] = None) -> httpx.Response:
+    """GET through the shared client, recording connection usage"""
+    _connection_stats["requests"] += 1
+    kwargs = {"params": params, "extensions": {"trace": _trace_connections}}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return await get_http_client().get(url, **kwargs)
+
 class ArkeselSMSProvider:
     """Arkesel SMS Provider with hardcoded API credentials"""
     
@@ -55,34 +131,33 @@ class ArkeselSMSProvider:
         
         # Try primary API call
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(self.api_url, params=params)
+            response = await _get(self.api_url, params)
+            
+            if response.status_code == 200:
+                result = response.json()
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    if result.get('code') == '0000':  # Success code
-                        logger.info(f"SMS sent successfully to {recipient}")
-                        return {
-                            'success': True,
-                            'message': 'SMS sent successfully',
-                            'response': result
-                        }
-                    else:
-                        logger.error(f"Arkesel API error: {result}")
-                        return {
-                            'success': False,
-                            'message': result.get('message', 'Failed to send SMS'),
-                            'response': result
-                        }
+                if result.get('code') == '0000':  # Success code
+                    logger.info(f"SMS sent successfully to {recipient}")
+                    return {
+                        'success': True,
+                        'message': 'SMS sent successfully',
+                        'response': result
+                    }
                 else:
-                    logger.error(f"HTTP error {response.status_code}: {response.text}")
+                    logger.error(f"Arkesel API error: {result}")
                     return {
                         'success': False,
-                        'message': f'HTTP {response.status_code} error',
-                        'response': response.text
+                        'message': result.get('message', 'Failed to send SMS'),
+                        'response': result
                     }
-                    
+            else:
+                logger.error(f"HTTP error {response.status_code}: {response.text}")
+                return {
+                    'success': False,
+                    'message': f'HTTP {response.status_code} error',
+                    'response': response.text
+                }
+                
         except Exception as e:
             logger.error(f"SMS sending failed: {str(e)}")
             return {
@@ -91,6 +166,25 @@ class ArkeselSMSProvider:
                 'response': None
             }
     
+    async def send_bulk(self, messages: List[Tuple[str, str]], concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Send many SMS concurrently with a bounded number of requests in flight
+        
+        Args:
+            messages: List of (recipient, message) pairs
+            concurrency: Max simultaneous requests (defaults to SMS_BULK_CONCURRENCY)
+            
+        Returns:
+            List of send_sms results, in the same order as messages
+        """
+        limiter = asyncio.Semaphore(concurrency or settings.SMS_BULK_CONCURRENCY)
+        
+        async def _send_one(recipient: str, message: str) -> Dict:
+            async with limiter:
+                return await self.send_sms(recipient, message)
+        
+        return await asyncio.gather(*(_send_one(recipient, message) for recipient, message in messages))
+    
     async def check_balance(self) -> Dict:
         """Check SMS balance from Arkesel"""
         params = {
@@ -100,19 +194,18 @@ class ArkeselSMSProvider:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(self.api_url, params=params)
-                
-                if response.status_code == 200:
-                    return {
-                        'success': True,
-                        'data': response.json()
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'message': 'Failed to check balance'
-                    }
+            response = await _get(self.api_url, params, timeout=10.0)
+            
+            if response.status_code == 200:
+                return {
+                    'success': True,
+                    'data': response.json()
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': 'Failed to check balance'
+                }
         except Exception as e:
             logger.error(f"Balance check failed: {str(e)}")
             return {
@@ -120,5 +213,10 @@ class ArkeselSMSProvider:
                 'message': str(e)
             }
 
+@lru_cache(maxsize=256)
+def get_sms_provider(sender_id: Optional[str] = None) -> ArkeselSMSProvider:
+    """Reuse one provider per sender ID instead of building one per request"""
+    return ArkeselSMSProvider(sender_id=sender_id)
+
 # Singleton instance
-sms_provider = ArkeselSMSProvider()
+sms_provider = get_sms_provider()
@@ -0,0 +1,199 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app import models, schemas
+
+BREAKDOWNS = {
+    "class": models.Student.student_class,
+    "term": models.Student.term,
+}
+
+_STATUS_KEYS = {
+    models.PaymentStatus.PAID: "fully_paid",
+    models.PaymentStatus.PARTIAL: "partially_paid",
+    models.PaymentStatus.UNPAID: "unpaid",
+}
+
+
+def _empty_totals() -> Dict:
+    return {
+        "total_students": 0,
+        "fully_paid": 0,
+        "partially_paid": 0,
+        "unpaid": 0,
+        "total_fees": 0.0,
+        "total_paid": 0.0,
+        "total_outstanding": 0.0,
+    }
+
+
+def _add(totals: Dict, row):
+    totals["total_students"] += row.students
+    status_key = _STATUS_KEYS.get(row.status)
+    if status_key:
+        totals[status_key] += row.students
+    totals["total_fees"] += row.total_fees
+    totals["total_paid"] += row.total_paid
+    totals["total_outstanding"] += row.total_outstanding
+
+
+def _rounded(totals: Dict) -> Dict:
+    for key in ("total_fees", "total_paid", "total_outstanding"):
+        totals[key] = round(totals[key], 2)
+    return totals
+
+
+def student_summary(
+    db: Session,
+    user: models.User,
+    breakdowns: Iterable[str] = (),
+    student_class: Optional[str] = None,
+    term: Optional[str] = None,
+    academic_year: Optional[str] = None
+) -> Dict:
+    """
+    Student counts and fee totals for a tenant, from one GROUP BY scan
+
+    Rows are grouped by status plus every requested breakdown column
+    ("class", "term"); overall, per-status and per-breakdown totals are all
+    folded from that single result.
+
+    Returns:
+        total_students, fully_paid, partially_paid, unpaid, total_fees,
+        total_paid, total_outstanding, by_status and by_<breakdown> lists
+    """
+    breakdowns = [name for name in BREAKDOWNS if name in set(breakdowns)]
+    group_columns = [models.Student.status] + [BREAKDOWNS[name].label(name) for name in breakdowns]
+
+    query = db.query(
+        *group_columns,
+        func.count(models.Student.id).label("students"),
+        func.coalesce(func.sum(models.Student.total_fees), 0.0).label("total_fees"),
+        func.coalesce(func.sum(models.Student.paid_amount), 0.0).label("total_paid"),
+        func.coalesce(func.sum(models.Student.balance), 0.0).label("total_outstanding")
+    ).filter(models.Student.user_id == user.id)
+    if user.school_id:
+        query = query.filter(models.Student.school_id == user.school_id)
+    if student_class:
+        query = query.filter(models.Student.student_class == student_class)
+    if term:
+        query = query.filter(models.Student.term == term)
+    if academic_year:
+        query = query.filter(models.Student.academic_year == academic_year)
+    rows = query.group_by(*group_columns).all()
+
+    summary = _empty_totals()
+    by_status = defaultdict(_empty_totals)
+    by_breakdown = {name: defaultdict(_empty_totals) for name in breakdowns}
+
+    for row in rows:
+        _add(summary, row)
+        _add(by_status[row.status], row)
+        for name in breakdowns:
+            _add(by_breakdown[name][getattr(row, name)], row)
+
+    summary = _rounded(summary)
+    summary["by_status"] = [
+        {
+            "status": status.value,
+            "students": totals["total_students"],
+            "total_fees": totals["total_fees"],
+            "total_paid": totals["total_paid"],
+            "total_outstanding": totals["total_outstanding"],
+        }
+        for status, totals in ((status, _rounded(by_status[status])) for status in models.PaymentStatus)
+    ]
+    for name in breakdowns:
+        summary[f"by_{name}"] = [
+            {name: key, **_rounded(totals)}
+            for key, totals in sorted(by_breakdown[name].items(), key=lambda item: (item[0] is None, item[0] or ""))
+        ]
+
+    return summary
+
+
+def dashboard_summary(db: Session, user: models.User, recent: int = 5) -> Dict:
+    """
+    Tenant aggregates behind GET /dashboard, safe to cache
+
+    Student totals come from student_summary(), total collected from the
+    daily rollup and the recent rows from one query each. Wallet/SMS balances and subscription
+    days are read from the user per request and are not included.
+    """
+    students = student_summary(db, user)
+
+    payments = db.query(models.Payment).filter(models.Payment.user_id == user.id)
+    recent_students = db.query(models.Student).filter(models.Student.user_id == user.id)
+    collected = db.query(func.coalesce(func.sum(models.PaymentDailyRollup.amount), 0.0))\
+        .filter(models.PaymentDailyRollup.user_id == user.id)
+    if user.school_id:
+        payments = payments.filter(models.Payment.school_id == user.school_id)
+        recent_students = recent_students.filter(models.Student.school_id == user.school_id)
+        collected = collected.filter(models.PaymentDailyRollup.school_id == user.school_id)
+
+    total_collected = collected.scalar()
+    recent_payments = payments\
+        .order_by(models.Payment.created_at.desc(), models.Payment.id.desc())\
+        .limit(recent)\
+        .all()
+    recent_students = recent_students\
+        .order_by(models.Student.created_at.desc(), models.Student.id.desc())\
+        .limit(recent)\
+        .all()
+
+    return {
+        "total_students": students["total_students"],
+        "fully_paid": students["fully_paid"],
+        "partially_paid": students["partially_paid"],
+        "unpaid": students["unpaid"],
+        "total_fees": students["total_fees"],
+        "total_collected": round(total_collected, 2),
+        "total_pending": students["total_outstanding"],
+        "recent_payments": [schemas.PaymentResponse.model_validate(payment) for payment in recent_payments],
+        "recent_students": [schemas.StudentResponse.model_validate(student) for student in recent_students],
+        "generated_at": datetime.now(),
+    }
+
+
+def platform_summary(db: Session) -> Dict:
+    """
+    Platform-wide totals behind GET /admin/statistics, safe to cache
+
+    One statement of scalar subqueries reads the maintained counters
+    (schools.student_count, the payment rollup) and the remaining counts;
+    a second groups active subscriptions by plan. Only delivered SMS count
+    as sent; queued (pending) and failed outbox messages don't.
+    """
+    rollup = models.PaymentDailyRollup
+    totals = db.execute(select(
+        select(func.count()).select_from(models.School).scalar_subquery().label("schools"),
+        select(func.coalesce(func.sum(models.School.student_count), 0)).scalar_subquery().label("students"),
+        select(func.coalesce(func.sum(rollup.payment_count), 0)).scalar_subquery().label("payments"),
+        select(func.coalesce(func.sum(rollup.amount), 0.0)).scalar_subquery().label("revenue"),
+        select(func.count()).select_from(models.SMSLog).where(models.SMSLog.status == "sent")
+        .scalar_subquery().label("sms_sent"),
+        select(func.count()).select_from(models.WalletTransaction).scalar_subquery().label("wallet_transactions")
+    )).one()
+
+    subscriptions = {plan.value: 0 for plan in models.SubscriptionPlan}
+    active = db.execute(
+        select(models.User.subscription_plan, func.count())
+        .where(models.User.subscription_status == models.SubscriptionStatus.ACTIVE)
+        .group_by(models.User.subscription_plan)
+    )
+    for plan, users in active:
+        if plan is not None:
+            subscriptions[plan.value] = users
+
+    return {
+        "total_schools": totals.schools,
+        "total_students": totals.students,
+        "total_payments": totals.payments,
+        "total_revenue": round(totals.revenue, 2),
+        "total_sms_sent": totals.sms_sent,
+        "total_wallet_transactions": totals.wallet_transactions,
+        "subscriptions": subscriptions,
+        "generated_at": datetime.now(),
+    }
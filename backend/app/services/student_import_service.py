@@ -0,0 +1,229 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.services.school_service import reserve_student_slots
+
+STUDENT_COLUMNS = {
+    "name", "student_class", "gender", "date_of_birth", "parent_name",
+    "parent_contact", "parent_email", "academic_year", "term"
+}
+
+
+def _column_name(header) -> str:
+    return str(header or "").strip().lower().replace(" ", "_")
+
+
+def _cell_value(value):
+    """Normalise spreadsheet cells to the strings/dates the schema expects"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _invalid_file(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _iter_csv(upload: UploadFile) -> Iterator[Tuple[int, Dict]]:
+    # The file is decoded while it is read, so a bad byte can surface on any row
+    try:
+        reader = csv.reader(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""))
+        header = [_column_name(cell) for cell in next(reader, [])]
+        for row_number, values in enumerate(reader, start=1):
+            if not any(value.strip() for value in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    except UnicodeDecodeError:
+        raise _invalid_file("The CSV file is not UTF-8 encoded. Save it as CSV UTF-8 and upload it again.")
+    except csv.Error as e:
+        raise _invalid_file(f"The CSV file could not be read: {str(e)}")
+
+
+def _iter_xlsx(upload: UploadFile) -> Iterator[Tuple[int, Dict]]:
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="XLSX import requires openpyxl. Upload a CSV file instead."
+        )
+
+    try:
+        workbook = load_workbook(upload.file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise _invalid_file("The file is not a valid .xlsx workbook.")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_column_name(cell) for cell in next(rows, ())]
+        for row_number, values in enumerate(rows, start=1):
+            if not any(value is not None for value in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_student_rows(upload: UploadFile) -> Iterator[Tuple[int, Dict]]:
+    """
+    Stream (row number, column dict) pairs from a CSV or XLSX upload
+
+    Row numbers count data rows; the header row is excluded. Files are
+    read lazily, so an unreadable file raises its 400 while iterating.
+    """
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".xlsx"):
+        return _iter_xlsx(upload)
+    if filename.endswith(".csv") or not filename:
+        return _iter_csv(upload)
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Unsupported file type. Upload a .csv or .xlsx file."
+    )
+
+
+def load_fee_structures(
+    db: Session,
+    user: models.User,
+    academic_year: str,
+    term: Optional[str],
+    student_class: str
+) -> List[models.FeeStructure]:
+    """
+    Fee structures a new student is billed for in the given year and term
+
+    Same level rule as billing runs: a fee applies when its level is unset,
+    "All" or the student's class.
+    """
+    fee = models.FeeStructure
+    query = db.query(fee).filter(
+        fee.user_id == user.id,
+        fee.academic_year == academic_year,
+        fee.term == term,
+        or_(fee.level.is_(None), fee.level == "All", fee.level == student_class)
+    )
+    if user.school_id:
+        query = query.filter(fee.school_id == user.school_id)
+    return query.all()
+
+
+def fee_record_rows(student_id: int, school_id: Optional[int], fee_structures: List[models.FeeStructure]) -> List[Dict]:
+    """Unpaid StudentFeeRecord rows for a bulk INSERT"""
+    return [
+        {
+            "student_id": student_id,
+            "school_id": school_id,
+            "fee_structure_id": fee.id,
+            "fee_type": fee.fee_type,
+            "amount": fee.amount,
+            "paid_amount": 0.0,
+            "balance": fee.amount,
+            "status": models.PaymentStatus.UNPAID,
+            "term": fee.term,
+            "academic_year": fee.academic_year
+        }
+        for fee in fee_structures
+    ]
+
+
+def _insert_chunk(db: Session, students: List[Tuple[Dict, List[models.FeeStructure]]]):
+    """Bulk-insert a chunk of students, then all of their fee records"""
+    student_ids = db.scalars(
+        insert(models.Student).returning(models.Student.id, sort_by_parameter_order=True),
+        [student for student, _ in students]
+    ).all()
+
+    records = []
+    for student_id, (student, fees) in zip(student_ids, students):
+        records.extend(fee_record_rows(student_id, student["school_id"], fees))
+    if records:
+        db.execute(insert(models.StudentFeeRecord), records)
+
+
+def import_students(
+    db: Session,
+    user: models.User,
+    rows: Iterator[Tuple[int, Dict]],
+    chunk_size: int,
+    student_limit: Optional[int] = None
+) -> Dict:
+    """
+    Validate and bulk-insert students with their fee records
+
+    Fee structures are looked up once per (academic year, term, class). Invalid
+    rows are reported and skipped without aborting the import, as are rows
+    beyond the school's student_limit. The caller commits.
+    """
+    fee_cache: Dict[Tuple[str, Optional[str], str], List[models.FeeStructure]] = {}
+    chunk = []
+    imported = 0
+    total_rows = 0
+    errors = []
+
+    def flush_chunk():
+        """Insert as much of the chunk as the school has room for"""
+        nonlocal imported
+        granted = reserve_student_slots(db, user.school_id, len(chunk), student_limit)
+        if granted:
+            _insert_chunk(db, [(student, fees) for _, student, fees in chunk[:granted]])
+            imported += granted
+        for row_number, _, _ in chunk[granted:]:
+            errors.append({"row": row_number, "error": f"Student limit reached ({student_limit} per school)"})
+
+    for row_number, record in rows:
+        total_rows += 1
+        data = {
+            column: value
+            for column, value in ((column, _cell_value(value)) for column, value in record.items() if column in STUDENT_COLUMNS)
+            if value is not None
+        }
+        try:
+            student = schemas.StudentCreate(**data)
+        except ValidationError as e:
+            errors.append({
+                "row": row_number,
+                "error": "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+            })
+            continue
+
+        fee_key = (student.academic_year, student.term, student.student_class)
+        if fee_key not in fee_cache:
+            fee_cache[fee_key] = load_fee_structures(db, user, *fee_key)
+        fees = fee_cache[fee_key]
+        total_fees = sum(fee.amount for fee in fees)
+
+        chunk.append((row_number, {
+            **student.model_dump(),
+            "user_id": user.id,
+            "school_id": user.school_id,
+            "total_fees": total_fees,
+            "paid_amount": 0.0,
+            "balance": total_fees,
+            "status": models.PaymentStatus.UNPAID
+        }, fees))
+
+        if len(chunk) >= chunk_size:
+            flush_chunk()
+            chunk = []
+
+    if chunk:
+        flush_chunk()
+
+    return {
+        "total_rows": total_rows,
+        "imported": imported,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda error: error["row"])
+    }
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app import models
+from app.services.cache import invalidate_principals
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def expire_subscriptions(db: Session, now: Optional[datetime] = None) -> List[Tuple[Optional[int], str]]:
+    """
+    Mark every lapsed ACTIVE subscription EXPIRED in one UPDATE
+
+    Returns:
+        (school_id, username) of each expired user, for invalidating
+        their cached principals after commit
+    """
+    users = models.User.__table__
+    return db.execute(
+        update(users)
+        .where(
+            users.c.subscription_status == models.SubscriptionStatus.ACTIVE,
+            users.c.subscription_end_date < (now or datetime.now())
+        )
+        .values(subscription_status=models.SubscriptionStatus.EXPIRED)
+        .returning(users.c.school_id, users.c.username)
+    ).all()
+
+
+def sweep_subscriptions() -> int:
+    """
+    Run expire_subscriptions() in its own transaction
+
+    Returns:
+        Number of subscriptions expired
+    """
+    db = SessionLocal()
+    try:
+        expired = expire_subscriptions(db)
+        db.commit()
+        for school_id, username in expired:
+            invalidate_principals(school_id, username)
+        return len(expired)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_subscription_sweeper():
+    """In-process loop: expire lapsed subscriptions every SUBSCRIPTION_SWEEP_INTERVAL seconds"""
+    logger.info("Subscription sweeper started")
+
+    while True:
+        try:
+            count = await run_in_threadpool(sweep_subscriptions)
+            if count:
+                logger.info(f"Expired {count} subscriptions")
+        except Exception as e:
+            logger.error(f"Subscription sweep failed: {str(e)}")
+
+        await asyncio.sleep(settings.SUBSCRIPTION_SWEEP_INTERVAL)
@@ -0,0 +1,52 @@
+from typing import Dict, Optional
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import models
+
+
+def adjust_balances(
+    db: Session,
+    user: models.User,
+    wallet: float = 0.0,
+    sms_units: int = 0,
+    allow_negative: bool = False
+) -> Optional[Dict]:
+    """
+    Atomically add to a user's wallet (GHS) and SMS balances
+
+    The arithmetic runs inside the UPDATE, so concurrent top-ups, purchases
+    and sends can't overwrite each other, and the balances read from a
+    cached principal are never written back. Unless allow_negative (units
+    already spent, e.g. messages sent), neither balance may drop below zero.
+    `user` is updated with the new balances without being marked dirty.
+
+    Returns:
+        balance_before/after and sms_balance_before/after for the
+        WalletTransaction, or None if the balance was insufficient
+    """
+    users = models.User.__table__
+    wallet_after = func.coalesce(users.c.wallet_balance, 0.0) + wallet
+    sms_after = func.coalesce(users.c.sms_balance, 0) + sms_units
+
+    statement = (
+        update(users)
+        .where(users.c.id == user.id)
+        .values(wallet_balance=wallet_after, sms_balance=sms_after)
+        .returning(users.c.wallet_balance, users.c.sms_balance)
+    )
+    if not allow_negative:
+        statement = statement.where(wallet_after >= 0, sms_after >= 0)
+
+    row = db.execute(statement).first()
+    if row is None:
+        return None
+
+    set_committed_value(user, "wallet_balance", row.wallet_balance)
+    set_committed_value(user, "sms_balance", row.sms_balance)
+    return {
+        "balance_before": round(row.wallet_balance - wallet, 2),
+        "balance_after": row.wallet_balance,
+        "sms_balance_before": row.sms_balance - sms_units,
+        "sms_balance_after": row.sms_balance,
+    }
@@ -0,0 +1,50 @@
+"""
+Celery worker for background jobs
+
+Run with:
+    celery -A app.worker worker --beat --loglevel=info
+
+Used when SMS_OUTBOX_BACKEND=celery; otherwise the API drains the
+outbox in-process.
+"""
+
+import asyncio
+from celery import Celery
+from app.config import settings
+from app.services import sms_service
+from app.services.outbox_service import process_outbox
+from app.services.subscription_service import sweep_subscriptions
+
+celery_app = Celery("school_fees", broker=settings.REDIS_URL)
+
+celery_app.conf.beat_schedule = {
+    "drain-sms-outbox": {
+        "task": "app.worker.deliver_outbox",
+        "schedule": settings.SMS_OUTBOX_POLL_INTERVAL,
+    },
+    "expire-subscriptions": {
+        "task": "app.worker.expire_subscriptions",
+        "schedule": settings.SUBSCRIPTION_SWEEP_INTERVAL or 300,
+    },
+}
+
+
+async def _drain_outbox():
+    await sms_service.open_http_client()
+    try:
+        while await process_outbox():
+            pass
+    finally:
+        await sms_service.close_http_client()
+
+
+@celery_app.task(name="app.worker.deliver_outbox", ignore_result=True)
+def deliver_outbox():
+    """Deliver every queued SMS that is due"""
+    asyncio.run(_drain_outbox())
+
+
+@celery_app.task(name="app.worker.expire_subscriptions", ignore_result=True)
+def expire_subscriptions():
+    """Mark lapsed subscriptions expired"""
+    sweep_subscriptions()
@@ -0,0 +1,470 @@
+"""
+Performance Benchmarks
+Runs against a scratch database (never point this at production):
+
+    python benchmark.py            # all benchmarks
+    python benchmark.py search     # just one
+    python benchmark.py async_db   # sync vs async sessions under load
+    python benchmark.py login      # login burst, bcrypt inline vs hashing pool
+    python benchmark.py receipt    # receipt generation at 50 fee records per student
+    python benchmark.py fee_change # fee amount change propagated to 20,000 students
+    python benchmark.py billing    # term billing run over 50,000 students
+
+Set BENCHMARK_DATABASE_URL to benchmark Postgres instead of SQLite.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import statistics
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = os.getenv("BENCHMARK_DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+from sqlalchemy import desc, insert, select
+from app.database import AsyncSessionLocal, Base, async_engine, engine, SessionLocal, create_tables
+from app import models
+
+FIRST_NAMES = ["Kwame", "Ama", "Kofi", "Akosua", "Yaw", "Abena", "Kojo", "Efua", "Kwesi", "Adwoa"]
+LAST_NAMES = ["Mensah", "Owusu", "Asante", "Boateng", "Osei", "Appiah", "Darko", "Addo", "Frimpong", "Agyeman"]
+
+
+def reset_database():
+    """Drop and recreate every table"""
+    Base.metadata.drop_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS students_fts")
+    create_tables()
+
+
+def create_tenant(db):
+    school = models.School(name="Benchmark School", subdomain=f"bench{int(time.time())}")
+    db.add(school)
+    db.flush()
+    user = models.User(
+        username=f"bench{school.id}",
+        email=f"bench{school.id}@example.com",
+        hashed_password="x",
+        school_name=school.name,
+        school_id=school.id
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def seed_students(db, user, count: int, chunk: int = 5000):
+    for start in range(0, count, chunk):
+        db.execute(insert(models.Student), [
+            {
+                "user_id": user.id,
+                "school_id": user.school_id,
+                "name": f"{FIRST_NAMES[i % 10]} {LAST_NAMES[(i // 10) % 10]} {i}",
+                "parent_name": f"{FIRST_NAMES[(i + 3) % 10]} {LAST_NAMES[(i // 7) % 10]}",
+                "student_class": f"JHS {i % 3 + 1}",
+                "academic_year": "2024/2025",
+                "term": "Term 1",
+                "total_fees": 1000.0,
+                "paid_amount": 0.0,
+                "balance": 1000.0,
+                "status": models.PaymentStatus.UNPAID
+            }
+            for i in range(start, min(start + chunk, count))
+        ])
+    db.commit()
+
+
+def seed_fee_records(db, user, fee_types: int, chunk: int = 200):
+    """Term 1 fee structures of 20.0 each, with an unpaid record per student"""
+    fees = [
+        models.FeeStructure(
+            user_id=user.id, school_id=user.school_id, academic_year="2024/2025",
+            term="Term 1", fee_type=f"Fee {n}", amount=20.0
+        )
+        for n in range(fee_types)
+    ]
+    db.add_all(fees)
+    db.flush()
+
+    student_ids = db.scalars(select(models.Student.id).where(models.Student.user_id == user.id)).all()
+    for start in range(0, len(student_ids), chunk):
+        db.execute(insert(models.StudentFeeRecord), [
+            {
+                "student_id": student_id, "school_id": user.school_id, "fee_structure_id": fee.id,
+                "fee_type": fee.fee_type, "amount": fee.amount, "paid_amount": 0.0, "balance": fee.amount,
+                "status": models.PaymentStatus.UNPAID, "term": fee.term, "academic_year": fee.academic_year
+            }
+            for student_id in student_ids[start:start + chunk]
+            for fee in fees
+        ])
+    return fees, student_ids
+
+
+def timed(fn, repeat: int):
+    """Return (median, p95) in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+async def run_load(request, requests: int, concurrency: int) -> dict:
+    """
+    Run request() `requests` times, `concurrency` at a time
+
+    A heartbeat coroutine measures how late a 5 ms timer fires meanwhile
+    (event loop stall, i.e. latency added to every other request).
+    """
+    stalls = []
+    latencies = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append((time.perf_counter() - started - 0.005) * 1000)
+
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with limiter:
+            started = time.perf_counter()
+            await request()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    monitor = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await monitor
+
+    stalls.sort()
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "latency_p50": statistics.median(latencies),
+        "latency_p99": latencies[int(len(latencies) * 0.99) - 1],
+        "stall_median": statistics.median(stalls),
+        "stall_max": stalls[-1],
+    }
+
+
+def bench_search(students: int = 100_000):
+    """Typeahead search at school-network scale (target: < 20 ms)"""
+    from app.services.search_service import search_students
+
+    print(f"\n🔍 Student search over {students:,} students...")
+    reset_database()
+    db = SessionLocal()
+    try:
+        user = create_tenant(db)
+        seed_students(db, user, students)
+
+        query = select(models.Student).where(
+            models.Student.user_id == user.id,
+            models.Student.school_id == user.school_id
+        )
+
+        for term in ["Men", "Kwame Ow", "asante 4321", "zzz"]:
+            median, p95 = timed(lambda: search_students(db, query, term, 10), 50)
+            print(f"  '{term}': median {median:.2f} ms, p95 {p95:.2f} ms")
+    finally:
+        db.close()
+
+
+def bench_async_db(students: int = 20_000, requests: int = 400, concurrency: int = 20):
+    """
+    Request throughput and event loop stalls: sync Session vs AsyncSession
+
+    Each simulated request runs the dashboard's student summary and the
+    first page of the student list. "sync" runs them on a SessionLocal
+    inside a coroutine (how the routes used to work), "async" on the
+    AsyncSession from get_db. Loop stall is how late a 5 ms timer fires
+    while the requests run, i.e. latency added to every other request.
+    """
+    from app.services.statistics_service import student_summary
+
+    print(f"\n⚡ {requests} requests, {concurrency} concurrent, over {students:,} students...")
+    reset_database()
+    db = SessionLocal()
+    try:
+        tenant = create_tenant(db)
+        seed_students(db, tenant, students)
+        user = SimpleNamespace(id=tenant.id, school_id=tenant.school_id)
+    finally:
+        db.close()
+
+    first_page = select(models.Student)\
+        .where(models.Student.user_id == user.id, models.Student.school_id == user.school_id)\
+        .order_by(desc(models.Student.created_at), desc(models.Student.id))\
+        .limit(50)
+
+    async def sync_request():
+        session = SessionLocal()
+        try:
+            student_summary(session, user)
+            session.scalars(first_page).all()
+        finally:
+            session.close()
+
+    async def async_request():
+        async with AsyncSessionLocal() as session:
+            await session.run_sync(student_summary, user)
+            (await session.scalars(first_page)).all()
+
+    for name, request in [("sync Session", sync_request), ("AsyncSession", async_request)]:
+        result = asyncio.run(run_load(request, requests, concurrency))
+        print(f"  {name}: {result['throughput']:.0f} req/s, "
+              f"loop stall median {result['stall_median']:.1f} ms, max {result['stall_max']:.1f} ms")
+
+
+def bench_login(requests: int = 100, concurrency: int = 50):
+    """
+    Login burst (school morning): bcrypt on the event loop vs the hashing pool
+
+    Each login looks the user up on the AsyncSession and verifies the
+    password at BCRYPT_ROUNDS. Reports login latency and how long other
+    requests wait for the event loop meanwhile.
+    """
+    from app.config import settings
+    from app.services.auth_service import get_password_hash, verify_password, verify_password_async
+
+    print(f"\n🔑 {requests} logins, {concurrency} concurrent, bcrypt cost {settings.BCRYPT_ROUNDS}, "
+          f"{settings.PASSWORD_HASH_WORKERS} hashing threads...")
+    reset_database()
+    db = SessionLocal()
+    try:
+        tenant = create_tenant(db)
+        tenant.hashed_password = get_password_hash("password123")
+        db.commit()
+        username = tenant.username
+    finally:
+        db.close()
+
+    lookup = select(models.User).where(models.User.username == username)
+
+    async def inline_login():
+        async with AsyncSessionLocal() as session:
+            user = await session.scalar(lookup)
+            assert verify_password("password123", user.hashed_password)
+
+    async def pooled_login():
+        async with AsyncSessionLocal() as session:
+            user = await session.scalar(lookup)
+            valid, _ = await verify_password_async("password123", user.hashed_password)
+            assert valid
+
+    for name, request in [("bcrypt on event loop", inline_login), ("hashing pool", pooled_login)]:
+        result = asyncio.run(run_load(request, requests, concurrency))
+        print(f"  {name}: {result['throughput']:.0f} logins/s, latency p50 {result['latency_p50']:.0f} ms, "
+              f"p99 {result['latency_p99']:.0f} ms, loop stall max {result['stall_max']:.1f} ms")
+
+
+def bench_receipt(students: int = 2000, fee_types: int = 50, repeat: int = 200):
+    """
+    Receipt generation and fee record payment lookup at 50 fee records per student
+
+    Runs the GET /payments/{id}/receipt route function on an AsyncSession
+    and the fee record UPDATE used when posting a payment, with and without
+    ix_student_fee_records_lookup (student_id, term, fee_type).
+    """
+    from sqlalchemy import text
+    from app.routers.payments import get_payment_receipt
+    from app.services.payment_service import apply_fee_record_payment
+
+    print(f"\n🧾 Receipts over {students:,} students x {fee_types} fee records...")
+    reset_database()
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        user = create_tenant(db)
+        seed_students(db, user, students)
+        fees, student_ids = seed_fee_records(db, user, fee_types)
+        payment = models.Payment(
+            user_id=user.id, school_id=user.school_id, student_id=student_ids[students // 2],
+            amount=20.0, payment_method="Cash", fee_type="Fee 7", term="Term 1",
+            academic_year="2024/2025", reference="PAY-BENCH"
+        )
+        db.add(payment)
+        db.commit()
+        payment_id, student_id = payment.id, payment.student_id
+    finally:
+        db.close()
+
+    lookup_index = next(index for index in models.StudentFeeRecord.__table__.indexes
+                        if index.name == "ix_student_fee_records_lookup")
+
+    async def receipt():
+        async with AsyncSessionLocal() as session:
+            receipt = await get_payment_receipt(payment_id, current_user=user, school=None, db=session)
+            assert len(receipt.fee_breakdown) == fee_types
+
+    def fee_record_lookup():
+        session = SessionLocal()
+        try:
+            assert apply_fee_record_payment(session, student_id, "Fee 42", "Term 1", 0.0)
+            session.rollback()
+        finally:
+            session.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        for label in ["with lookup index", "without lookup index"]:
+            if label.startswith("without"):
+                lookup_index.drop(bind=engine)
+            with engine.connect() as conn:
+                conn.execute(text("ANALYZE"))
+            median, p95 = timed(lambda: loop.run_until_complete(receipt()), repeat)
+            print(f"  receipt, {label}: median {median:.2f} ms, p95 {p95:.2f} ms")
+            median, p95 = timed(fee_record_lookup, repeat)
+            print(f"  fee record payment, {label}: median {median:.2f} ms, p95 {p95:.2f} ms")
+    finally:
+        lookup_index.create(bind=engine)
+        loop.run_until_complete(async_engine.dispose())
+        loop.close()
+
+
+def bench_fee_change(students: int = 20_000, fee_types: int = 10, repeat: int = 5):
+    """
+    Propagating a fee structure amount change to every billed student
+
+    Compares the set-based propagate_fee_change (two statements) with
+    loading and updating each student and fee record through the ORM.
+    Every run is rolled back so each one sees the same data.
+    """
+    from app.services.fee_service import fee_change_impact, propagate_fee_change
+
+    print(f"\n💸 Fee change over {students:,} students x {fee_types} fee records...")
+    reset_database()
+    db = SessionLocal()
+    try:
+        user = create_tenant(db)
+        seed_students(db, user, students)
+        fees, _ = seed_fee_records(db, user, fee_types)
+        db.execute(models.Student.__table__.update().values(total_fees=20.0 * fee_types, balance=20.0 * fee_types))
+        db.commit()
+        fee_id = fees[3].id
+    finally:
+        db.close()
+
+    def rolled_back(fn):
+        def run():
+            session = SessionLocal()
+            try:
+                fn(session)
+                session.flush()
+            finally:
+                session.rollback()
+                session.close()
+        return run
+
+    def status(balance, paid_amount):
+        if balance <= 0:
+            return models.PaymentStatus.PAID
+        return models.PaymentStatus.PARTIAL if paid_amount > 0 else models.PaymentStatus.UNPAID
+
+    def orm_loop(session):
+        records = session.scalars(
+            select(models.StudentFeeRecord).where(models.StudentFeeRecord.fee_structure_id == fee_id)
+        ).all()
+        for record in records:
+            student = session.get(models.Student, record.student_id)
+            student.total_fees += 25.0 - record.amount
+            student.balance = student.total_fees - student.paid_amount
+            student.status = status(student.balance, student.paid_amount)
+            record.amount = 25.0
+            record.balance = record.amount - record.paid_amount
+            record.status = status(record.balance, record.paid_amount)
+
+    def set_based(session):
+        assert propagate_fee_change(session, fee_id, 25.0) == students
+
+    def dry_run(session):
+        assert fee_change_impact(session, fee_id, 25.0)["affected_students"] == students
+
+    for label, fn in [("ORM per student", orm_loop), ("set-based UPDATE", set_based), ("dry run", dry_run)]:
+        median, p95 = timed(rolled_back(fn), repeat)
+        print(f"  {label}: median {median:.0f} ms, p95 {p95:.0f} ms")
+
+
+def bench_billing(students: int = 50_000, fee_types: int = 10):
+    """
+    Term billing run: attach fee structures created after enrolment
+
+    Times execute_billing_run (set-based, BILLING_CHUNK_SIZE students per
+    transaction) and its idempotent re-run against billing each student
+    in a loop the way create_student does (rolled back afterwards).
+    """
+    from app.services.billing_service import create_billing_run, execute_billing_run
+    from app.services.student_import_service import fee_record_rows
+
+    print(f"\n🧮 Billing run over {students:,} students x {fee_types} new fee structures...")
+    reset_database()
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        user = create_tenant(db)
+        seed_students(db, user, students)
+        fees = [
+            models.FeeStructure(
+                user_id=user.id, school_id=user.school_id, academic_year="2024/2025",
+                term="Term 1", fee_type=f"Fee {n}", amount=20.0, level="All"
+            )
+            for n in range(fee_types)
+        ]
+        db.add_all(fees)
+        db.commit()
+    finally:
+        db.close()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for student in db.scalars(select(models.Student).where(models.Student.user_id == user.id)):
+            billed = set(db.scalars(
+                select(models.StudentFeeRecord.fee_structure_id).where(models.StudentFeeRecord.student_id == student.id)
+            ))
+            missing = [fee for fee in fees if fee.id not in billed]
+            db.execute(insert(models.StudentFeeRecord), fee_record_rows(student.id, student.school_id, missing))
+            student.total_fees += sum(fee.amount for fee in missing)
+            student.balance += sum(fee.amount for fee in missing)
+        db.flush()
+        print(f"  per student loop: {time.perf_counter() - started:.2f} s")
+    finally:
+        db.rollback()
+        db.close()
+
+    for label in ["billing run", "re-run (nothing missing)"]:
+        db = SessionLocal()
+        try:
+            run = create_billing_run(db, user.id, user.school_id, "2024/2025", "Term 1")
+            db.commit()
+            run_id = run.id
+        finally:
+            db.close()
+        started = time.perf_counter()
+        run = execute_billing_run(run_id)
+        assert run.status == "completed", run.error_message
+        print(f"  {label}: {time.perf_counter() - started:.2f} s, {run.records_created:,} records")
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "async_db": bench_async_db,
+    "login": bench_login,
+    "receipt": bench_receipt,
+    "fee_change": bench_fee_change,
+    "billing": bench_billing,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
@@ -0,0 +1,121 @@
+"""
+Maintenance Commands
+Usage: python manage.py <command> [options]
+"""
+
+import argparse
+import logging
+
+from fastapi import HTTPException
+from app import models
+from app.database import SessionLocal, create_tables
+from app.services.billing_service import create_billing_run, execute_billing_run
+from app.services.idempotency_service import purge_expired_keys
+from app.services.rollup_service import rebuild_rollup
+from app.services.school_service import recount_students
+from app.services.subscription_service import sweep_subscriptions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild_rollup_command(args):
+    """Regenerate payment_daily_rollup from Payment history"""
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollup(db, user_id=args.user_id)
+        db.commit()
+        logger.info(f"✅ Payment rollup rebuilt ({rows} rows)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def recount_students_command(args):
+    """Recompute every school's student_count from the students table"""
+    db = SessionLocal()
+    try:
+        recount_students(db)
+        db.commit()
+        logger.info("✅ Student counts recomputed")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def expire_subscriptions_command(args):
+    """Mark every lapsed subscription expired"""
+    count = sweep_subscriptions()
+    logger.info(f"✅ Expired {count} subscriptions")
+
+
+def purge_idempotency_keys_command(args):
+    """Delete expired Idempotency-Key records"""
+    count = purge_expired_keys()
+    logger.info(f"✅ Purged {count} expired idempotency keys")
+
+
+def bill_term_command(args):
+    """Attach missing fee records to every enrolled student of one account (--user-id) for a term"""
+    db = SessionLocal()
+    try:
+        user = db.get(models.User, args.user_id)
+        if user is None:
+            raise SystemExit(f"User {args.user_id} not found")
+        run = create_billing_run(db, user.id, user.school_id, args.academic_year, args.term, args.level)
+        db.commit()
+        run_id = run.id
+    except HTTPException as e:
+        db.rollback()
+        raise SystemExit(f"❌ {e.detail}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    run = execute_billing_run(run_id, chunk_size=args.chunk_size)
+    if run.status != "completed":
+        raise SystemExit(f"❌ Billing run {run.id} failed: {run.error_message}")
+    logger.info(
+        f"✅ Billing run {run.id}: {run.records_created} fee records "
+        f"(GHS {run.amount_billed:.2f}) for {run.processed_students} students"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="School fee management maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollup = commands.add_parser("rebuild-rollup", help="Regenerate the daily payment rollup")
+    rollup.add_argument("--user-id", type=int, default=None, help="Only rebuild this school's rows")
+    rollup.set_defaults(handler=rebuild_rollup_command)
+
+    recount = commands.add_parser("recount-students", help="Recompute per-school student counts (limit enforcement)")
+    recount.set_defaults(handler=recount_students_command)
+
+    sweep = commands.add_parser("expire-subscriptions", help="Mark lapsed subscriptions expired (cron-friendly)")
+    sweep.set_defaults(handler=expire_subscriptions_command)
+
+    purge = commands.add_parser("purge-idempotency-keys", help="Delete expired Idempotency-Key records (cron-friendly)")
+    purge.set_defaults(handler=purge_idempotency_keys_command)
+
+    bill = commands.add_parser("bill-term", help="Attach a term's fee structures to enrolled students (safe to re-run)")
+    bill.add_argument("--user-id", type=int, required=True, help="School admin whose students and fee structures are billed")
+    bill.add_argument("--academic-year", required=True, help="e.g. 2024/2025")
+    bill.add_argument("--term", required=True, help="e.g. Term 1")
+    bill.add_argument("--level", default=None, help="Only students in this class")
+    bill.add_argument("--chunk-size", type=int, default=None, help="Students per transaction (default BILLING_CHUNK_SIZE)")
+    bill.set_defaults(handler=bill_term_command)
+
+    args = parser.parse_args()
+    create_tables()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
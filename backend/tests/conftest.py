@@ -0,0 +1,121 @@
+"""
+Shared fixtures
+
+Tests run against a scratch file-backed SQLite database (file-backed so
+several threads and sessions see the same data). Environment variables
+are set before the app is imported because settings and engines are
+created at import time.
+"""
+
+import os
+import tempfile
+import uuid
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-at-least-32-characters")
+os.environ["BCRYPT_ROUNDS"] = "4"
+# No background workers: tests call process_outbox / sweeps themselves
+os.environ["SMS_OUTBOX_BACKEND"] = "none"
+os.environ["SUBSCRIPTION_SWEEP_INTERVAL"] = "0"
+os.environ["IDEMPOTENCY_PURGE_INTERVAL"] = "0"
+# X-DB-Queries / X-DB-Commits response headers
+os.environ["DEBUG_DB_STATS"] = "true"
+
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app import models
+from app.database import SessionLocal, create_tables
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    create_tables()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal(expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def tenant(db) -> models.User:
+    """A school and its admin with 10 SMS units"""
+    tag = uuid.uuid4().hex[:8]
+    school = models.School(name=f"School {tag}", subdomain=f"s{tag}")
+    db.add(school)
+    db.flush()
+    user = models.User(
+        username=f"admin{tag}",
+        email=f"admin{tag}@example.com",
+        hashed_password="x",
+        school_name=school.name,
+        school_id=school.id,
+        sms_balance=10,
+        wallet_balance=0.0
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def school(client) -> SimpleNamespace:
+    """A school registered through the API, with Tuition 500 and PTA 50 for Term 1"""
+    tag = uuid.uuid4().hex[:8]
+    response = client.post("/auth/register-school", json={
+        "school_name": f"School {tag}",
+        "subdomain": f"s{tag}",
+        "admin_username": f"admin{tag}",
+        "admin_email": f"admin{tag}@example.com",
+        "admin_password": "password123",
+        "admin_full_name": "Admin"
+    })
+    assert response.status_code == 201, response.text
+    body = response.json()
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    for fee_type, amount in [("Tuition", 500.0), ("PTA", 50.0)]:
+        response = client.post("/fees/", headers=headers, json={
+            "academic_year": "2024/2025", "term": "Term 1", "fee_type": fee_type, "amount": amount
+        })
+        assert response.status_code == 201, response.text
+
+    return SimpleNamespace(
+        headers=headers,
+        user_id=body["user"]["id"],
+        school_id=body["user"]["school_id"],
+        username=body["user"]["username"]
+    )
+
+
+@pytest.fixture
+def add_student(client):
+    """Create a student through the API (billed for the school's Term 1 fees)"""
+    def add(school, name: str = "Ama Mensah", **fields) -> dict:
+        payload = {
+            "name": name,
+            "student_class": "JHS 1",
+            "parent_name": "Parent",
+            "parent_contact": "0241234567",
+            "academic_year": "2024/2025",
+            "term": "Term 1",
+            **fields
+        }
+        response = client.post("/students/", headers=school.headers, json=payload)
+        assert response.status_code == 201, response.text
+        return response.json()
+    return add
@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from app import models
+from app.services.billing_service import create_billing_run, execute_billing_run
+from app.services.student_import_service import fee_record_rows
+
+
+def fee(user, fee_type, amount, level="All"):
+    return models.FeeStructure(
+        user_id=user.id, school_id=user.school_id, academic_year="2024/2025",
+        term="Term 1", fee_type=fee_type, amount=amount, level=level
+    )
+
+
+def test_billing_attaches_missing_fees_once(db, tenant):
+    tuition = fee(tenant, "Tuition", 500.0)
+    db.add(tuition)
+    db.flush()
+    students = [
+        models.Student(
+            user_id=tenant.id, school_id=tenant.school_id, name=f"Kid {n}", student_class=f"JHS {n % 2 + 1}",
+            academic_year="2024/2025", term="Term 1", total_fees=500.0, paid_amount=0.0,
+            balance=500.0, status=models.PaymentStatus.UNPAID
+        )
+        for n in range(4)
+    ]
+    db.add_all(students)
+    db.flush()
+    for student in students:
+        db.execute(insert(models.StudentFeeRecord), fee_record_rows(student.id, student.school_id, [tuition]))
+    # Added after enrolment: one for everyone, one for JHS 1 only
+    db.add_all([fee(tenant, "Sports", 30.0), fee(tenant, "Lab", 70.0, level="JHS 1")])
+    db.commit()
+
+    first = create_billing_run(db, tenant.id, tenant.school_id, "2024/2025", "Term 1")
+    db.commit()
+    run = execute_billing_run(first.id, chunk_size=3)
+    assert (run.status, run.processed_students, run.records_created, run.amount_billed) == ("completed", 4, 6, 260.0)
+
+    db.expire_all()
+    totals = {student.student_class: student.total_fees for student in db.query(models.Student).filter(models.Student.user_id == tenant.id)}
+    assert totals == {"JHS 1": 600.0, "JHS 2": 530.0}
+
+    again = create_billing_run(db, tenant.id, tenant.school_id, "2024/2025", "Term 1")
+    db.commit()
+    assert execute_billing_run(again.id).records_created == 0
+
+
+def test_second_run_refused_while_one_is_active(db, tenant):
+    create_billing_run(db, tenant.id, tenant.school_id, "2024/2025", "Term 1")
+    db.commit()
+
+    with pytest.raises(HTTPException) as refused:
+        create_billing_run(db, tenant.id, tenant.school_id, "2024/2025", "Term 2")
+    assert refused.value.status_code == 409
+
+
+def test_new_term_run_bills_students_enrolled_earlier(db, tenant):
+    db.add(models.Student(
+        user_id=tenant.id, school_id=tenant.school_id, name="Kid", student_class="JHS 1",
+        academic_year="2024/2025", term="Term 1", total_fees=0.0, paid_amount=0.0,
+        balance=0.0, status=models.PaymentStatus.UNPAID
+    ))
+    term_two = fee(tenant, "Tuition", 450.0)
+    term_two.term = "Term 2"
+    db.add(term_two)
+    db.commit()
+
+    queued = create_billing_run(db, tenant.id, tenant.school_id, "2024/2025", "Term 2")
+    db.commit()
+    run = execute_billing_run(queued.id)
+    assert (run.processed_students, run.records_created, run.amount_billed) == (1, 1, 450.0)
+
+
+def test_students_created_by_hand_get_the_fees_a_run_would_bill(client, db, school, add_student):
+    response = client.post("/fees/", headers=school.headers, json={
+        "academic_year": "2024/2025", "term": "Term 1", "fee_type": "Lab", "amount": 70.0, "level": "JHS 2"
+    })
+    assert response.status_code == 201, response.text
+
+    jhs1 = add_student(school)
+    jhs2 = add_student(school, name="Kofi Boateng", student_class="JHS 2")
+    assert (jhs1["total_fees"], jhs2["total_fees"]) == (550.0, 620.0)
+
+    queued = create_billing_run(db, school.user_id, school.school_id, "2024/2025", "Term 1")
+    db.commit()
+    assert execute_billing_run(queued.id).records_created == 0
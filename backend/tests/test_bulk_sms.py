@@ -0,0 +1,61 @@
+from app import models
+from app.routers import payments
+
+
+class Provider:
+    """Delivers everything except numbers ending in 999"""
+    def __init__(self):
+        self.sent = []
+
+    async def send_bulk(self, messages, concurrency=None):
+        self.sent.extend(messages)
+        return [
+            {"success": not recipient.endswith("999"), "message": "bad number", "response": None}
+            for recipient, _ in messages
+        ]
+
+
+def set_sms_balance(db, user_id, units):
+    """Straight to the database, leaving any cached principal stale"""
+    db.query(models.User).filter(models.User.id == user_id).update({"sms_balance": units})
+    db.commit()
+
+
+def sms_balance(db, user_id):
+    db.expire_all()
+    return db.get(models.User, user_id).sms_balance
+
+
+def test_units_reserved_up_front_and_undelivered_refunded(client, db, school, add_student, monkeypatch):
+    provider = Provider()
+    monkeypatch.setattr(payments, "get_sms_provider", lambda sender_id=None: provider)
+    for n, contact in enumerate(["0241000001", "0241000002", "0241000999"]):
+        add_student(school, f"Kid {n}", parent_contact=contact)
+    set_sms_balance(db, school.user_id, 10)
+
+    response = client.post("/payments/bulk-sms", headers=school.headers, json={"message": "Hello {parent_name}"})
+    assert response.status_code == 200, response.text
+    assert (response.json()["sent"], response.json()["failed"]) == (2, 1)
+    assert sms_balance(db, school.user_id) == 8
+
+    kinds = [
+        (t.transaction_type, t.sms_units)
+        for t in db.query(models.WalletTransaction)
+        .filter(models.WalletTransaction.user_id == school.user_id)
+        .order_by(models.WalletTransaction.id)
+    ]
+    assert kinds == [("sms_usage", 3), ("sms_refund", 1)]
+
+
+def test_stale_cached_balance_cannot_overdraw(client, db, school, add_student, monkeypatch):
+    provider = Provider()
+    monkeypatch.setattr(payments, "get_sms_provider", lambda sender_id=None: provider)
+    for n in range(3):
+        add_student(school, f"Kid {n}", parent_contact=f"024100000{n}")
+    # The principal cached by the requests above still reports the trial balance
+    set_sms_balance(db, school.user_id, 2)
+
+    response = client.post("/payments/bulk-sms", headers=school.headers, json={"message": "Hello"})
+    assert response.status_code == 402
+    assert provider.sent == []
+    assert sms_balance(db, school.user_id) == 2
@@ -0,0 +1,34 @@
+def _dashboard(client, school):
+    response = client.get("/dashboard/", headers=school.headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_dashboard_is_served_from_cache_until_a_payment(client, school, add_student):
+    student = add_student(school)
+    first = _dashboard(client, school).json()
+    assert (first["total_students"], first["total_fees"], first["unpaid"]) == (1, 550.0, 1)
+
+    cached = _dashboard(client, school)
+    assert cached.json()["generated_at"] == first["generated_at"]
+    # Nothing but, occasionally, the settings snapshot's version check
+    assert int(cached.headers["X-DB-Queries"]) <= 1
+
+    response = client.post("/payments/", headers=school.headers, json={
+        "student_id": student["id"], "amount": 200.0, "payment_method": "Cash",
+        "fee_type": "Tuition", "term": "Term 1"
+    })
+    assert response.status_code == 201, response.text
+
+    refreshed = _dashboard(client, school).json()
+    assert (refreshed["total_collected"], refreshed["total_pending"]) == (200.0, 350.0)
+    assert (refreshed["partially_paid"], refreshed["unpaid"]) == (1, 0)
+    assert [payment["amount"] for payment in refreshed["recent_payments"]] == [200.0]
+
+
+def test_dashboard_refreshes_when_a_student_is_added(client, school, add_student):
+    add_student(school)
+    assert _dashboard(client, school).json()["total_students"] == 1
+
+    add_student(school, name="Kofi Boateng")
+    assert _dashboard(client, school).json()["total_students"] == 2
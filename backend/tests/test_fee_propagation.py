@@ -0,0 +1,67 @@
+from app import models
+
+
+def _fees(client, school):
+    response = client.get("/fees/", headers=school.headers)
+    assert response.status_code == 200, response.text
+    return {fee["fee_type"]: fee["id"] for fee in response.json()}
+
+
+def _student(db, student_id):
+    db.expire_all()
+    return db.get(models.Student, student_id)
+
+
+def test_amount_change_reaches_billed_students(client, db, school, add_student):
+    student = add_student(school)
+    fees = _fees(client, school)
+
+    response = client.put(f"/fees/{fees['Tuition']}", headers=school.headers, json={"amount": 600.0})
+    assert response.status_code == 200, response.text
+
+    saved = _student(db, student["id"])
+    assert (saved.total_fees, saved.balance, saved.status) == (650.0, 650.0, models.PaymentStatus.UNPAID)
+    record = db.query(models.StudentFeeRecord)\
+        .filter_by(student_id=student["id"], fee_structure_id=fees["Tuition"]).one()
+    assert (record.amount, record.balance) == (600.0, 600.0)
+
+
+def test_student_left_owing_nothing_is_not_marked_paid(client, db, school, add_student):
+    student = add_student(school)
+    fees = _fees(client, school)
+
+    assert client.put(f"/fees/{fees['PTA']}", headers=school.headers, json={"amount": 0.0}).status_code == 200
+    assert client.delete(f"/fees/{fees['Tuition']}", headers=school.headers).status_code == 200
+
+    saved = _student(db, student["id"])
+    assert (saved.total_fees, saved.balance, saved.paid_amount) == (0.0, 0.0, 0.0)
+    assert saved.status == models.PaymentStatus.UNPAID
+    record = db.query(models.StudentFeeRecord).filter_by(student_id=student["id"]).one()
+    assert record.status == models.PaymentStatus.UNPAID
+
+
+def test_reduction_below_payments_leaves_a_credit(client, db, school, add_student):
+    student = add_student(school)
+    fees = _fees(client, school)
+    response = client.post("/payments/", headers=school.headers, json={
+        "student_id": student["id"], "amount": 520.0, "payment_method": "Cash",
+        "fee_type": "Tuition", "term": "Term 1"
+    })
+    assert response.status_code == 201, response.text
+
+    assert client.put(f"/fees/{fees['Tuition']}", headers=school.headers, json={"amount": 400.0}).status_code == 200
+
+    saved = _student(db, student["id"])
+    assert (saved.balance, saved.status) == (-70.0, models.PaymentStatus.PAID)
+
+
+def test_level_of_a_billed_fee_cannot_change(client, school, add_student):
+    fees = _fees(client, school)
+    unbilled = client.put(f"/fees/{fees['PTA']}", headers=school.headers, json={"level": "JHS 2"})
+    assert unbilled.status_code == 200, unbilled.text
+
+    add_student(school)
+    response = client.put(f"/fees/{fees['Tuition']}", headers=school.headers, json={"level": "JHS 2"})
+    assert response.status_code == 409
+    dry_run = client.put(f"/fees/{fees['Tuition']}?dry_run=true", headers=school.headers, json={"level": "JHS 2"})
+    assert dry_run.status_code == 409
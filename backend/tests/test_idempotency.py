@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime, timedelta
+from app import models
+from app.services.idempotency_service import IN_PROGRESS, purge_expired_keys
+
+
+def _topup(client, school, key, amount=50.0):
+    return client.post(
+        "/wallet/topup",
+        headers={**school.headers, "Idempotency-Key": key},
+        json={"amount": amount, "payment_method": "Cash"}
+    )
+
+
+def _record(db, school, key):
+    return db.query(models.IdempotencyRecord)\
+        .filter(models.IdempotencyRecord.scope == school.username, models.IdempotencyRecord.key == key)\
+        .one()
+
+
+def test_replay_returns_the_original_response_without_writing(client, school, db):
+    key = str(uuid.uuid4())
+    first = _topup(client, school, key)
+    assert first.status_code == 200, first.text
+
+    replay = _topup(client, school, key)
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert replay.headers["X-DB-Commits"] == "0"
+
+    topups = db.query(models.WalletTransaction)\
+        .filter(models.WalletTransaction.user_id == school.user_id, models.WalletTransaction.transaction_type == "topup")\
+        .count()
+    assert topups == 1
+
+
+def test_key_reused_with_a_different_body_is_rejected(client, school):
+    key = str(uuid.uuid4())
+    assert _topup(client, school, key, amount=50.0).status_code == 200
+
+    response = _topup(client, school, key, amount=60.0)
+    assert response.status_code == 422
+
+
+def test_abandoned_claim_is_taken_over_once_its_lease_expires(client, school, db):
+    key = str(uuid.uuid4())
+    assert _topup(client, school, key).status_code == 200
+
+    # Simulate a worker that died after claiming the key: still in_progress
+    record = _record(db, school, key)
+    record.status = IN_PROGRESS
+    record.response_status = record.response_body = None
+    db.commit()
+    assert _topup(client, school, key).status_code == 409
+
+    record.expires_at = datetime.now() - timedelta(seconds=1)
+    db.commit()
+    retry = _topup(client, school, key)
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+
+    db.expire_all()
+    assert _record(db, school, key).status == "completed"
+
+
+def test_purge_deletes_only_expired_keys(client, school, db):
+    expired, live = str(uuid.uuid4()), str(uuid.uuid4())
+    assert _topup(client, school, expired).status_code == 200
+    assert _topup(client, school, live).status_code == 200
+    _record(db, school, expired).expires_at = datetime.now() - timedelta(seconds=1)
+    db.commit()
+
+    assert purge_expired_keys() >= 1
+
+    remaining = {
+        record.key for record in db.query(models.IdempotencyRecord)
+        .filter(models.IdempotencyRecord.scope == school.username)
+    }
+    assert live in remaining
+    assert expired not in remaining
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app import models
+from app.config import settings
+from app.services import outbox_service
+from app.services.outbox_service import enqueue_sms, process_outbox
+
+
+class FailingProvider:
+    async def send_sms(self, recipient, message):
+        return {"success": False, "message": "network down", "response": None}
+
+
+class WorkingProvider:
+    async def send_sms(self, recipient, message):
+        return {"success": True, "message": "ok", "response": {"code": "0000"}}
+
+
+@pytest.fixture(autouse=True)
+def empty_outbox(db):
+    """The outbox is global; drop messages queued by other tests (e.g. payment receipts)"""
+    db.query(models.SMSOutbox).filter(models.SMSOutbox.status == "queued").update({"status": "failed"})
+    db.commit()
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    def use(instance):
+        monkeypatch.setattr(outbox_service, "get_sms_provider", lambda sender_id=None: instance)
+    return use
+
+
+def queue(db, user, count=1):
+    items = [enqueue_sms(db, user, "0241234567", f"Message {n}") for n in range(count)]
+    db.commit()
+    return items
+
+
+def reload(db, model, id):
+    db.expire_all()
+    return db.get(model, id)
+
+
+def test_failed_send_is_requeued_with_retry_delay(db, tenant, provider):
+    provider(FailingProvider())
+    item, = queue(db, tenant)
+
+    started = datetime.now()
+    assert asyncio.run(process_outbox()) == 1
+
+    item = reload(db, models.SMSOutbox, item.id)
+    assert item.status == "queued"
+    assert item.attempts == 1
+    assert item.error_message == "network down"
+    expected = started + timedelta(seconds=settings.SMS_OUTBOX_RETRY_DELAY)
+    assert abs((item.next_attempt_at - expected).total_seconds()) < 5
+
+    # Not due yet, so the worker leaves it alone
+    assert asyncio.run(process_outbox()) == 0
+
+
+def test_retries_exhausted_fail_and_refund(db, tenant, provider):
+    provider(FailingProvider())
+    item, = queue(db, tenant)
+    assert reload(db, models.User, tenant.id).sms_balance == 9
+
+    for _ in range(settings.SMS_OUTBOX_MAX_ATTEMPTS):
+        db.query(models.SMSOutbox).filter(models.SMSOutbox.id == item.id)\
+            .update({"next_attempt_at": datetime.now()})
+        db.commit()
+        assert asyncio.run(process_outbox()) == 1
+
+    item = reload(db, models.SMSOutbox, item.id)
+    assert item.status == "failed"
+    assert item.sms_log.status == "failed"
+    assert reload(db, models.User, tenant.id).sms_balance == 10
+    refund = db.query(models.WalletTransaction).filter(
+        models.WalletTransaction.user_id == tenant.id,
+        models.WalletTransaction.transaction_type == "sms_refund"
+    ).one()
+    assert (refund.sms_balance_before, refund.sms_balance_after) == (9, 10)
+
+
+def test_units_reserved_at_enqueue_never_go_negative(db, tenant, provider):
+    provider(WorkingProvider())
+    queued = queue(db, tenant, count=12)
+
+    assert sum(item is not None for item in queued) == 10
+    assert queued[10] is None and queued[11] is None
+    assert reload(db, models.User, tenant.id).sms_balance == 0
+
+    while asyncio.run(process_outbox()):
+        pass
+
+    assert reload(db, models.User, tenant.id).sms_balance == 0
+    sent = db.query(models.SMSOutbox).filter(
+        models.SMSOutbox.user_id == tenant.id,
+        models.SMSOutbox.status == "sent"
+    ).count()
+    assert sent == 10
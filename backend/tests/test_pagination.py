@@ -0,0 +1,32 @@
+from app.pagination import NEXT_CURSOR_HEADER
+
+
+def test_cursor_pages_cover_every_row_once(client, school, add_student):
+    created = [add_student(school, name=f"Student {n}")["id"] for n in range(5)]
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/students/", headers=school.headers, params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(student["id"] for student in page)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert seen == sorted(created, reverse=True)
+
+
+def test_limit_must_be_positive(client, school, add_student):
+    add_student(school)
+
+    assert client.get("/students/", headers=school.headers, params={"limit": 0}).status_code == 422
+    assert client.get("/payments/", headers=school.headers, params={"limit": -1}).status_code == 422
+
+
+def test_invalid_cursor_is_rejected(client, school):
+    response = client.get("/students/", headers=school.headers, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
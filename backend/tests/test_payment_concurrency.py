@@ -0,0 +1,90 @@
+import threading
+from sqlalchemy import func, insert, select
+from app import models
+from app.database import SessionLocal
+from app.services.payment_service import apply_fee_record_payment, apply_student_payment, generate_payment_reference
+from app.services.student_import_service import fee_record_rows
+
+THREADS = 20
+POSTINGS_PER_THREAD = 5
+AMOUNT = 10.0
+TUITION = 500.0
+
+
+def enrol(db, user) -> models.Student:
+    """A student billed GHS 500 tuition, with its fee record"""
+    fee = models.FeeStructure(
+        user_id=user.id, school_id=user.school_id, academic_year="2024/2025",
+        term="Term 1", fee_type="Tuition", amount=TUITION, level="All"
+    )
+    student = models.Student(
+        user_id=user.id, school_id=user.school_id, name="Ama Mensah", student_class="JHS 1",
+        academic_year="2024/2025", term="Term 1", total_fees=TUITION, paid_amount=0.0,
+        balance=TUITION, status=models.PaymentStatus.UNPAID
+    )
+    db.add_all([fee, student])
+    db.flush()
+    db.execute(insert(models.StudentFeeRecord), fee_record_rows(student.id, student.school_id, [fee]))
+    db.commit()
+    return student
+
+
+def post_payment(user, student_id: int) -> bool:
+    """What create_payment does, in its own session and transaction"""
+    db = SessionLocal()
+    try:
+        if not apply_student_payment(db, student_id, AMOUNT):
+            db.rollback()
+            return False
+        db.add(models.Payment(
+            user_id=user.id, school_id=user.school_id, student_id=student_id,
+            reference=generate_payment_reference(), amount=AMOUNT, payment_method="Cash",
+            fee_type="Tuition", term="Term 1", academic_year="2024/2025"
+        ))
+        apply_fee_record_payment(db, student_id, "Tuition", "Term 1", AMOUNT)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def test_parallel_postings_keep_balances_consistent(db, tenant):
+    student = enrol(db, tenant)
+    start = threading.Barrier(THREADS)
+    outcomes = []
+    errors = []
+
+    def cashier():
+        start.wait()
+        for _ in range(POSTINGS_PER_THREAD):
+            try:
+                outcomes.append(post_payment(tenant, student.id))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=cashier) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    accepted = outcomes.count(True)
+    # 100 attempts of GHS 10 against GHS 500: exactly 50 fit, the rest are refused
+    assert accepted == int(TUITION // AMOUNT)
+    assert outcomes.count(False) == THREADS * POSTINGS_PER_THREAD - accepted
+
+    db.expire_all()
+    student = db.get(models.Student, student.id)
+    assert student.paid_amount + student.balance == student.total_fees
+    assert student.paid_amount == accepted * AMOUNT
+    assert student.balance == 0
+    assert student.status == models.PaymentStatus.PAID
+
+    record = db.query(models.StudentFeeRecord).filter(models.StudentFeeRecord.student_id == student.id).one()
+    assert record.paid_amount == student.paid_amount
+    assert record.paid_amount + record.balance == record.amount
+    assert record.status == models.PaymentStatus.PAID
+
+    payments = db.scalar(select(func.sum(models.Payment.amount)).where(models.Payment.student_id == student.id))
+    assert payments == student.paid_amount
@@ -0,0 +1,33 @@
+from app import models
+
+
+def payment(student_id, amount, **fields):
+    return {"student_id": student_id, "amount": amount, "payment_method": "Cash",
+            "fee_type": "Tuition", "term": "Term 1", **fields}
+
+
+def test_payment_with_receipt_commits_once(client, db, school, add_student):
+    student = add_student(school)
+
+    response = client.post("/payments/", headers=school.headers, json=payment(student["id"], 200.0, send_sms=True))
+    assert response.status_code == 201, response.text
+    assert response.headers["X-DB-Commits"] == "1"
+
+    db.expire_all()
+    saved = db.get(models.Student, student["id"])
+    assert (saved.paid_amount, saved.balance, saved.status) == (200.0, 350.0, models.PaymentStatus.PARTIAL)
+    record = db.query(models.StudentFeeRecord).filter_by(student_id=student["id"], fee_type="Tuition").one()
+    assert (record.paid_amount, record.balance) == (200.0, 300.0)
+    assert db.query(models.SMSOutbox).filter_by(user_id=school.user_id).count() == 1
+
+
+def test_rejected_payment_writes_nothing(client, db, school, add_student):
+    student = add_student(school)
+
+    response = client.post("/payments/", headers=school.headers, json=payment(student["id"], 600.0))
+    assert response.status_code == 400
+    assert response.headers["X-DB-Commits"] == "0"
+
+    db.expire_all()
+    assert db.get(models.Student, student["id"]).paid_amount == 0.0
+    assert db.query(models.Payment).filter_by(student_id=student["id"]).count() == 0
@@ -0,0 +1,21 @@
+from app import models
+from app.services.statistics_service import platform_summary
+
+
+def test_only_delivered_sms_count_as_sent(db, tenant):
+    before = platform_summary(db)["total_sms_sent"]
+
+    db.add_all([
+        models.SMSLog(user_id=tenant.id, school_id=tenant.school_id, recipient="0241234567", message="Hi", status=status)
+        for status in ("sent", "sent", "pending", "failed")
+    ])
+    db.commit()
+
+    assert platform_summary(db)["total_sms_sent"] == before + 2
+
+
+def test_statistics_are_cached(client, school):
+    first = client.get("/admin/statistics", headers=school.headers)
+    assert first.status_code == 200, first.text
+    second = client.get("/admin/statistics", headers=school.headers)
+    assert second.json()["generated_at"] == first.json()["generated_at"]
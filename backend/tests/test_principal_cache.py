@@ -0,0 +1,44 @@
+from app import models
+from app.services.wallet_service import adjust_balances
+
+
+def _me(client, school):
+    response = client.get("/auth/me", headers=school.headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_principal_is_cached_between_requests(client, school, db):
+    _me(client, school)
+
+    # Changed behind the app's back: the cached principal is still served
+    db.query(models.User).filter(models.User.id == school.user_id).update({"phone": "0200000000"})
+    db.commit()
+    cached = _me(client, school)
+    # Nothing but, occasionally, the settings snapshot's version check
+    assert int(cached.headers["X-DB-Queries"]) <= 1
+    assert cached.json()["phone"] != "0200000000"
+
+
+def test_profile_update_refreshes_the_cached_principal(client, school):
+    _me(client, school)
+
+    response = client.put("/auth/me", headers=school.headers, json={"phone": "0551234567"})
+    assert response.status_code == 200, response.text
+    assert _me(client, school).json()["phone"] == "0551234567"
+
+
+def test_topup_refreshes_the_cached_balance(client, school):
+    before = _me(client, school).json()["wallet_balance"]
+
+    response = client.post("/wallet/topup", headers=school.headers, json={"amount": 25.0, "payment_method": "Cash"})
+    assert response.status_code == 200, response.text
+    assert _me(client, school).json()["wallet_balance"] == before + 25.0
+
+
+def test_balance_updates_never_overdraw(db, tenant):
+    assert adjust_balances(db, tenant, sms_units=-11) is None
+    balances = adjust_balances(db, tenant, sms_units=-10)
+    db.commit()
+    assert (balances["sms_balance_before"], balances["sms_balance_after"]) == (10, 0)
+    assert tenant.sms_balance == 0
@@ -0,0 +1,47 @@
+import asyncio
+import httpx
+import pytest
+from app.services import sms_service
+from app.services.sms_service import get_http_client, get_sms_provider
+
+
+@pytest.fixture
+def arkesel(monkeypatch):
+    """Route the shared client to an in-memory Arkesel that accepts everything"""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"code": "0000", "message": "ok"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(sms_service, "_http_client", client)
+    yield seen
+    asyncio.run(client.aclose())
+
+
+def test_providers_share_one_client(arkesel):
+    assert get_http_client() is get_http_client()
+    assert get_sms_provider("SchoolA") is get_sms_provider("SchoolA")
+
+    async def send():
+        return await asyncio.gather(
+            get_sms_provider("SchoolA").send_sms("0241234567", "one"),
+            get_sms_provider("SchoolB").send_bulk([("0241234568", "two"), ("0241234569", "three")])
+        )
+
+    single, bulk = asyncio.run(send())
+    assert single["success"] and all(result["success"] for result in bulk)
+    # Every call went through the one shared (mocked) client
+    assert [request.url.params["from"] for request in arkesel] == ["SchoolA", "SchoolB", "SchoolB"]
+    assert arkesel[0].url.params["to"] == "+233241234567"
+
+
+def test_client_recreated_lazily_after_close(arkesel):
+    shared = get_http_client()
+    asyncio.run(sms_service.close_http_client())
+    assert sms_service._http_client is None
+
+    replacement = get_http_client()
+    assert replacement is not shared
+    asyncio.run(sms_service.close_http_client())
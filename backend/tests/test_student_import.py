@@ -0,0 +1,39 @@
+from app import models
+
+HEADER = "name,student_class,parent_name,parent_contact,academic_year,term\n"
+
+
+def _import(client, school, filename, content: bytes):
+    return client.post("/students/import", headers=school.headers, files={"file": (filename, content)})
+
+
+def test_import_reports_invalid_rows_and_bills_valid_ones(client, school, db):
+    content = (
+        HEADER
+        + "Ama Mensah,JHS 1,Parent,0241234567,2024/2025,Term 1\n"
+        + ",JHS 1,Parent,0241234567,2024/2025,Term 1\n"
+        + "Kofi Boateng,JHS 1,Parent,0241234567,2024/2025,Term 1\n"
+    ).encode()
+
+    response = _import(client, school, "students.csv", content)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["total_rows"], report["imported"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 2
+
+    students = db.query(models.Student).filter(models.Student.user_id == school.user_id).all()
+    assert sorted(student.name for student in students) == ["Ama Mensah", "Kofi Boateng"]
+    assert all(student.total_fees == 550.0 for student in students)
+
+
+def test_non_utf8_csv_is_rejected(client, school, db):
+    content = (HEADER + "Ama Mensah,JHS 1,Adjoa Ané,0241234567,2024/2025,Term 1\n").encode("latin-1")
+
+    response = _import(client, school, "students.csv", content)
+    assert response.status_code == 400
+    assert db.query(models.Student).filter(models.Student.user_id == school.user_id).count() == 0
+
+
+def test_corrupt_xlsx_is_rejected(client, school):
+    response = _import(client, school, "students.xlsx", b"this is not a workbook")
+    assert response.status_code == 400
@@ -1,49 +1,41 @@
 import { Container, Row, Col, Card, Spinner } from 'react-bootstrap';
 import { FaUsers, FaMoneyBillWave, FaExclamationTriangle, FaCheckCircle, FaWallet } from 'react-icons/fa';
 import StatCard from '../components/StatCard';
-import { useData } from '../contexts/DataContext';
+import { dashboardAPI } from '../utils/api';
 import { useEffect, useState } from 'react';
 
 const Dashboard = () => {
-  const { students, payments, walletBalance, loadStudents, loadPayments, loadWalletData, getStudentStatistics } = useData();
-  const [stats, setStats] = useState({ total: 0, paid: 0, partial: 0, unpaid: 0 });
+  const [dashboard, setDashboard] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    // Load data when component mounts
+    // Aggregates are computed (and cached) on the server
     const loadData = async () => {
       setLoading(true);
-      await Promise.all([
-        loadStudents(),
-        loadPayments(),
-        loadWalletData(),
-      ]);
-      
-      // Load statistics
-      const statistics = await getStudentStatistics();
-      setStats({
-        total: statistics.total_students ?? statistics.total ?? 0,
-        paid: statistics.fully_paid ?? statistics.paid ?? 0,
-        partial: statistics.partially_paid ?? statistics.partial ?? 0,
-        unpaid: statistics.unpaid ?? 0,
-      });
-      setLoading(false);
+      try {
+        setDashboard(await dashboardAPI.get());
+      } catch (err) {
+        console.error('Error loading dashboard:', err);
+      } finally {
+        setLoading(false);
+      }
     };
     
     loadData();
   }, []);
 
-  const totalStudents = stats.total || students.length;
-  const paidStudents = stats.paid || students.filter(s => (s.status || s.payment_status) === 'Paid').length;
-  const pendingStudents = stats.unpaid || students.filter(s => (s.status || s.payment_status) === 'Unpaid').length;
-  const partialStudents = stats.partial || students.filter(s => (s.status || s.payment_status) === 'Partial').length;
+  const totalStudents = dashboard?.total_students ?? 0;
+  const paidStudents = dashboard?.fully_paid ?? 0;
+  const pendingStudents = dashboard?.unpaid ?? 0;
+  const partialStudents = dashboard?.partially_paid ?? 0;
   
-  const totalCollected = payments.reduce((sum, p) => sum + (p.amount || 0), 0);
-  const totalExpected = students.reduce((sum, s) => sum + (s.total_fees ?? s.totalFees ?? 0), 0);
-  const totalOutstanding = students.reduce((sum, s) => sum + (s.balance ?? 0), 0);
+  const totalCollected = dashboard?.total_collected ?? 0;
+  const totalExpected = dashboard?.total_fees ?? 0;
+  const totalOutstanding = dashboard?.total_pending ?? 0;
+  const walletBalance = dashboard?.wallet_balance ?? 0;
 
-  const recentPayments = payments.slice(0, 5);
-  const recentStudents = students.slice(0, 5);
+  const recentPayments = dashboard?.recent_payments ?? [];
+  const recentStudents = dashboard?.recent_students ?? [];
 
   if (loading) {
     return (
@@ -151,11 +143,10 @@ const Dashboard = () => {
                   </thead>
                   <tbody>
                     {recentPayments.map((payment) => {
-                      const student = students.find(s => s.id === (payment.student_id ?? payment.studentId));
                       return (
                         <tr key={payment.id}>
                           <td className="fw-semibold" style={{ fontSize: '0.8rem' }} data-label="Student">
-                            {payment.student_name || payment.studentName || student?.name}
+                            {payment.student_name}
                           </td>
                           <td data-label="Class">
                             <span className="badge" style={{ 
@@ -163,7 +154,7 @@ const Dashboard = () => {
                               color: 'white',
                               fontSize: '0.7rem'
                             }}>
-                              {payment.student_class || payment.studentClass || student?.student_class || student?.class}
+                              {payment.student_class}
                             </span>
                           </td>
                           <td style={{ fontSize: '0.8rem' }} data-label="Fee Type">
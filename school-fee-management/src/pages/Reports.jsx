@@ -1,7 +1,8 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { Container, Row, Col, Card, Button, Form, Table, Badge } from 'react-bootstrap';
 import { FaFileDownload, FaPrint, FaChartBar, FaCalendar, FaMoneyBillWave } from 'react-icons/fa';
 import { useData } from '../contexts/DataContext';
+import { reportsAPI } from '../utils/api';
 
 const Reports = () => {
   const { students, payments, walletBalance } = useData();
@@ -10,8 +11,30 @@ const Reports = () => {
   const [endDate, setEndDate] = useState('');
   const [filterClass, setFilterClass] = useState('All');
 
+  const [collections, setCollections] = useState(null);
+  const [studentReport, setStudentReport] = useState(null);
+
   // Get unique classes
-  const classes = ['All', ...new Set(students.map(s => s.class))];
+  const classes = ['All', ...new Set(students.map(s => s.student_class ?? s.class))];
+
+  // Totals and breakdowns are aggregated on the server
+  useEffect(() => {
+    const studentClass = filterClass === 'All' ? undefined : filterClass;
+    const loadReports = async () => {
+      try {
+        const [collectionData, studentData] = await Promise.all([
+          reportsAPI.collections({ start_date: startDate, end_date: endDate, student_class: studentClass }),
+          reportsAPI.students({ student_class: studentClass }),
+        ]);
+        setCollections(collectionData);
+        setStudentReport(studentData);
+      } catch (err) {
+        console.error('Error loading reports:', err);
+      }
+    };
+
+    loadReports();
+  }, [startDate, endDate, filterClass]);
 
   // Filter data based on date range and class
   const filterData = () => {
@@ -30,27 +53,22 @@ const Reports = () => {
   const filteredPayments = filterData();
   const filteredStudents = filterClass === 'All' 
     ? students 
-    : students.filter(s => s.class === filterClass);
+    : students.filter(s => (s.student_class ?? s.class) === filterClass);
 
   // Calculate statistics
-  const totalCollected = filteredPayments.reduce((sum, p) => sum + p.amount, 0);
-  const totalExpected = filteredStudents.reduce((sum, s) => sum + s.totalFees, 0);
-  const totalOutstanding = filteredStudents.reduce((sum, s) => sum + s.balance, 0);
-  const paidCount = filteredStudents.filter(s => s.status === 'Paid').length;
-  const partialCount = filteredStudents.filter(s => s.status === 'Partial').length;
-  const pendingCount = filteredStudents.filter(s => s.status === 'Pending').length;
+  const totalStudents = studentReport?.total_students ?? 0;
+  const totalCollected = collections?.total_collected ?? 0;
+  const totalExpected = studentReport?.total_fees ?? 0;
+  const totalOutstanding = studentReport?.total_outstanding ?? 0;
+  const paidCount = studentReport?.fully_paid ?? 0;
+  const partialCount = studentReport?.partially_paid ?? 0;
+  const pendingCount = studentReport?.unpaid ?? 0;
 
   // Payment method breakdown
-  const paymentByMethod = {};
-  filteredPayments.forEach(p => {
-    paymentByMethod[p.method] = (paymentByMethod[p.method] || 0) + p.amount;
-  });
+  const paymentByMethod = Object.fromEntries((collections?.by_method ?? []).map(g => [g.key, g.amount]));
 
   // Payment type breakdown
-  const paymentByType = {};
-  filteredPayments.forEach(p => {
-    paymentByType[p.type] = (paymentByType[p.type] || 0) + p.amount;
-  });
+  const paymentByType = Object.fromEntries((collections?.by_fee_type ?? []).map(g => [g.key, g.amount]));
 
   const handlePrint = () => {
     window.print();
@@ -63,7 +81,7 @@ const Reports = () => {
     csv += `Period: ${startDate || 'All time'} to ${endDate || 'Present'}\n\n`;
     
     csv += 'Summary Statistics\n';
-    csv += `Total Students,${filteredStudents.length}\n`;
+    csv += `Total Students,${totalStudents}\n`;
     csv += `Total Expected,GHS ${totalExpected}\n`;
     csv += `Total Collected,GHS ${totalCollected}\n`;
     csv += `Outstanding Balance,GHS ${totalOutstanding}\n`;
@@ -166,7 +184,7 @@ const Reports = () => {
                   <div className="d-flex justify-content-between align-items-start">
                     <div>
                       <p className="text-muted mb-1">Total Students</p>
-                      <h3 className="fw-bold">{filteredStudents.length}</h3>
+                      <h3 className="fw-bold">{totalStudents}</h3>
                     </div>
                     <FaChartBar className="text-primary" size={30} />
                   </div>
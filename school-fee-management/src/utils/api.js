@@ -164,9 +164,11 @@ export const paymentsAPI = {
     return apiRequest(`/payments/${id}`);
   },
   
-  create: async (paymentData, sendSMS = false) => {
+  // Reuse the same idempotencyKey when retrying so the payment is posted once
+  create: async (paymentData, sendSMS = false, idempotencyKey = crypto.randomUUID()) => {
     return apiRequest(`/payments/?send_sms=${sendSMS}`, {
       method: 'POST',
+      headers: { 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify(paymentData),
     });
   },
@@ -254,9 +256,10 @@ export const walletAPI = {
     return response.json();
   },
   
-  topUp: async (amount, paymentMethod) => {
+  topUp: async (amount, paymentMethod, idempotencyKey = crypto.randomUUID()) => {
     return apiRequest('/wallet/topup', {
       method: 'POST',
+      headers: { 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify({
         amount,
         payment_method: paymentMethod,
@@ -276,6 +279,35 @@ export const walletAPI = {
   },
 };
 
+// Dashboard API
+export const dashboardAPI = {
+  get: async () => {
+    return apiRequest('/dashboard/');
+  },
+};
+
+// Reports API
+export const reportsAPI = {
+  collections: async (filters = {}) => {
+    const params = new URLSearchParams();
+    if (filters.start_date) params.append('start_date', filters.start_date);
+    if (filters.end_date) params.append('end_date', filters.end_date);
+    if (filters.interval) params.append('interval', filters.interval);
+    if (filters.student_class) params.append('student_class', filters.student_class);
+    
+    const queryString = params.toString();
+    return apiRequest(`/reports/collections${queryString ? `?${queryString}` : ''}`);
+  },
+  
+  students: async (filters = {}) => {
+    const params = new URLSearchParams();
+    if (filters.student_class) params.append('student_class', filters.student_class);
+    
+    const queryString = params.toString();
+    return apiRequest(`/reports/students${queryString ? `?${queryString}` : ''}`);
+  },
+};
+
 export default {
   auth: authAPI,
   students: studentsAPI,
@@ -283,4 +315,6 @@ export default {
   fees: feesAPI,
   sms: smsAPI,
   wallet: walletAPI,
+  dashboard: dashboardAPI,
+  reports: reportsAPI,
 };